@@ -1,5 +1,7 @@
 import sys
 import os
+from collections import OrderedDict
+from itertools import chain
 from PyQt6.QtWidgets import (
     QApplication, 
     QMainWindow, 
@@ -18,8 +20,15 @@ from PyQt6.QtWidgets import (
     QFileDialog,
     QDialog,
     QSizePolicy,
-    QProgressBar)
-from PyQt6.QtCore import Qt, QSize, QParallelAnimationGroup, QPropertyAnimation, QAbstractAnimation
+    QProgressBar,
+    QInputDialog,
+    QCheckBox,
+    QSplitter,
+    QPlainTextEdit,
+    QProgressDialog,
+    QDockWidget,
+    QComboBox)
+from PyQt6.QtCore import Qt, QTimer, QSize, QParallelAnimationGroup, QPropertyAnimation, QAbstractAnimation
 from PyQt6.QtGui import QAction, QFont, QIcon, QPixmap, QClipboard
 from md5_algorithm import (
     text_to_bytearray,
@@ -28,8 +37,92 @@ from md5_algorithm import (
     process_blocks_with_detailed_visualization,
     finalize_hash,
     visualize_padding,
-    bytearray_visualize_with_chars
+    bytearray_visualize_with_chars,
+    choose_detail_level,
+    estimate_trace_bytes,
+    md5_step_records,
+    first_changed_block,
+    first_changed_byte,
+    utf8_prefix_length,
+    utf8_char_start,
+    utf8_char_lines,
+    format_bytes_with_chars,
+    structure_block_trace,
+    padding_for_length,
+    visualize_padding_stream,
+    bytearray_visualize_simple,
+    TRACE_BYTES_PER_BLOCK,
+    parse_block_selection,
+    selection_size,
+    truncate_selection,
+    trace_selected_blocks,
+    DETAIL_FULL,
+    DETAIL_ROUNDS,
+    DETAIL_BUFFERS
 )
+from md5_diff import find_trace_divergence, render_trace_divergence
+from md5_reduced import (
+    run_experiment,
+    render_experiment,
+    pair_step_differences,
+    parse_delta,
+    parse_functions,
+    check_steps,
+    format_probability,
+    ROUND_FUNCTION_NAMES,
+    DIFFERENCE_NAMES,
+    DIFFERENCE_XOR,
+    DEFAULT_PAIRS,
+    HAS_NUMPY
+)
+from md5_pipeline import trace_blocks_parallel, available_cpus
+from app_gui_animation import BitOperationWidget
+from app_gui_panes import TraceModel, PinnedStepsView, block_start_buffers
+from app_gui_jobs import JobsPanel
+from md5_jobs import JobManager, TraceStore
+from md5_index import TraceIndex
+from md5_stream import EncodedTextSource, iter_file_text, iter_string_chunks, hash_stream, TEXT_CHUNK_CHARS
+from md5_checkpoint import hash_file, load_checkpoint, file_identity, default_checkpoint_path
+from app_gui_prefetch import IdleWorker
+from md5_hmac import trace_hmac, parse_key, xor_key, IPAD, OPAD, HMAC_BLOCK_SIZE
+import md5_metrics
+
+# Лимит памяти на трассировку по умолчанию (МБ)
+DEFAULT_MEMORY_BUDGET_MB = 256
+
+# Начиная с этого числа блоков трасса строится параллельно в пуле процессов
+# (если процессу доступно больше одного ядра)
+PARALLEL_MIN_BLOCKS = 256
+
+# Задержка пересчета в режиме живого ввода (мс)
+LIVE_UPDATE_DELAY_MS = 300
+
+# Сколько байт показывать на шагах 1 и 2 при сокращенной детализации
+PREVIEW_BYTES = 4096
+
+# Размер страницы просмотра байтов для многострочного и файлового ввода
+PAGE_BYTES = 4096
+
+# Сколько символов файла показывать в редакторе для предпросмотра
+FILE_PREVIEW_CHARS = 64 * 1024
+
+# Представления шагов хранятся только для текущего шага и шагов на этом расстоянии от него
+PRERENDER_RADIUS = 1
+
+# Сколько секций блоков шага 4 создается сразу при показе, остальные достраиваются в простое
+VISIBLE_BLOCK_SECTIONS = 8
+
+# Сколько секций шагов создается за одну порцию работы в простое
+STEP_SECTIONS_PER_SLICE = 4
+
+# Сколько соседних страниц байтов шага 1 держать заранее прочитанными
+PAGE_CACHE_SIZE = 3
+
+DETAIL_LEVEL_NAMES = {
+    DETAIL_FULL: "полная (все шаги)",
+    DETAIL_ROUNDS: "сводка по раундам",
+    DETAIL_BUFFERS: "только буферы блоков"
+}
 
 class AboutDialog(QDialog):
     """
@@ -98,6 +191,24 @@ class HelpDialog(QDialog):
             <li>Используйте кнопки <b>Предыдущий шаг</b> и <b>Следующий шаг</b> для навигации по этапам алгоритма.</li>
             <li>Для сброса визуализации нажмите кнопку <b>Сбросить</b>.</li>
             </ol>
+            <p>В режиме <b>Живой ввод</b> хеш пересчитывается автоматически после паузы в наборе;
+            пересчитываются только блоки, начиная с первого измененного.</p>
+            <p>Для длинных текстов включите <b>Многострочный ввод</b> или откройте текстовый файл
+            (<b>Файл → Открыть текстовый файл</b>). Такой текст кодируется в UTF-8 и хешируется порциями,
+            а байты на шаге 1 просматриваются постранично.</p>
+            <p><b>Настройки → Выборочная трассировка</b> позволяет строить трассу только для нужных блоков,
+            например <i>first, last</i> или <i>10-20</i>, и задать детализацию; остальные блоки сжимаются
+            без трассировки, поэтому даже для больших входов трасса строится быстро.</p>
+            <p><b>Инструменты → Очередь заданий</b> (Ctrl+J) открывает панель, в которую можно поставить
+            несколько входов и файлов: они хешируются одновременно, а кнопка <b>Показать</b>
+            переключает основное окно на трассу завершенного задания.</p>
+            <p><b>Инструменты → Режим HMAC-MD5</b> запрашивает ключ (текст или <i>hex:</i> и байты) и
+            вычисляет HMAC вместо MD5: шаги показывают подготовку ключа, промежуточные состояния
+            после блоков K0 ⊕ ipad и K0 ⊕ opad, а шаг 4 - блоки внутреннего и внешнего хеша.</p>
+            <p><b>Инструменты → Дифференциальный эксперимент</b> задает сокращенный вариант MD5
+            (число шагов и функции раундов) и разность слов сообщения, оценивает на миллионах пар
+            вероятности характеристики по шагам (нужен NumPy) и может показать на шаге 4, где
+            разность пары для каждого блока гасится или распространяется.</p>
             
             <h3>Сохранение результатов:</h3>
             <p>В меню <b>Файл</b> вы можете:</p>
@@ -145,6 +256,266 @@ class HelpDialog(QDialog):
         layout.addWidget(help_text)
         layout.addWidget(close_button)
 
+class TraceDiffDialog(QDialog):
+    """
+    Диалоговое окно сравнения трасс двух входов.
+    
+    Выравнивает трассы MD5 по шагам, находит первое расхождение
+    и показывает только область расхождения с XOR и весом Хэмминга
+    разницы для каждого регистра.
+    
+    Args:
+        text: Начальное значение первого входа.
+        parent: Родительский виджет.
+    """
+    def __init__(self, text="", parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Сравнение трасс")
+        self.setMinimumSize(700, 500)
+        
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        
+        title = QLabel("Сравнение трасс двух входов")
+        title.setObjectName("title")
+        title.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        
+        self.first_input = QLineEdit(text)
+        self.first_input.setPlaceholderText("Первый вход...")
+        self.second_input = QLineEdit()
+        self.second_input.setPlaceholderText("Второй вход...")
+        
+        compare_button = QPushButton("Сравнить")
+        compare_button.clicked.connect(self.compare)
+        
+        self.result_text = QTextEdit()
+        self.result_text.setReadOnly(True)
+        self.result_text.setFont(QFont("Consolas", 12))
+        
+        close_button = QPushButton("Закрыть")
+        close_button.clicked.connect(self.accept)
+        
+        layout.addWidget(title)
+        layout.addWidget(self.first_input)
+        layout.addWidget(self.second_input)
+        layout.addWidget(compare_button)
+        layout.addWidget(self.result_text)
+        layout.addWidget(close_button)
+    
+    def compare(self):
+        """
+        Сравнивает трассы двух введенных текстов и выводит расхождение.
+        """
+        divergence = find_trace_divergence(
+            text_to_bytearray(self.first_input.text()),
+            text_to_bytearray(self.second_input.text())
+        )
+        self.result_text.setPlainText(render_trace_divergence(divergence))
+
+class DifferentialDialog(QDialog):
+    """
+    Диалоговое окно дифференциального эксперимента с сокращенным MD5.
+    
+    Задает вариант (число шагов и функции раундов) и разность сообщения,
+    оценивает на случайных парах вероятности характеристики по шагам
+    и может показать разности пары для блоков текущей трассы на шаге 4.
+    
+    Args:
+        overlay: Текущие параметры наложения на шаг 4 (или None).
+        parent: Родительский виджет.
+    """
+    def __init__(self, overlay=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Дифференциальный эксперимент")
+        self.setMinimumSize(800, 550)
+        self.result = None
+        self.overlay = overlay
+        overlay = overlay or {}
+        
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        
+        title = QLabel("Сокращенный MD5: распространение разности")
+        title.setObjectName("title")
+        title.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        
+        params_layout = QHBoxLayout()
+        self.steps_field = QLineEdit(str(overlay.get('steps', 16)))
+        self.steps_field.setToolTip("Число шагов (1-64)")
+        self.functions_field = QLineEdit(overlay.get('functions', ROUND_FUNCTION_NAMES))
+        self.functions_field.setToolTip("Функции четырех раундов из F, G, H, I")
+        self.kind_combo = QComboBox()
+        for kind, name in DIFFERENCE_NAMES.items():
+            self.kind_combo.addItem(f"Разность {name}", kind)
+        self.kind_combo.setCurrentIndex(max(0, self.kind_combo.findData(overlay.get('kind', DIFFERENCE_XOR))))
+        self.pairs_field = QLineEdit(str(DEFAULT_PAIRS))
+        self.pairs_field.setToolTip("Число пар сообщений")
+        params_layout.addWidget(QLabel("Шагов:"))
+        params_layout.addWidget(self.steps_field)
+        params_layout.addWidget(QLabel("Функции:"))
+        params_layout.addWidget(self.functions_field)
+        params_layout.addWidget(self.kind_combo)
+        params_layout.addWidget(QLabel("Пар:"))
+        params_layout.addWidget(self.pairs_field)
+        
+        delta_text = ", ".join(f"{word}:{value:#x}" for word, value in sorted(overlay.get('delta', {}).items()))
+        self.delta_field = QLineEdit(delta_text or "4:0x80000000, 11:0x8000, 14:0x80000000")
+        self.delta_field.setPlaceholderText("Разность слов: НОМЕР:ЗНАЧЕНИЕ через запятую")
+        
+        buttons = QHBoxLayout()
+        run_button = QPushButton("Запустить")
+        run_button.clicked.connect(self.run)
+        show_button = QPushButton("Показать на шаге 4")
+        show_button.clicked.connect(self.show_on_trace)
+        hide_button = QPushButton("Убрать с шага 4")
+        hide_button.clicked.connect(self.hide_from_trace)
+        buttons.addWidget(run_button)
+        buttons.addWidget(show_button)
+        buttons.addWidget(hide_button)
+        
+        self.result_text = QTextEdit()
+        self.result_text.setReadOnly(True)
+        self.result_text.setFont(QFont("Consolas", 12))
+        if not HAS_NUMPY:
+            self.result_text.setPlainText("Для оценки вероятностей нужен NumPy (pip install numpy); "
+                                          "показ разностей на шаге 4 работает и без него.")
+            run_button.setEnabled(False)
+        
+        close_button = QPushButton("Закрыть")
+        close_button.clicked.connect(self.accept)
+        
+        layout.addWidget(title)
+        layout.addLayout(params_layout)
+        layout.addWidget(self.delta_field)
+        layout.addLayout(buttons)
+        layout.addWidget(self.result_text)
+        layout.addWidget(close_button)
+    
+    def parameters(self):
+        """
+        Считывает параметры варианта и разности.
+        
+        Returns:
+            dict: Параметры или None, если они заданы неверно (с предупреждением).
+        """
+        try:
+            steps = int(self.steps_field.text())
+            check_steps(steps)
+            return {
+                'steps': steps,
+                'functions': parse_functions(self.functions_field.text()),
+                'delta': parse_delta(self.delta_field.text()),
+                'kind': self.kind_combo.currentData()
+            }
+        except ValueError as e:
+            QMessageBox.warning(self, "Ошибка", str(e))
+            return None
+    
+    def run(self):
+        """
+        Запускает эксперимент и выводит отчет по шагам.
+        """
+        params = self.parameters()
+        if params is None:
+            return
+        try:
+            pairs = int(self.pairs_field.text())
+        except ValueError:
+            QMessageBox.warning(self, "Ошибка", "Число пар должно быть целым.")
+            return
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            self.result = run_experiment(params['steps'], params['functions'], params['delta'],
+                                         params['kind'], pairs)
+        except ValueError as e:
+            QMessageBox.warning(self, "Ошибка", str(e))
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+        self.result_text.setPlainText(render_experiment(self.result))
+    
+    def show_on_trace(self):
+        """
+        Запоминает параметры для наложения разностей на шаг 4 и закрывает окно.
+        
+        Если эксперимент с теми же параметрами уже запущен, на шаге 4
+        показываются и его вероятности.
+        """
+        params = self.parameters()
+        if params is None:
+            return
+        if self.result and all(self.result[key] == value for key, value in params.items()):
+            params['result'] = self.result
+        self.overlay = params
+        self.accept()
+    
+    def hide_from_trace(self):
+        self.overlay = None
+        self.accept()
+
+class TraceSelectionDialog(QDialog):
+    """
+    Диалоговое окно выборочной трассировки.
+    
+    Позволяет выбрать блоки, для которых строится трасса
+    (first, last, номера и диапазоны), и уровень детализации.
+    Остальные блоки сжимаются без трассировки.
+    
+    Args:
+        selection: Текущий выбор блоков.
+        detail: Текущий уровень детализации (None - автоматически).
+        parent: Родительский виджет.
+    """
+    def __init__(self, selection="", detail=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Выборочная трассировка")
+        self.setMinimumWidth(450)
+        
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        
+        hint = QLabel("Блоки для трассировки (пусто - все блоки):\n"
+                      "first - первый, last - последний (с длиной сообщения),\n"
+                      "номера и диапазоны через запятую, например: first, 10-20, last")
+        hint.setWordWrap(True)
+        
+        self.selection_field = QLineEdit(selection)
+        self.selection_field.setPlaceholderText("first, last")
+        
+        self.detail_combo = QComboBox()
+        self.detail_combo.addItem("Автоматически (по лимиту памяти)", None)
+        for level, name in DETAIL_LEVEL_NAMES.items():
+            self.detail_combo.addItem(name.capitalize(), level)
+        self.detail_combo.setCurrentIndex(max(0, self.detail_combo.findData(detail)))
+        
+        buttons = QHBoxLayout()
+        ok_button = QPushButton("Применить")
+        ok_button.clicked.connect(self.apply)
+        cancel_button = QPushButton("Отмена")
+        cancel_button.clicked.connect(self.reject)
+        buttons.addWidget(ok_button)
+        buttons.addWidget(cancel_button)
+        
+        layout.addWidget(hint)
+        layout.addWidget(self.selection_field)
+        layout.addWidget(QLabel("Детализация трассы:"))
+        layout.addWidget(self.detail_combo)
+        layout.addLayout(buttons)
+    
+    def apply(self):
+        try:
+            parse_block_selection(self.selection_field.text(), 1)
+        except ValueError as e:
+            QMessageBox.warning(self, "Ошибка", str(e))
+            return
+        self.accept()
+    
+    def selection(self):
+        return self.selection_field.text().strip()
+    
+    def detail(self):
+        return self.detail_combo.currentData()
+
 class StyledFrame(QFrame):
     """
     Стилизованный фрейм с заголовком.
@@ -185,6 +556,10 @@ class CollapsibleSection(QWidget):
         
         self.animation_duration = 300
         self.toggle_animation = QParallelAnimationGroup(self)
+        self.bit_animation = None
+        self.content_builder = None
+        self.content_built = True
+        self.content_task = None
         
         # Основной layout
         self.main_layout = QVBoxLayout(self)
@@ -253,7 +628,82 @@ class CollapsibleSection(QWidget):
             widget: Виджет для добавления в содержимое.
         """
         self.content_layout.addWidget(widget)
+    
+    def set_content_builder(self, builder):
+        """
+        Откладывает создание содержимого до первого раскрытия секции.
+        
+        Args:
+            builder: Генератор builder(section), заполняющий секцию через add_content
+                и уступающий управление (yield) между небольшими частями работы.
+        """
+        self.content_builder = builder
+        self.content_built = False
+        self.content_task = None
+    
+    def content_steps(self):
+        """
+        Создает отложенное содержимое по частям: одна часть на каждый yield.
         
+        Начатое построение продолжается с того места, где остановилось,
+        поэтому его можно начать в простое и закончить при раскрытии.
+        """
+        while not self.content_built:
+            if self.content_task is None:
+                self.content_task = self.content_builder(self)
+            try:
+                next(self.content_task)
+            except StopIteration:
+                self.content_task = None
+                self.content_built = True
+                return
+            yield
+    
+    def ensure_content(self):
+        """
+        Создает (или достраивает) отложенное содержимое, если оно еще не создано.
+        """
+        for _ in self.content_steps():
+            pass
+    
+    def release_content(self):
+        """
+        Удаляет отложенное содержимое свернутой секции; при раскрытии оно создается заново.
+        """
+        if self.content_builder is None or self.toggle_button.isChecked():
+            return
+        if not self.content_built and self.content_task is None:
+            return
+        if self.content_task is not None:
+            self.content_task.close()
+            self.content_task = None
+        while self.content_layout.count():
+            item = self.content_layout.takeAt(0)
+            if item.widget():
+                item.widget().deleteLater()
+        self.content_built = False
+        
+    def expand_immediately(self):
+        """
+        Раскрывает секцию без анимации (используется при переходе к шагу).
+        """
+        self.ensure_content()
+        self.toggle_animation.stop()
+        self.content_area.setMaximumHeight(self.content_widget.sizeHint().height())
+        self.toggle_button.setChecked(True)
+        if self.bit_animation:
+            self.bit_animation.play()
+
+    def collapse_immediately(self):
+        """
+        Сворачивает секцию без анимации.
+        """
+        self.toggle_animation.stop()
+        self.content_area.setMaximumHeight(0)
+        self.toggle_button.setChecked(False)
+        if self.bit_animation:
+            self.bit_animation.stop()
+
     def toggle_content(self, checked):
         """
         Показывает/скрывает содержимое секции.
@@ -274,11 +724,14 @@ class CollapsibleSection(QWidget):
         
         Анимирует раскрытие содержимого и устанавливает кнопку в нажатое состояние.
         """
+        self.ensure_content()
         content_height = self.content_widget.sizeHint().height()
         self.animation.setEndValue(content_height)
         self.toggle_animation.setDirection(QAbstractAnimation.Direction.Forward)
         self.toggle_animation.start()
         self.toggle_button.setChecked(True)
+        if self.bit_animation:
+            self.bit_animation.play()
     
     def hide_content(self):
         """
@@ -290,6 +743,8 @@ class CollapsibleSection(QWidget):
         self.toggle_animation.setDirection(QAbstractAnimation.Direction.Backward)
         self.toggle_animation.start()
         self.toggle_button.setChecked(False)
+        if self.bit_animation:
+            self.bit_animation.stop()
         
     def add_text(self, text):
         """
@@ -305,6 +760,56 @@ class CollapsibleSection(QWidget):
         label.setWordWrap(True)
         label.setFont(QFont("Consolas", 14))  # Увеличил размер с 11 до 14
         self.add_content(label)
+    
+    def add_bit_animation(self, records, step_index, text=""):
+        """
+        Добавляет анимированную побитовую визуализацию шага.
+        
+        Анимация запускается при раскрытии секции и останавливается
+        при ее сворачивании.
+        
+        Args:
+            records: Записи шагов блока.
+            step_index: Номер шага в блоке (0-63).
+            text: Текстовое описание шага (показывается во всплывающей подсказке).
+        """
+        self.bit_animation = BitOperationWidget(records, step_index)
+        if text:
+            self.bit_animation.setToolTip(text)
+        self.add_content(self.bit_animation)
+
+def child_sections(section):
+    """
+    Возвращает вложенные секции первого уровня в порядке добавления.
+    """
+    return [section.content_layout.itemAt(index).widget()
+            for index in range(section.content_layout.count())
+            if isinstance(section.content_layout.itemAt(index).widget(), CollapsibleSection)]
+
+def iter_document_text(document, chunk_chars=TEXT_CHUNK_CHARS):
+    """
+    Читает текст документа редактора порциями по строкам.
+
+    В отличие от toPlainText() не создает копию всего текста. Строка
+    длиннее порции отдается кусками по chunk_chars символов, поэтому
+    кодируется не больше порции за раз.
+    """
+    parts = []
+    size = 0
+    block = document.begin()
+    while block.isValid():
+        line = block.text()
+        block = block.next()
+        pieces = (line[start:start + chunk_chars] for start in range(0, len(line), chunk_chars))
+        for piece in chain(pieces, ["\n"] if block.isValid() else []):
+            parts.append(piece)
+            size += len(piece)
+            if size >= chunk_chars:
+                yield "".join(parts)
+                parts = []
+                size = 0
+    if parts:
+        yield "".join(parts)
 
 class MD5VisualizerWindow(QMainWindow):
     """
@@ -344,11 +849,74 @@ class MD5VisualizerWindow(QMainWindow):
         exit_action.setShortcut("Ctrl+Q")
         exit_action.triggered.connect(QApplication.quit)
         
+        open_action = QAction("Открыть текстовый файл...", self)
+        open_action.setShortcut("Ctrl+O")
+        open_action.triggered.connect(self.open_text_file)
+        
+        hash_file_action = QAction("Хешировать файл с возобновлением...", self)
+        hash_file_action.triggered.connect(self.hash_file_with_checkpoint)
+        
+        file_menu.addAction(open_action)
+        file_menu.addAction(hash_file_action)
         file_menu.addAction(save_action)
         file_menu.addAction(copy_action)
         file_menu.addSeparator()
         file_menu.addAction(exit_action)
         
+        # Меню настроек
+        settings_menu = menubar.addMenu("Настройки")
+        
+        budget_action = QAction("Лимит памяти трассировки...", self)
+        budget_action.triggered.connect(self.set_memory_budget)
+        
+        settings_menu.addAction(budget_action)
+        
+        selection_action = QAction("Выборочная трассировка...", self)
+        selection_action.triggered.connect(self.set_trace_selection)
+        
+        settings_menu.addAction(selection_action)
+        
+        # Меню инструментов
+        tools_menu = menubar.addMenu("Инструменты")
+        
+        diff_action = QAction("Сравнение трасс...", self)
+        diff_action.triggered.connect(self.show_trace_diff_dialog)
+        
+        tools_menu.addAction(diff_action)
+        
+        pin_action = QAction("Закрепить шаг...", self)
+        pin_action.setShortcut("Ctrl+P")
+        pin_action.triggered.connect(self.ask_pin_step)
+        
+        tools_menu.addAction(pin_action)
+        
+        self.hmac_action = QAction("Режим HMAC-MD5...", self)
+        self.hmac_action.setCheckable(True)
+        self.hmac_action.triggered.connect(self.toggle_hmac_mode)
+        
+        tools_menu.addAction(self.hmac_action)
+        
+        differential_action = QAction("Дифференциальный эксперимент...", self)
+        differential_action.triggered.connect(self.show_differential_dialog)
+        
+        tools_menu.addAction(differential_action)
+        
+        # Очередь заданий в боковой панели
+        self.job_manager = JobManager(TraceStore(DEFAULT_MEMORY_BUDGET_MB * 1024 * 1024))
+        self.jobs_panel = JobsPanel(self.job_manager)
+        self.jobs_panel.show_requested.connect(self.show_job)
+        self.jobs_panel.add_input_requested.connect(self.queue_current_input)
+        self.jobs_panel.add_files_requested.connect(self.queue_text_files)
+        
+        self.jobs_dock = QDockWidget("Очередь заданий", self)
+        self.jobs_dock.setWidget(self.jobs_panel)
+        self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.jobs_dock)
+        self.jobs_dock.hide()
+        
+        jobs_action = self.jobs_dock.toggleViewAction()
+        jobs_action.setShortcut("Ctrl+J")
+        tools_menu.addAction(jobs_action)
+        
         # Меню помощи
         help_menu = menubar.addMenu("Помощь")
         
@@ -384,11 +952,63 @@ class MD5VisualizerWindow(QMainWindow):
         self.reset_button.clicked.connect(self.reset_visualization)
         self.reset_button.setSizePolicy(QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Fixed)
         
+        self.live_checkbox = QCheckBox("Живой ввод")
+        self.live_checkbox.setToolTip("Пересчитывать хеш автоматически при изменении текста")
+        self.live_checkbox.toggled.connect(self.toggle_live_mode)
+        
+        # Таймер для отложенного пересчета в режиме живого ввода
+        self.live_timer = QTimer(self)
+        self.live_timer.setSingleShot(True)
+        self.live_timer.timeout.connect(self.live_update)
+        
+        self.multiline_checkbox = QCheckBox("Многострочный ввод")
+        self.multiline_checkbox.setToolTip("Вводить текст в многострочном редакторе")
+        self.multiline_checkbox.toggled.connect(self.toggle_multiline_mode)
+        
         input_layout.addWidget(self.input_field)
+        input_layout.addWidget(self.live_checkbox)
+        input_layout.addWidget(self.multiline_checkbox)
         input_layout.addWidget(self.hash_button)
         input_layout.addWidget(self.reset_button)
         
         input_frame.layout.addLayout(input_layout)
+        
+        # Многострочный редактор; текст подается в хешер порциями
+        self.text_editor = QPlainTextEdit()
+        self.text_editor.setPlaceholderText("Введите или вставьте текст для хеширования...")
+        self.text_editor.setFont(QFont("Consolas", 11))
+        self.text_editor.hide()
+        input_frame.layout.addWidget(self.text_editor)
+        
+        # Открытый текстовый файл читается с диска при каждом вычислении
+        file_layout = QHBoxLayout()
+        self.file_label = QLabel()
+        self.file_label.setWordWrap(True)
+        self.close_file_button = QPushButton("Закрыть файл")
+        self.close_file_button.clicked.connect(self.close_text_file)
+        file_layout.addWidget(self.file_label, 1)
+        file_layout.addWidget(self.close_file_button)
+        self.file_bar = QWidget()
+        self.file_bar.setLayout(file_layout)
+        self.file_bar.hide()
+        input_frame.layout.addWidget(self.file_bar)
+        self.input_file = None
+        
+        # В режиме HMAC-MD5 ввод хешируется с ключом
+        hmac_layout = QHBoxLayout()
+        self.hmac_label = QLabel()
+        self.hmac_label.setWordWrap(True)
+        hmac_off_button = QPushButton("Отключить HMAC")
+        hmac_off_button.clicked.connect(lambda: self.toggle_hmac_mode(False))
+        hmac_layout.addWidget(self.hmac_label, 1)
+        hmac_layout.addWidget(hmac_off_button)
+        self.hmac_bar = QWidget()
+        self.hmac_bar.setLayout(hmac_layout)
+        self.hmac_bar.hide()
+        input_frame.layout.addWidget(self.hmac_bar)
+        self.hmac_key = None
+        # Параметры наложения разностей сокращенного MD5 на шаг 4
+        self.difference_overlay = None
         main_layout.addWidget(input_frame)
 
         # Секция визуализации
@@ -417,6 +1037,36 @@ class MD5VisualizerWindow(QMainWindow):
         
         viz_frame.layout.addLayout(nav_layout)
         
+        # Поиск по трассе
+        search_layout = QHBoxLayout()
+        self.search_field = QLineEdit()
+        self.search_field.setPlaceholderText("Поиск: 0x1234abcd, M[7] или блок раунд шаг (например: 500 3 12)")
+        self.search_field.returnPressed.connect(self.search_trace)
+        self.search_button = QPushButton("Найти")
+        self.search_button.clicked.connect(self.search_trace)
+        self.search_status = QLabel()
+        search_layout.addWidget(self.search_field)
+        search_layout.addWidget(self.search_button)
+        search_layout.addWidget(self.search_status)
+        viz_frame.layout.addLayout(search_layout)
+        
+        # Постраничный просмотр байтов на шаге 1 для потокового ввода
+        page_layout = QHBoxLayout()
+        page_layout.setContentsMargins(0, 0, 0, 0)
+        self.prev_page_button = QPushButton("◀ Страница")
+        self.prev_page_button.clicked.connect(lambda: self.turn_bytes_page(-1))
+        self.next_page_button = QPushButton("Страница ▶")
+        self.next_page_button.clicked.connect(lambda: self.turn_bytes_page(1))
+        self.page_label = QLabel()
+        self.page_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        page_layout.addWidget(self.prev_page_button)
+        page_layout.addWidget(self.page_label, 1)
+        page_layout.addWidget(self.next_page_button)
+        self.page_bar = QWidget()
+        self.page_bar.setLayout(page_layout)
+        self.page_bar.hide()
+        viz_frame.layout.addWidget(self.page_bar)
+        
         # Прогресс-бар для отображения процесса вычисления
         self.progress_bar = QProgressBar()
         self.progress_bar.setMaximum(100)
@@ -426,28 +1076,26 @@ class MD5VisualizerWindow(QMainWindow):
         self.progress_bar.hide()
         viz_frame.layout.addWidget(self.progress_bar)
         
+        # Метка с уровнем детализации трассы
+        self.detail_label = QLabel()
+        self.detail_label.setObjectName("detailLabel")
+        self.detail_label.setWordWrap(True)
+        self.detail_label.hide()
+        viz_frame.layout.addWidget(self.detail_label)
+        
         # Создаем область прокрутки
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
-        scroll_area.setFrameShape(QFrame.Shape.NoFrame)  # Убираем границы
+        self.scroll_area = QScrollArea()
+        self.scroll_area.setWidgetResizable(True)
+        self.scroll_area.setFrameShape(QFrame.Shape.NoFrame)  # Убираем границы
         
         # Создаем контейнер для содержимого
         content_widget = QWidget()
         self.content_layout = QVBoxLayout(content_widget)
         self.content_layout.setSpacing(15)
         
-        # Виджет для текстовой визуализации
-        self.visualization = QLabel()
-        self.visualization.setWordWrap(True)
-        self.visualization.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop)
-        self.visualization.setTextFormat(Qt.TextFormat.PlainText)
-        self.visualization.setFont(QFont("Consolas", 15))  # Увеличил размер с 12 до 15
-        self.visualization.setStyleSheet("""
-            padding: 20px;
-            line-height: 1.5;
-            background: transparent;
-            color: #333333;
-        """)
+        # Текстовые шаги показываются отдельными метками (make_text_view), которые
+        # создаются заранее для соседних шагов и хранятся в step_views
+        self.step_views = {}
         
         # Контейнер для блоков раундов (создается динамически)
         self.rounds_container = QWidget()
@@ -456,12 +1104,19 @@ class MD5VisualizerWindow(QMainWindow):
         self.rounds_layout.setSpacing(10)
         self.rounds_container.hide()
         
-        self.content_layout.addWidget(self.visualization)
         self.content_layout.addWidget(self.rounds_container)
         self.content_layout.addStretch()  # Добавляем растяжку снизу
         
-        scroll_area.setWidget(content_widget)
-        viz_frame.layout.addWidget(scroll_area)
+        self.scroll_area.setWidget(content_widget)
+        
+        # Закрепленные шаги показываются под основной областью в разделенном окне
+        self.pinned_view = PinnedStepsView()
+        self.trace_model = None
+        
+        viz_splitter = QSplitter(Qt.Orientation.Vertical)
+        viz_splitter.addWidget(self.scroll_area)
+        viz_splitter.addWidget(self.pinned_view)
+        viz_frame.layout.addWidget(viz_splitter)
         
         main_layout.addWidget(viz_frame, 1)
 
@@ -469,6 +1124,23 @@ class MD5VisualizerWindow(QMainWindow):
         self.current_step = 0
         self.steps = []
         self.collapsible_sections = []
+        self.rounds_view_data = None
+        self.rounds_built = 0
+        self.rounds_complete = False
+        self.focus_block_position = 0
+        self.page_texts = OrderedDict()
+        self.page_texts_step = None
+        self.idle_worker = IdleWorker(parent=self)
+        self.memory_budget_mb = DEFAULT_MEMORY_BUDGET_MB
+        self.block_selection = ""
+        self.detail_override = None
+        self.trace_cache = None
+        # Байты и строки символов шага 1 предыдущего вычисления (для живого ввода)
+        self.char_lines_cache = None
+        self.trace_index = TraceIndex()
+        self.search_query = None
+        self.search_results = []
+        self.search_position = 0
         self.update_navigation_buttons()
 
     def update_navigation_buttons(self):
@@ -522,145 +1194,653 @@ class MD5VisualizerWindow(QMainWindow):
         - Текстовые данные отображаются в виде текста
         - Структурированные данные о раундах и блоках отображаются
           с использованием раскрывающихся секций
+        
+        Если представление шага уже построено заранее, оно только показывается.
+        После показа в простое готовятся представления соседних шагов.
         """
         if not self.steps:
             return
-            
-        step_data = self.steps[self.current_step]
         
-        # Проверяем тип данных шага
-        if isinstance(step_data, str):
-            # Обычный текстовый шаг
-            self.visualization.setText(step_data)
-            self.visualization.show()
+        self.idle_worker.clear()
+        step_data = self.steps[self.current_step]
+        is_pages = isinstance(step_data, dict) and step_data.get('type') == 'bytes_pages'
+        self.page_bar.setVisible(is_pages)
+        
+        view = self.step_view(self.current_step)
+        for other in self.step_views.values():
+            if other is not view:
+                other.hide()
+        if view is not self.rounds_container:
             self.rounds_container.hide()
-        elif isinstance(step_data, dict) and step_data.get('type') == 'rounds':
-            # Структурированные данные для шага 4 (обработка блоков)
-            self.visualization.hide()
-            self.rounds_container.show()
-            
-            # Очищаем предыдущие секции
-            for section in self.collapsible_sections:
-                self.rounds_layout.removeWidget(section)
-                section.deleteLater()
-            self.collapsible_sections.clear()
-            
-            # Добавляем заголовок для шага 4
-            step_title = QLabel("Шаг 4: Обработка блоков данных")
-            step_title.setObjectName("title")
-            step_title.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.rounds_layout.addWidget(step_title)
-            
-            # Добавляем начальные значения буферов (перед всеми блоками)
-            if step_data.get('initial_buffers'):
-                buffers_label = QLabel(f"Исходные значения буферов:\n"
-                                     f"A = {step_data['initial_buffers'][0]:#010x}, "
-                                     f"B = {step_data['initial_buffers'][1]:#010x}, "
-                                     f"C = {step_data['initial_buffers'][2]:#010x}, "
-                                     f"D = {step_data['initial_buffers'][3]:#010x}")
-                buffers_label.setFont(QFont("Consolas", 11))
-                buffers_label.setWordWrap(True)
-                buffers_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-                buffers_label.setStyleSheet("margin: 10px; padding: 10px;")
-                self.rounds_layout.addWidget(buffers_label)
-            
-            # Создаем новые секции для блоков и раундов
-            blocks_data = step_data.get('blocks', [])
-            
-            for block_idx, block_data in enumerate(blocks_data):
-                # Секция для блока
-                block_section = CollapsibleSection(f"Блок {block_idx + 1}")
-                
-                # Информация о блоке данных
-                block_info = QLabel(f"Данные блока:\n{block_data['block_hex']}")
-                block_info.setFont(QFont("Consolas", 14))  # Увеличил размер с 11 до 14
-                block_info.setWordWrap(True)
-                block_section.add_content(block_info)
-                
-                # Секции для раундов внутри блока
-                for round_idx, round_data in enumerate(block_data['rounds']):
-                    round_section = CollapsibleSection(f"Раунд {round_idx + 1}")
-                    
-                    # Добавляем 16 подвкладок для каждого шага в раунде
-                    step_data_list = round_data['steps']
-                    for step_idx, step_info in enumerate(step_data_list):
-                        step_section = CollapsibleSection(f"Шаг {step_idx + 1}")
-                        step_section.add_text(step_info)
-                        round_section.add_content(step_section)
-                    
-                    block_section.add_content(round_section)
-                
-                # Добавляем информацию о буферах после обработки блока
-                if 'final_buffers' in block_data:
-                    buffers = block_data['final_buffers']
-                    block_buffers = QLabel(f"\nБуферы после обработки блока {block_idx + 1}:\n"
-                                          f"A = {buffers[0]:#010x}, "
-                                          f"B = {buffers[1]:#010x}, "
-                                          f"C = {buffers[2]:#010x}, "
-                                          f"D = {buffers[3]:#010x}")
-                    block_buffers.setFont(QFont("Consolas", 14))  # Увеличил размер с 11 до 14
-                    block_buffers.setWordWrap(True)
-                    block_section.add_content(block_buffers)
-                
-                self.collapsible_sections.append(block_section)
-                self.rounds_layout.addWidget(block_section)
-            
-            # Добавляем финальный хэш, если есть
-            if 'final_hash' in step_data:
-                final_section = CollapsibleSection("Итоговый результат")
-                final_section.add_text(step_data['final_hash'])
-                self.collapsible_sections.append(final_section)
-                self.rounds_layout.addWidget(final_section)
+        view.show()
         
-        else:
-            # Запасной вариант для неизвестного формата
-            self.visualization.setText(str(step_data))
-            self.visualization.show()
-            self.rounds_container.hide()
+        if is_pages:
+            pages = max(1, -(-step_data['length'] // PAGE_BYTES))
+            self.page_label.setText(f"Страница {step_data['page'] + 1}/{pages}")
+            self.prev_page_button.setEnabled(step_data['page'] > 0)
+            self.next_page_button.setEnabled(step_data['page'] < pages - 1)
+        
+        self.evict_step_views()
+        self.schedule_prerender()
 
-    def store_step(self, text):
+    def step_view(self, index):
         """
-        Сохраняет текстовый шаг визуализации.
+        Возвращает представление шага, создавая или обновляя его при необходимости.
+        
+        Для шага 4 представлением служит контейнер секций блоков; сразу
+        создаются только первые VISIBLE_BLOCK_SECTIONS секций.
         
         Args:
-            text: Текстовое представление шага визуализации.
+            index: Номер шага.
+            
+        Returns:
+            QWidget: Скрытое или уже показанное представление шага.
         """
-        self.steps.append(f"{text}\n")
+        step_data = self.steps[index]
+        if isinstance(step_data, dict) and step_data.get('type') == 'rounds':
+            self.ensure_rounds_view(step_data, VISIBLE_BLOCK_SECTIONS)
+            return self.rounds_container
+        
+        # Представление актуально, пока шаг не пересчитан и не перелистана страница
+        page = step_data.get('page') if isinstance(step_data, dict) else None
+        view = self.step_views.get(index)
+        if view is None:
+            view = self.step_views[index] = self.make_text_view()
+        elif view.step_data is step_data and view.page == page:
+            return view
+        view.setText(self.step_text(step_data))
+        view.step_data = step_data
+        view.page = page
+        return view
+
+    def make_text_view(self):
+        """
+        Создает скрытую метку для текстового шага.
+        """
+        view = QLabel()
+        view.setWordWrap(True)
+        view.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop)
+        view.setTextFormat(Qt.TextFormat.PlainText)
+        view.setFont(QFont("Consolas", 15))  # Увеличил размер с 12 до 15
+        view.setStyleSheet("""
+            padding: 20px;
+            line-height: 1.5;
+            background: transparent;
+            color: #333333;
+        """)
+        view.hide()
+        self.content_layout.insertWidget(0, view)
+        return view
+
+    def step_text(self, step_data):
+        """
+        Возвращает текст текстового шага или страницы байтов шага 1.
+        """
+        if isinstance(step_data, str):
+            return step_data
+        if isinstance(step_data, dict) and step_data.get('type') == 'bytes_pages':
+            # Байты потокового ввода показываются постранично
+            return self.bytes_page_text(step_data)
+        # Запасной вариант для неизвестного формата
+        return str(step_data)
+
+    def evict_step_views(self):
+        """
+        Удаляет представления шагов, далеких от текущего.
         
-    def store_structured_step(self, step_data):
+        Хранится не больше 2 * PRERENDER_RADIUS + 1 представлений: текущее
+        и соседние, которые понадобятся при следующем переходе.
         """
-        Сохраняет структурированный шаг для визуализации раундов.
+        for index in list(self.step_views):
+            if index >= len(self.steps) or abs(index - self.current_step) > PRERENDER_RADIUS:
+                self.remove_step_view(index)
+        rounds_step = self.rounds_step_index()
+        if (self.rounds_view_data is not None
+                and (rounds_step is None or abs(rounds_step - self.current_step) > PRERENDER_RADIUS)):
+            self.idle_worker.submit(self.release_rounds_view(self.rounds_view_data))
+
+    def release_rounds_view(self, step_data):
+        """
+        Задача простоя: удаляет секции скрытого шага 4 по одной с конца.
+        
+        У раскрытых блоков тысячи виджетов, поэтому удаление разбито
+        на порции; если шаг 4 снова показан, удаление прекращается,
+        а недостающие секции достраиваются заново.
+        """
+        while self.rounds_view_data is step_data and self.rounds_container.isHidden():
+            if not self.collapsible_sections:
+                self.clear_rounds_layout()
+                return
+            section = self.collapsible_sections.pop()
+            self.rounds_layout.removeWidget(section)
+            section.deleteLater()
+            self.rounds_built = min(self.rounds_built, len(self.collapsible_sections))
+            self.rounds_complete = False
+            yield True
+
+    def remove_step_view(self, index):
+        view = self.step_views.pop(index)
+        self.content_layout.removeWidget(view)
+        view.deleteLater()
+
+    def clear_step_views(self, keep_rounds=False):
+        """
+        Удаляет все представления шагов и отменяет их фоновую подготовку.
         
         Args:
-            step_data: Словарь с данными о блоках и раундах.
+            keep_rounds: Сохранить секции шага 4 (для частичного обновления в живом режиме).
         """
-        self.steps.append(step_data)
+        self.idle_worker.clear()
+        for index in list(self.step_views):
+            self.remove_step_view(index)
+        self.page_texts.clear()
+        self.page_texts_step = None
+        if not keep_rounds:
+            self.clear_rounds_layout()
+            self.rounds_container.hide()
 
-    def calculate_md5(self):
+    def rounds_step_index(self):
+        return next((index for index, step in enumerate(self.steps)
+                     if isinstance(step, dict) and step.get('type') == 'rounds'), None)
+
+    def schedule_prerender(self):
         """
-        Вычисляет MD5-хеш и создает пошаговую визуализацию.
+        Ставит в очередь простоя подготовку текущего и соседних шагов.
         
-        Берет текст из поля ввода, выполняет последовательные шаги алгоритма MD5
-        и создает визуализацию каждого шага:
-        1. Преобразование текста в байты
-        2. Добавление padding
-        3. Инициализация буферов
-        4. Обработка блоков
-        5. Формирование финального хеша
+        На шаге 4 сначала готовится содержимое блоков рядом с текущим
+        и достраиваются заголовки остальных блоков; затем готовятся
+        следующий и предыдущий шаги и соседние страницы байтов шага 1.
+        """
+        current = self.current_step
+        step_data = self.steps[current]
+        if isinstance(step_data, dict) and step_data.get('type') == 'rounds':
+            self.idle_worker.submit(self.prefetch_block_contents(step_data))
+            self.idle_worker.submit(self.prerender_rounds(step_data))
+        for index in (current + 1, current - 1):
+            if 0 <= index < len(self.steps):
+                self.idle_worker.submit(self.prerender_step(index))
+        if isinstance(step_data, dict) and step_data.get('type') == 'bytes_pages':
+            self.idle_worker.submit(self.prefetch_pages(step_data))
+
+    def prerender_step(self, index):
+        """
+        Задача простоя: строит скрытое представление шага index.
+        """
+        step_data = self.steps[index]
+        if isinstance(step_data, dict) and step_data.get('type') == 'rounds':
+            yield from self.prerender_rounds(step_data)
+            return
+        view = self.step_view(index)
+        yield
+        # Раскладка длинного текста считается заранее и кэшируется меткой
+        if view.step_data is step_data:
+            view.heightForWidth(self.scroll_area.viewport().width())
+
+    def prerender_rounds(self, step_data):
+        """
+        Задача простоя: достраивает секции шага 4 по одному блоку за единицу работы.
         
-        Отображает прогресс выполнения с помощью прогресс-бара.
+        Создаются только заголовки блоков; раунды и шаги блока создаются
+        при раскрытии или в prefetch_block_contents.
         """
-        self.visualization.clear()
-        self.steps = []
-        self.current_step = 0
-        text = self.input_field.text()
+        if self.rounds_view_data is not step_data:
+            self.ensure_rounds_view(step_data, 0)
+            yield
+        # Шаг мог быть пересчитан, пока задача ждала своей очереди
+        while self.rounds_view_data is step_data and not self.rounds_complete:
+            self.build_block_sections(self.rounds_built + 1)
+            yield
 
-        if not text:
-            # Спрашиваем у пользователя подтверждение для хеширования пустой строки
-            confirm = QMessageBox()
-            confirm.setWindowTitle("Подтверждение")
-            confirm.setText("Вы собираетесь вычислить MD5-хеш для пустой строки.")
-            confirm.setInformativeText("Продолжить?")
+    def prefetch_pages(self, step_data):
+        """
+        Задача простоя: заранее читает соседние страницы байтов шага 1.
+        """
+        pages = max(1, -(-step_data['length'] // PAGE_BYTES))
+        for delta in (1, -1):
+            if self.steps[self.current_step] is not step_data:
+                return
+            page_index = step_data['page'] + delta
+            if 0 <= page_index < pages:
+                self.bytes_page_text(step_data, page_index)
+                yield
+
+    def ensure_rounds_view(self, step_data, count=None):
+        """
+        Готовит контейнер шага 4 для step_data и достраивает в нем секции до count.
+        
+        Args:
+            step_data: Структурированные данные шага 4.
+            count: Сколько секций блоков должно быть создано (None - все).
+        """
+        if self.rounds_view_data is not step_data:
+            self.clear_rounds_layout()
+            self.begin_rounds_view(step_data)
+        self.build_block_sections(count)
+
+    def begin_rounds_view(self, step_data):
+        """
+        Создает заголовок шага 4; секции блоков добавляются build_block_sections.
+        """
+        self.rounds_view_data = step_data
+        self.rounds_built = 0
+        self.rounds_complete = False
+        self.focus_block_position = 0
+        
+        # Добавляем заголовок для шага 4
+        step_title = QLabel("Шаг 4: Обработка блоков данных")
+        step_title.setObjectName("title")
+        step_title.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.rounds_layout.addWidget(step_title)
+        
+        detail = step_data.get('detail', DETAIL_FULL)
+        if detail != DETAIL_FULL:
+            detail_note = QLabel(f"Детализация трассы: {DETAIL_LEVEL_NAMES[detail]}")
+            detail_note.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            self.rounds_layout.addWidget(detail_note)
+        
+        # Добавляем начальные значения буферов (перед всеми блоками)
+        if step_data.get('initial_buffers'):
+            buffers_label = QLabel(f"Исходные значения буферов:\n"
+                                 f"A = {step_data['initial_buffers'][0]:#010x}, "
+                                 f"B = {step_data['initial_buffers'][1]:#010x}, "
+                                 f"C = {step_data['initial_buffers'][2]:#010x}, "
+                                 f"D = {step_data['initial_buffers'][3]:#010x}")
+            buffers_label.setFont(QFont("Consolas", 11))
+            buffers_label.setWordWrap(True)
+            buffers_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            buffers_label.setStyleSheet("margin: 10px; padding: 10px;")
+            self.rounds_layout.addWidget(buffers_label)
+        
+        total_blocks = step_data.get('total_blocks', len(step_data['blocks']))
+        if total_blocks > len(step_data['blocks']):
+            limit_note = QLabel(self.trace_coverage_text(step_data))
+            limit_note.setWordWrap(True)
+            limit_note.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            self.rounds_layout.addWidget(limit_note)
+
+    def clear_rounds_layout(self):
+        """
+        Удаляет все виджеты из контейнера шага 4.
+        """
+        while self.rounds_layout.count():
+            item = self.rounds_layout.takeAt(0)
+            if item.widget():
+                item.widget().deleteLater()
+        self.collapsible_sections.clear()
+        self.rounds_view_data = None
+        self.rounds_built = 0
+        self.rounds_complete = False
+
+    def create_block_section(self, block_idx, block_data, start_buffers):
+        """
+        Создает раскрывающуюся секцию для одного блока данных.
+        
+        Args:
+            block_idx: Номер блока (с нуля).
+            block_data: Структурированные данные блока.
+            start_buffers: Буферы перед обработкой блока.
+            
+        Returns:
+            CollapsibleSection: Секция блока; раунды и шаги создаются при первом
+            раскрытии или заранее в простое (prefetch_block_contents).
+        """
+        # При выборочной трассе номер блока в сообщении отличается от позиции секции
+        block_number = block_data.get('block_index', block_idx)
+        block_section = CollapsibleSection(block_data.get('label', f"Блок {block_number + 1}"))
+        block_section.set_content_builder(
+            lambda section: self.fill_block_section(section, block_idx, block_data, start_buffers))
+        block_section.toggle_button.clicked.connect(lambda checked: self.focus_block(block_idx))
+        return block_section
+
+    def fill_block_section(self, block_section, block_idx, block_data, start_buffers):
+        """
+        Заполняет секцию блока данными, раундами и шагами.
+        
+        Генератор: уступает управление после каждых STEP_SECTIONS_PER_SLICE
+        секций шагов, чтобы построение в простое не задерживало интерфейс.
+        
+        Args:
+            block_section: Секция блока.
+            block_idx: Позиция блока в трассе (с нуля).
+            block_data: Структурированные данные блока.
+            start_buffers: Буферы перед обработкой блока.
+        """
+        block_number = block_data.get('block_index', block_idx)
+        
+        # Информация о блоке данных
+        block_info = QLabel(f"Данные блока:\n{block_data['block_hex']}")
+        block_info.setFont(QFont("Consolas", 14))  # Увеличил размер с 11 до 14
+        block_info.setWordWrap(True)
+        block_section.add_content(block_info)
+        
+        # Записи шагов для побитовой анимации (только при полной детализации)
+        block = bytes.fromhex(block_data['block_hex'].replace('-', ''))
+        records = None
+        if any(round_data['steps'] for round_data in block_data['rounds']):
+            records = md5_step_records(block, start_buffers)
+        yield
+        
+        # Разности пары в сокращенном варианте (Инструменты → Дифференциальный эксперимент)
+        differences = None
+        if self.difference_overlay:
+            overlay = self.difference_overlay
+            differences = pair_step_differences(block, start_buffers, overlay['steps'], overlay['functions'],
+                                                overlay['delta'], overlay['kind'])
+            block_section.add_text(self.difference_block_text(differences))
+        
+        # Секции для раундов внутри блока
+        for round_idx, round_data in enumerate(block_data['rounds']):
+            round_section = CollapsibleSection(f"Раунд {round_idx + 1}")
+            
+            # Добавляем 16 подвкладок для каждого шага в раунде
+            step_data_list = round_data['steps']
+            for step_idx, step_info in enumerate(step_data_list):
+                step_section = CollapsibleSection(f"Шаг {step_idx + 1}")
+                step_section.add_bit_animation(records, round_idx * 16 + step_idx, step_info)
+                if differences is not None:
+                    step_section.add_text(self.difference_step_text(differences, round_idx * 16 + step_idx))
+                self.enable_pin_menu(step_section, (block_idx, round_idx, step_idx))
+                round_section.add_content(step_section)
+                if (step_idx + 1) % STEP_SECTIONS_PER_SLICE == 0:
+                    yield
+            
+            # При сокращенной детализации вместо шагов - сводка раунда
+            if round_data.get('summary'):
+                round_section.add_text(round_data['summary'])
+                if differences is not None:
+                    round_section.add_text("\n".join(self.difference_step_text(differences, round_idx * 16 + step)
+                                                     for step in range(16)))
+                self.enable_pin_menu(round_section, (block_idx, round_idx, 0))
+            
+            block_section.add_content(round_section)
+            yield
+        
+        # Добавляем информацию о буферах после обработки блока
+        if 'final_buffers' in block_data:
+            buffers = block_data['final_buffers']
+            block_buffers = QLabel(f"\nБуферы после обработки блока {block_number + 1}:\n"
+                                  f"A = {buffers[0]:#010x}, "
+                                  f"B = {buffers[1]:#010x}, "
+                                  f"C = {buffers[2]:#010x}, "
+                                  f"D = {buffers[3]:#010x}")
+            block_buffers.setFont(QFont("Consolas", 14))  # Увеличил размер с 11 до 14
+            block_buffers.setWordWrap(True)
+            block_section.add_content(block_buffers)
+
+    def difference_block_text(self, differences):
+        """
+        Сводка разностей пары для блока: шаги, где разность гасится, и итоговый вес.
+        """
+        overlay = self.difference_overlay
+        delta_text = ", ".join(f"M[{word}] {value:#010x}" for word, value in sorted(overlay['delta'].items()))
+        cancelled = [str(step + 1) for step, difference in enumerate(differences) if difference['cancelled']]
+        lines = [
+            f"Пара с разностью {DIFFERENCE_NAMES[overlay['kind']]}: {delta_text}",
+            f"Вариант: {overlay['steps']} шагов, функции раундов {overlay['functions']}",
+            "Разность состояния погашена на шагах: " + (", ".join(cancelled) if cancelled else "нет"),
+            f"Вес разности состояния после шага {overlay['steps']}: {differences[-1]['weight']} бит"
+        ]
+        return "\n".join(lines)
+    
+    def difference_step_text(self, differences, step):
+        """
+        Разность пары после шага step (с нуля) и вероятность характеристики, если есть эксперимент.
+        """
+        if step >= len(differences):
+            return f"Шаг {step + 1}: не выполняется в варианте из {len(differences)} шагов"
+        difference = differences[step]
+        text = (f"Шаг {step + 1}: разность слова {difference['difference']:#010x}, "
+                f"вес состояния {difference['weight']}")
+        if difference['cancelled']:
+            text += ", разность погашена"
+        result = self.difference_overlay.get('result')
+        if result and result['trail'][step] is not None:
+            on_trail = "по характеристике" if difference['difference'] == result['trail'][step] else "вне характеристики"
+            text += f"; {on_trail}, P = {format_probability(result['trail_probability'][step])}"
+        return text
+    
+    def focus_block(self, position):
+        """
+        Запоминает блок, с которым работает пользователь, и готовит соседние блоки.
+        
+        Args:
+            position: Позиция секции блока на шаге 4.
+        """
+        self.focus_block_position = position
+        self.idle_worker.submit(self.prefetch_block_contents(self.rounds_view_data))
+
+    def prefetch_block_contents(self, step_data):
+        """
+        Задача простоя: заранее создает содержимое блоков рядом с текущим.
+        
+        Содержимое свернутых блоков дальше PRERENDER_RADIUS от текущего
+        удаляется, поэтому заранее построенных блоков всегда немного.
+        """
+        focus = self.focus_block_position
+        for position, section in enumerate(self.collapsible_sections[:self.rounds_built]):
+            if abs(position - focus) > PRERENDER_RADIUS:
+                section.release_content()
+        for position in range(max(0, focus - PRERENDER_RADIUS), focus + PRERENDER_RADIUS + 1):
+            # Шаг мог быть пересчитан или секции еще не достроены
+            if self.rounds_view_data is not step_data:
+                return
+            if position < self.rounds_built:
+                # Содержимое блока строится частями; при раскрытии секция достроит остаток сама
+                for _ in self.collapsible_sections[position].content_steps():
+                    yield
+                    if self.rounds_view_data is not step_data:
+                        return
+
+    def build_block_sections(self, count=None):
+        """
+        Достраивает секции блоков шага 4 до count и итоговую секцию после последнего блока.
+        
+        Args:
+            count: Сколько секций блоков должно быть создано (None - все).
+        """
+        step_data = self.rounds_view_data
+        blocks_data = step_data.get('blocks', [])
+        count = len(blocks_data) if count is None else min(count, len(blocks_data))
+        for block_idx in range(self.rounds_built, count):
+            block_section = self.create_block_section(block_idx, blocks_data[block_idx],
+                                                      block_start_buffers(step_data, block_idx))
+            self.collapsible_sections.append(block_section)
+            self.rounds_layout.addWidget(block_section)
+        self.rounds_built = max(self.rounds_built, count)
+        
+        if self.rounds_built < len(blocks_data) or self.rounds_complete:
+            return
+        self.rounds_complete = True
+        # Добавляем финальный хэш, если есть
+        if 'final_hash' in step_data:
+            final_section = CollapsibleSection("Итоговый результат")
+            final_section.add_text(step_data['final_hash'])
+            self.collapsible_sections.append(final_section)
+            self.rounds_layout.addWidget(final_section)
+
+    def enable_pin_menu(self, section, address):
+        """
+        Добавляет в контекстное меню заголовка секции пункт закрепления шага.
+        
+        Args:
+            section: Секция шага или раунда.
+            address: Кортеж (блок, раунд, шаг), нумерация с нуля.
+        """
+        button = section.toggle_button
+        button.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        button.customContextMenuRequested.connect(
+            lambda pos: self.show_pin_menu(button, pos, address))
+
+    def show_pin_menu(self, button, pos, address):
+        menu = QMenu(self)
+        pin_action = menu.addAction("Закрепить для сравнения")
+        if menu.exec(button.mapToGlobal(pos)) == pin_action:
+            self.pinned_view.pin(address)
+
+    def ask_pin_step(self):
+        """
+        Запрашивает адрес шага и закрепляет его в разделенном окне.
+        """
+        if self.trace_model is None or not self.trace_model.total_steps():
+            QMessageBox.information(self, "Информация", "Сначала вычислите хеш.")
+            return
+        text, ok = QInputDialog.getText(self, "Закрепить шаг", "Блок, раунд, шаг (например: 1 2 5):")
+        if not ok:
+            return
+        try:
+            block, round_index, step = (int(part) - 1 for part in text.replace(',', ' ').split())
+        except ValueError:
+            QMessageBox.warning(self, "Ошибка", "Введите три числа: блок, раунд и шаг.")
+            return
+        position = self.trace_model.position(block)
+        if position is None:
+            QMessageBox.warning(self, "Ошибка", f"Блок {block + 1} не трассировался.")
+            return
+        self.pinned_view.pin((position, round_index, step))
+
+    def search_trace(self):
+        """
+        Ищет шаг по значению регистра, слову сообщения или адресу.
+        
+        Повторный поиск с тем же запросом переходит к следующему совпадению.
+        """
+        query = self.search_field.text().strip()
+        if not query or self.trace_model is None:
+            return
+        
+        if query == self.search_query and self.search_results:
+            self.search_position = (self.search_position + 1) % len(self.search_results)
+        else:
+            self.search_query = query
+            self.search_results = self.trace_index.search(query)
+            self.search_position = 0
+        
+        if not self.search_results:
+            self.search_status.setText("Не найдено")
+            return
+        
+        self.search_status.setText(f"{self.search_position + 1}/{len(self.search_results)}")
+        self.jump_to_address(self.search_results[self.search_position])
+
+    def jump_to_address(self, address):
+        """
+        Переходит к шагу 4 и раскрывает секции блока, раунда и шага.
+        
+        Args:
+            address: Кортеж (блок, раунд, шаг), нумерация с нуля.
+        """
+        rounds_step = self.rounds_step_index()
+        if self.current_step != rounds_step or self.rounds_container.isHidden():
+            self.current_step = rounds_step
+            self.display_current_step()
+            self.update_navigation_buttons()
+        
+        block, round_index, step = address
+        position = self.trace_model.position(block)
+        # Секция могла еще не быть достроена в простое
+        self.build_block_sections(position + 1)
+        block_section = self.collapsible_sections[position]
+        block_section.ensure_content()
+        self.focus_block(position)
+        sections = [block_section]
+        round_sections = child_sections(block_section)
+        if round_index < len(round_sections):
+            sections.append(round_sections[round_index])
+            step_sections = child_sections(round_sections[round_index])
+            if step < len(step_sections):
+                sections.append(step_sections[step])
+        
+        # Раскрываем изнутри наружу, чтобы внешние секции учли высоту вложенных
+        for section in reversed(sections):
+            section.expand_immediately()
+        target = sections[-1]
+        QTimer.singleShot(0, lambda: self.scroll_area.ensureWidgetVisible(target))
+
+    def patch_block_sections(self, step_data, first_block):
+        """
+        Обновляет отображение шага 4, перестраивая только измененные блоки.
+        
+        Секции блоков до first_block остаются на месте, остальные
+        (включая итоговую секцию) удаляются; сразу пересоздаются только
+        уже построенные секции видимой части, остальные достраиваются в простое.
+        
+        Args:
+            step_data: Обновленные структурированные данные шага 4.
+            first_block: Номер первого измененного блока.
+        """
+        for section in self.collapsible_sections[first_block:]:
+            self.rounds_layout.removeWidget(section)
+            section.deleteLater()
+        del self.collapsible_sections[first_block:]
+        self.rounds_view_data = step_data
+        # Сразу пересоздаются только уже показанные секции измененных блоков
+        # (не больше видимой части); еще не построенные достроятся в простое
+        rebuilt = min(self.rounds_built, first_block + VISIBLE_BLOCK_SECTIONS)
+        self.rounds_built = min(self.rounds_built, first_block)
+        self.rounds_complete = False
+        self.build_block_sections(rebuilt)
+
+    def store_step(self, text):
+        """
+        Сохраняет текстовый шаг визуализации.
+        
+        Args:
+            text: Текстовое представление шага визуализации.
+        """
+        self.steps.append(f"{text}\n")
+        
+    def store_structured_step(self, step_data):
+        """
+        Сохраняет структурированный шаг для визуализации раундов.
+        
+        Args:
+            step_data: Словарь с данными о блоках и раундах.
+        """
+        self.steps.append(step_data)
+
+    def set_progress(self, value):
+        """
+        Обновляет прогресс-бар, если он отображается.
+        
+        Args:
+            value: Процент выполнения.
+        """
+        if not self.progress_bar.isHidden():
+            self.progress_bar.setValue(value)
+            self.progress_bar.repaint()  # Форсируем обновление UI
+
+    def calculate_md5(self):
+        """
+        Вычисляет MD5-хеш и создает пошаговую визуализацию.
+        
+        Берет текст из поля ввода, выполняет последовательные шаги алгоритма MD5
+        и создает визуализацию каждого шага:
+        1. Преобразование текста в байты
+        2. Добавление padding
+        3. Инициализация буферов
+        4. Обработка блоков
+        5. Формирование финального хеша
+        
+        Отображает прогресс выполнения с помощью прогресс-бара.
+        """
+        # Многострочный и файловый ввод кодируются и хешируются потоком
+        source = self.input_source()
+        if source is None:
+            text = self.input_field.text()
+            empty = not text
+        else:
+            try:
+                empty = not source.length()
+            except (OSError, UnicodeDecodeError) as e:
+                QMessageBox.critical(self, "Ошибка", f"Не удалось прочитать текст:\n{str(e)}")
+                return
+
+        if empty:
+            # Спрашиваем у пользователя подтверждение для хеширования пустой строки
+            confirm = QMessageBox()
+            confirm.setWindowTitle("Подтверждение")
+            confirm.setText("Вы собираетесь вычислить MD5-хеш для пустой строки.")
+            confirm.setInformativeText("Продолжить?")
             confirm.setStandardButtons(QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
             confirm.setDefaultButton(QMessageBox.StandardButton.No)
             result = confirm.exec()
@@ -674,127 +1854,17 @@ class MD5VisualizerWindow(QMainWindow):
         self.progress_bar.repaint()  # Форсируем обновление UI
 
         try:
-            # Шаг 1: Преобразование в байты
-            self.progress_bar.setValue(10)
-            self.progress_bar.repaint()
-            byte_data = text_to_bytearray(text)
-            self.store_step(f"Шаг 1: Преобразование текста в байты\n{bytearray_visualize_with_chars(byte_data)}")
-
-            # Шаг 2: Добавление padding
-            self.progress_bar.setValue(20)
-            self.progress_bar.repaint()
-            padded_data = add_padding(byte_data)
-            self.store_step(f"Шаг 2: Добавление padding\n{visualize_padding(byte_data, padded_data)}")
-
-            # Шаг 3: Инициализация буферов
-            self.progress_bar.setValue(30)
-            self.progress_bar.repaint()
-            buffers = buffer_init()
-            self.store_step(f"Шаг 3: Инициализация буферов\n" + 
-                          "\n".join(f"{name}: {value:08x}" for name, value in 
-                                  zip(['A', 'B', 'C', 'D'], buffers)))
-
-            # Шаг 4: Обработка блоков с подробной визуализацией
-            self.progress_bar.setValue(40)
-            self.progress_bar.repaint()
-            
-            # Создаем структуру для хранения данных о раундах
-            blocks_data = []
-            
-            # Обновленная функция для хранения структурированных данных
-            def block_callback(block_index, block_hex, rounds_data, buffers):
-                # Преобразуем rounds_data в структуру с раундами и шагами
-                structured_rounds = []
-                
-                # Разбиваем данные на раунды (их 4)
-                round_texts = []
-                current_round = -1
-                
-                for line in rounds_data:
-                    if line.startswith("=== Раунд "):
-                        if current_round >= 0:
-                            round_texts.append(current_round_text)
-                        current_round = int(line.split()[2]) - 1
-                        current_round_text = []  # Изменено: не включаем заголовок раунда в список строк
-                    elif current_round >= 0:
-                        current_round_text.append(line)
-                
-                if current_round >= 0:
-                    round_texts.append(current_round_text)
-                
-                # Для каждого раунда создаем структуру с шагами
-                for round_idx, round_text in enumerate(round_texts):
-                    steps = []
-                    current_step_text = []
-                    
-                    for line in round_text:
-                        if line.startswith("Шаг "):
-                            if current_step_text:
-                                steps.append("\n".join(current_step_text))
-                            current_step_text = [line]
-                        else:
-                            current_step_text.append(line)
-                    
-                    if current_step_text:
-                        steps.append("\n".join(current_step_text))
-                    
-                    structured_rounds.append({
-                        'index': round_idx,
-                        'steps': steps
-                    })
-                
-                # Добавляем структурированные данные о блоке
-                blocks_data.append({
-                    'block_index': block_index,
-                    'block_hex': block_hex,
-                    'rounds': structured_rounds,
-                    'final_buffers': buffers.copy()
-                })
-                
-                # Обновляем прогресс-бар (от 40% до 80%)
-                progress = 40 + int(40 * (block_index + 1) / ((len(padded_data) + 63) // 64))
-                self.progress_bar.setValue(progress)
-                self.progress_bar.repaint()
-            
-            final_buffers = process_blocks_with_detailed_visualization(
-                padded_data, buffers.copy(), block_callback
-            )
-
-            # Шаг 5: Финальный хеш
-            self.progress_bar.setValue(90)
-            self.progress_bar.repaint()
-            result = finalize_hash(final_buffers)
-            buffer_visualization = []
-            for buffer in final_buffers:
-                hex_value = f"{buffer:08x}"
-                pairs = [hex_value[i:i+2] for i in range(0, 8, 2)]
-                formatted = ' ' .join(pairs[::-1])
-                buffer_visualization.append(formatted)
-            
-            final_hash_text = (
-                f"Буферы в little-endian формате:\n"
-                f"A: {buffer_visualization[0]}\n"
-                f"B: {buffer_visualization[1]}\n"
-                f"C: {buffer_visualization[2]}\n"
-                f"D: {buffer_visualization[3]}\n\n"
-                f"Итоговый хеш (конкатенация буферов):\n{result}"
-            )
-            
-            # Добавляем структурированный шаг для обработки блоков
-            rounds_step = {
-                'type': 'rounds',
-                'initial_buffers': buffer_init(),  # Начальные значения буферов
-                'blocks': blocks_data,
-                'final_hash': final_hash_text
-            }
-            self.store_structured_step(rounds_step)
-            
-            # Добавляем 5 шаг как обычный текст
-            self.store_step(f"Шаг 5: Финальный хэш\n\n{final_hash_text}")
+            # Полный пересчет: кэш блоков предыдущего вычисления не используется
+            self.trace_cache = None
+            if self.hmac_key is not None:
+                self.build_hmac_steps(source or EncodedTextSource(lambda: iter_string_chunks(text)))
+            elif source is None:
+                self.build_steps(text)
+            else:
+                self.build_stream_steps(source)
 
             # Все готово
-            self.progress_bar.setValue(100)
-            self.progress_bar.repaint()
+            self.set_progress(100)
 
             # Скрываем прогресс-бар после выполнения
             self.progress_bar.hide()
@@ -805,11 +1875,791 @@ class MD5VisualizerWindow(QMainWindow):
                 self.display_current_step()
                 self.update_navigation_buttons()
                 
+        except MemoryError:
+            # Даже сокращенная трасса не поместилась - освобождаем то, что успели построить
+            self.steps = []
+            self.clear_step_views()
+            self.trace_cache = None
+            self.progress_bar.hide()
+            QMessageBox.critical(self, "Ошибка", "Недостаточно памяти для построения трассы.\n"
+                                 "Уменьшите лимит памяти трассировки в меню \"Настройки\".")
         except Exception as e:
             self.progress_bar.hide()
             QMessageBox.critical(self, "Ошибка", f"Произошла ошибка при вычислении хеша:\n{str(e)}")
             import traceback
             traceback.print_exc()
+
+    def build_steps(self, text):
+        """
+        Строит шаги визуализации для текста.
+        
+        Если есть кэш предыдущего вычисления с тем же уровнем детализации,
+        блоки до первого измененного 64-байтового блока берутся из кэша,
+        а сжатие продолжается с сохраненных буферов.
+        
+        Args:
+            text: Исходный текст.
+            
+        Returns:
+            int: Номер первого пересчитанного блока.
+        """
+        # Секции шага 4 нужны живому режиму для частичного обновления
+        self.clear_step_views(keep_rounds=True)
+        self.steps = []
+
+        # Шаг 1: Преобразование в байты
+        self.set_progress(10)
+        byte_data = text_to_bytearray(text)
+        padded_data = add_padding(byte_data)
+        
+        # Выбираем блоки и уровень детализации по оценке размера трассы
+        budget_bytes = self.memory_budget_mb * 1024 * 1024
+        total_blocks = len(padded_data) // 64
+        detail, selection, max_traced_blocks = self.trace_plan(len(byte_data))
+        # Трасса всех блоков не помещается в лимит: сохраняются только первые блоки
+        limit = max_traced_blocks if selection is None and total_blocks > max_traced_blocks else None
+        preview_bytes = (None if estimate_trace_bytes(len(padded_data), DETAIL_FULL) <= budget_bytes
+                         else PREVIEW_BYTES)
+        self.show_detail_level(detail, len(padded_data), selection)
+        
+        self.store_step(f"Шаг 1: Преобразование текста в байты\n"
+                        f"{self.visualize_input_bytes(byte_data, preview_bytes)}")
+
+        # Шаг 2: Добавление padding
+        self.set_progress(20)
+        self.store_step(f"Шаг 2: Добавление padding\n"
+                        f"{visualize_padding(byte_data, padded_data, preview_bytes)}")
+
+        # Шаг 3: Инициализация буферов
+        self.set_progress(30)
+        buffers = buffer_init()
+        self.store_step(f"Шаг 3: Инициализация буферов\n" + 
+                      "\n".join(f"{name}: {value:08x}" for name, value in 
+                              zip(['A', 'B', 'C', 'D'], buffers)))
+
+        # Шаг 4: Обработка блоков с подробной визуализацией
+        self.set_progress(40)
+        
+        # Берем из кэша блоки, совпадающие с предыдущим вычислением
+        first_block = 0
+        blocks_data = []
+        cache = self.trace_cache
+        if cache and cache['detail'] == detail and selection is None and limit is None:
+            first_block = first_changed_block(cache['padded_data'], padded_data)
+            blocks_data = cache['blocks'][:first_block]
+            if first_block:
+                buffers = blocks_data[-1]['final_buffers'].copy()
+        if md5_metrics.ENABLED and selection is None:
+            md5_metrics.count_cache('trace', first_block, len(padded_data) // 64 - first_block)
+        
+        # Индекс для поиска строится вместе с трассой; при частичном пересчете
+        # из него удаляются только пересчитываемые блоки
+        if first_block:
+            self.trace_index.truncate(first_block)
+        else:
+            self.trace_index = TraceIndex()
+        self.search_query = None
+        
+        def block_callback(block_index, block_hex, rounds_data, buffers):
+            blocks_data.append(structure_block_trace(block_index, block_hex, rounds_data, buffers, detail))
+            
+            # Обновляем прогресс-бар (от 40% до 80%)
+            self.set_progress(40 + int(40 * (block_index + 1) / total_blocks))
+        
+        if selection is not None or limit is not None:
+            # Выборочная или ограниченная трасса: остальные блоки сжимаются быстрым путем
+            blocks_data, final_buffers = trace_selected_blocks(padded_data, buffers.copy(), 0, detail, selection,
+                                                               limit)
+            self.trace_index = self.index_blocks(blocks_data)
+        elif total_blocks - first_block >= PARALLEL_MIN_BLOCKS and available_cpus() > 1:
+            # Двухфазный конвейер: быстрый проход по буферам, затем трассы блоков параллельно
+            traced_blocks, final_buffers = trace_blocks_parallel(
+                padded_data, buffers, detail, first_block,
+                progress=lambda done, total: self.set_progress(40 + int(40 * done / total)),
+                index=self.trace_index
+            )
+            blocks_data.extend(traced_blocks)
+        else:
+            final_buffers = process_blocks_with_detailed_visualization(
+                padded_data, buffers.copy(), block_callback, detail, first_block, self.trace_index
+            )
+
+        # Шаг 5: Финальный хеш
+        self.set_progress(90)
+        final_hash_text = self.format_final_hash(final_buffers)
+        
+        # Добавляем структурированный шаг для обработки блоков
+        rounds_step = {
+            'type': 'rounds',
+            'detail': detail,
+            'initial_buffers': buffer_init(),  # Начальные значения буферов
+            'blocks': blocks_data,
+            'total_blocks': total_blocks,
+            'selection': self.block_selection if selection is not None else None,
+            'final_hash': final_hash_text
+        }
+        self.store_structured_step(rounds_step)
+        
+        # Закрепленные панели переключаются на новую трассу без копирования данных
+        self.trace_model = TraceModel(rounds_step)
+        self.pinned_view.set_model(self.trace_model)
+        
+        # Добавляем 5 шаг как обычный текст
+        self.store_step(f"Шаг 5: Финальный хэш\n\n{final_hash_text}")
+        
+        # Выборочная и ограниченная трассы не кэшируются: частичный пересчет рассчитан на полную трассу
+        self.trace_cache = {
+            'padded_data': padded_data,
+            'detail': detail,
+            'blocks': blocks_data
+        } if selection is None and limit is None else None
+        return first_block
+
+    def visualize_input_bytes(self, byte_data, preview_bytes):
+        """
+        Строит текст шага 1 с разбором байтов по символам.
+        
+        Строки символов до первого измененного байта берутся из
+        предыдущего вычисления, поэтому при живом вводе заново
+        разбирается только изменившийся хвост.
+        
+        Args:
+            byte_data: Закодированный текст.
+            preview_bytes: Сколько байт показывать (None - все).
+            
+        Returns:
+            str: Текст шага 1 без заголовка.
+        """
+        shown = byte_data[:utf8_prefix_length(byte_data, preview_bytes)]
+        start = 0
+        char_lines = []
+        if self.char_lines_cache is not None:
+            old_shown, old_lines = self.char_lines_cache
+            start = utf8_char_start(shown, first_changed_byte(old_shown, shown))
+            char_lines = old_lines[:len(shown[:start].decode('utf-8'))]
+        try:
+            char_lines.extend(utf8_char_lines(shown[start:]))
+            self.char_lines_cache = (shown, char_lines)
+        except UnicodeDecodeError:
+            char_lines = None
+            self.char_lines_cache = None
+        return format_bytes_with_chars(shown, char_lines, len(byte_data))
+
+    def build_stream_steps(self, source):
+        """
+        Строит шаги визуализации для многострочного или файлового ввода.
+        
+        Текст кодируется в UTF-8 порциями и сразу подается в хешер, поэтому
+        ни строка целиком, ни ее байты не хранятся. Шаг 1 показывает
+        закодированный поток постранично, трасса шага 4 сохраняется для
+        стольких первых блоков, сколько помещается в лимит памяти.
+        
+        Args:
+            source: Источник текста EncodedTextSource.
+        """
+        self.clear_step_views()
+        self.steps = []
+        self.trace_cache = None
+        
+        # Длина закодированного потока (проход без хранения байтов)
+        self.set_progress(10)
+        length = source.length()
+        detail, selection, max_traced_blocks = self.trace_plan(length)
+        self.show_detail_level(detail, length + len(padding_for_length(length)), selection)
+        
+        self.set_progress(40)
+        blocks_data = []
+        final_buffers, _, total_blocks = hash_stream(
+            source.iter_bytes(), detail, max_traced_blocks, blocks_data.append,
+            progress=lambda done: self.set_progress(40 + int(40 * done / max(length, 1))),
+            selection=selection
+        )
+        self.trace_index = self.index_blocks(blocks_data)
+        self.search_query = None
+        
+        self.set_progress(90)
+        self.steps = self.make_stream_steps(source, length, detail, blocks_data, total_blocks, final_buffers,
+                                            selection)
+        self.trace_model = TraceModel(self.steps[3])
+        self.pinned_view.set_model(self.trace_model)
+    
+    def build_hmac_steps(self, source):
+        """
+        Строит шаги визуализации HMAC-MD5 текущего ввода с ключом self.hmac_key.
+        
+        Шаг 4 показывает блоки внутреннего хеша (K0 ⊕ ipad и сообщение) и
+        внешнего (K0 ⊕ opad и внутренний хеш). Выбор блоков и лимит памяти
+        относятся к блокам сообщения; блоки ключа и внешний блок
+        трассируются всегда.
+        
+        Args:
+            source: Источник текста EncodedTextSource.
+        """
+        self.clear_step_views()
+        self.steps = []
+        self.trace_cache = None
+        
+        self.set_progress(10)
+        length = source.length()
+        inner_length = HMAC_BLOCK_SIZE + length
+        detail, selection, max_traced_blocks = self.trace_plan(inner_length)
+        self.show_detail_level(detail, inner_length + len(padding_for_length(inner_length)), selection)
+        
+        self.set_progress(40)
+        trace = trace_hmac(
+            self.hmac_key, source.iter_bytes(), detail, max_traced_blocks, selection,
+            progress=lambda done: self.set_progress(40 + int(40 * done / max(length, 1)))
+        )
+        blocks_data = trace['blocks']
+        self.trace_index = self.index_blocks(blocks_data)
+        self.search_query = None
+        
+        self.set_progress(90)
+        key_block = trace['key_block']
+        ipad_block = xor_key(key_block, IPAD)
+        if trace['key_hashed']:
+            key_note = f"Ключ ({trace['key_length']} байт) длиннее блока и заменен своим MD5, дополненным нулями"
+        else:
+            key_note = f"Ключ ({trace['key_length']} байт) дополнен нулями до {HMAC_BLOCK_SIZE} байт"
+        midstate_note = ("взяты из кэша" if trace['cached']
+                         else "вычислены и сохранены в кэше")
+        outer_buffers = blocks_data[-1]['final_buffers']
+        
+        steps = []
+        
+        # Шаг 1: Подготовка ключа
+        steps.append(f"Шаг 1: Подготовка ключа\n"
+                     f"{key_note}\n\n"
+                     f"K0:\n{bytearray_visualize_simple(key_block)}\n\n"
+                     f"K0 ⊕ ipad (0x{IPAD:02x}):\n{bytearray_visualize_simple(ipad_block)}\n\n"
+                     f"K0 ⊕ opad (0x{OPAD:02x}):\n{bytearray_visualize_simple(xor_key(key_block, OPAD))}\n")
+        
+        # Шаг 2: Промежуточные состояния ключа
+        steps.append(f"Шаг 2: Промежуточные состояния ключа\n"
+                     f"Блоки ключа сжимаются один раз на ключ; состояния {midstate_note}\n\n"
+                     f"После K0 ⊕ ipad (начало внутреннего хеша):\n" +
+                     "\n".join(f"{name}: {value:08x}" for name, value in
+                               zip(['A', 'B', 'C', 'D'], trace['inner_midstate'])) +
+                     f"\n\nПосле K0 ⊕ opad (начало внешнего хеша):\n" +
+                     "\n".join(f"{name}: {value:08x}" for name, value in
+                               zip(['A', 'B', 'C', 'D'], trace['outer_midstate'])) + "\n")
+        
+        # Шаг 3: Внутреннее сообщение K0 ⊕ ipad || m и его padding
+        head = ipad_block + source.read_page(0, PREVIEW_BYTES)
+        steps.append(f"Шаг 3: Внутреннее сообщение (K0 ⊕ ipad) || m\n"
+                     f"{visualize_padding_stream(inner_length, head)}\n")
+        
+        # Шаг 4: Блоки внутреннего и внешнего хеша
+        final_hash_text = (f"Внутренний хеш H((K0 ⊕ ipad) || m):\n{trace['inner_digest']}\n\n"
+                           f"HMAC-MD5 = H((K0 ⊕ opad) || внутренний хеш):\n{trace['digest']}")
+        steps.append({
+            'type': 'rounds',
+            'detail': detail,
+            'initial_buffers': buffer_init(),
+            'blocks': blocks_data,
+            'total_blocks': trace['total_blocks'],
+            'selection': self.block_selection if selection is not None else None,
+            'final_hash': final_hash_text
+        })
+        
+        # Шаг 5: HMAC
+        steps.append(f"Шаг 5: HMAC-MD5\n\n"
+                     f"Внутренний хеш H((K0 ⊕ ipad) || m):\n{trace['inner_digest']}\n\n"
+                     f"Внешний хеш H((K0 ⊕ opad) || внутренний хеш)\n"
+                     f"{self.format_final_hash(outer_buffers)}\n")
+        
+        self.steps = steps
+        self.trace_model = TraceModel(self.steps[3])
+        self.pinned_view.set_model(self.trace_model)
+    
+    def toggle_hmac_mode(self, enabled):
+        """
+        Включает режим HMAC-MD5 с запросом ключа или выключает его.
+        
+        Args:
+            enabled: Новое состояние режима.
+        """
+        if enabled:
+            text, ok = QInputDialog.getText(
+                self, "Режим HMAC-MD5",
+                "Ключ (текст в UTF-8 или шестнадцатеричные байты с префиксом hex:):")
+            key = None
+            if ok:
+                try:
+                    key = parse_key(text)
+                except ValueError:
+                    QMessageBox.warning(self, "Ошибка", "Ключ после hex: должен состоять из пар шестнадцатеричных цифр.")
+            self.hmac_key = key
+        else:
+            self.hmac_key = None
+        
+        self.hmac_action.setChecked(self.hmac_key is not None)
+        if self.hmac_key is None:
+            self.hmac_bar.hide()
+        else:
+            self.hmac_label.setText(f"Режим HMAC-MD5, ключ: {len(self.hmac_key)} байт")
+            self.hmac_bar.show()
+        if self.live_checkbox.isChecked():
+            self.schedule_live_update()
+    
+    def trace_plan(self, length):
+        """
+        Выбирает блоки и детализацию трассы по настройкам и лимиту памяти.
+        
+        Без выбора блоков трассируются первые блоки, помещающиеся в лимит
+        при выбранной детализации. При выборе блоков детализация подбирается
+        по числу выбранных блоков, если она не задана явно, а выбор, который
+        не помещается в лимит даже так, сокращается до первых блоков.
+        
+        Args:
+            length: Длина входа в байтах.
+            
+        Returns:
+            tuple: Уровень детализации, диапазоны выбранных блоков (или None)
+            и граница номеров трассируемых блоков (или None).
+        """
+        total_blocks = (length + len(padding_for_length(length))) // 64
+        budget_bytes = self.memory_budget_mb * 1024 * 1024
+        selection = parse_block_selection(self.block_selection, total_blocks)
+        detail = self.detail_override or choose_detail_level(selection_size(selection, total_blocks) * 64,
+                                                             budget_bytes)
+        max_traced_blocks = max(1, budget_bytes // TRACE_BYTES_PER_BLOCK[detail])
+        if selection is not None:
+            return detail, truncate_selection(selection, max_traced_blocks), None
+        return detail, None, max_traced_blocks
+    
+    def index_blocks(self, blocks_data):
+        """
+        Строит поисковый индекс по трассированным блокам.
+        
+        Args:
+            blocks_data: Структурированные данные блоков (в порядке номеров).
+            
+        Returns:
+            TraceIndex: Индекс трассированных блоков.
+        """
+        index = TraceIndex()
+        buffers = buffer_init()
+        for position, block_data in enumerate(blocks_data):
+            if 'start_buffers' in block_data:
+                buffers = list(block_data['start_buffers'])
+            index.add_block(block_data['block_index'], bytes.fromhex(block_data['block_hex'].replace('-', '')),
+                            buffers)
+        return index
+    
+    def make_stream_steps(self, source, length, detail, blocks_data, total_blocks, final_buffers,
+                          selection=None):
+        """
+        Собирает шаги визуализации потокового входа из готовой трассы.
+        
+        Args:
+            source: Источник текста EncodedTextSource.
+            length: Длина входа в байтах.
+            detail: Уровень детализации трассы.
+            blocks_data: Структурированные данные трассированных блоков.
+            total_blocks: Общее число блоков после padding.
+            final_buffers: Итоговые буферы.
+            selection: Диапазоны выбранных блоков (None - трасса первых блоков).
+            
+        Returns:
+            list: Шаги 1-5.
+        """
+        steps = []
+        
+        # Шаг 1: байты показываются постранично
+        steps.append({
+            'type': 'bytes_pages',
+            'source': source,
+            'length': length,
+            'page': 0
+        })
+        
+        # Шаг 2: Добавление padding
+        steps.append(f"Шаг 2: Добавление padding\n"
+                     f"{visualize_padding_stream(length, source.read_page(0, PREVIEW_BYTES))}\n")
+        
+        # Шаг 3: Инициализация буферов
+        steps.append(f"Шаг 3: Инициализация буферов\n" + 
+                     "\n".join(f"{name}: {value:08x}" for name, value in 
+                               zip(['A', 'B', 'C', 'D'], buffer_init())) + "\n")
+        
+        # Шаг 4: Трасса блоков
+        final_hash_text = self.format_final_hash(final_buffers)
+        steps.append({
+            'type': 'rounds',
+            'detail': detail,
+            'initial_buffers': buffer_init(),
+            'blocks': blocks_data,
+            'total_blocks': total_blocks,
+            'selection': self.block_selection if selection is not None else None,
+            'final_hash': final_hash_text
+        })
+        
+        # Шаг 5: Финальный хеш
+        steps.append(f"Шаг 5: Финальный хэш\n\n{final_hash_text}\n")
+        return steps
+    
+    def format_final_hash(self, final_buffers):
+        """
+        Форматирует итоговые буферы и хеш для шага 5.
+        
+        Args:
+            final_buffers: Буферы после обработки всех блоков.
+            
+        Returns:
+            str: Текст шага 5.
+        """
+        result = finalize_hash(final_buffers)
+        buffer_visualization = []
+        for buffer in final_buffers:
+            hex_value = f"{buffer:08x}"
+            pairs = [hex_value[i:i+2] for i in range(0, 8, 2)]
+            formatted = ' ' .join(pairs[::-1])
+            buffer_visualization.append(formatted)
+        
+        return (
+            f"Буферы в little-endian формате:\n"
+            f"A: {buffer_visualization[0]}\n"
+            f"B: {buffer_visualization[1]}\n"
+            f"C: {buffer_visualization[2]}\n"
+            f"D: {buffer_visualization[3]}\n\n"
+            f"Итоговый хеш (конкатенация буферов):\n{result}"
+        )
+    
+    def trace_coverage_text(self, step_data):
+        """
+        Поясняет, для каких блоков сохранена трасса шага 4.
+        
+        Args:
+            step_data: Структурированные данные шага 4.
+        """
+        traced = len(step_data['blocks'])
+        total_blocks = step_data['total_blocks']
+        if step_data.get('selection'):
+            return (f"Трасса построена для выбранных блоков ({step_data['selection']}): "
+                    f"{traced} из {total_blocks}, остальные блоки сжаты без трассировки")
+        return (f"Трасса сохранена для первых {traced} из {total_blocks} блоков (лимит памяти), "
+                f"остальные блоки сжаты без трассировки")
+    
+    def bytes_page_text(self, step_data, page_index=None):
+        """
+        Возвращает текст страницы шага 1 для потокового ввода.
+        
+        Страницы перечитываются из источника; в памяти держатся только
+        PAGE_CACHE_SIZE последних страниц, соседние с текущей читаются
+        заранее в простое.
+        
+        Args:
+            step_data: Данные шага 1 с источником и номером страницы.
+            page_index: Номер страницы (по умолчанию - текущая).
+        """
+        if page_index is None:
+            page_index = step_data['page']
+        if self.page_texts_step is not step_data:
+            self.page_texts.clear()
+            self.page_texts_step = step_data
+        if page_index in self.page_texts:
+            self.page_texts.move_to_end(page_index)
+            return self.page_texts[page_index]
+        
+        offset = page_index * PAGE_BYTES
+        page = step_data['source'].read_char_page(offset, PAGE_BYTES)
+        text = (f"Шаг 1: Преобразование текста в байты\n"
+                f"Текст закодирован в UTF-8 потоком: {step_data['length']} байт\n"
+                f"Байты {offset + 1}-{offset + len(page)}:\n"
+                f"{bytearray_visualize_with_chars(page)}\n")
+        self.page_texts[page_index] = text
+        if len(self.page_texts) > PAGE_CACHE_SIZE:
+            self.page_texts.popitem(last=False)
+        return text
+    
+    def turn_bytes_page(self, delta):
+        """
+        Листает страницы байтов на шаге 1.
+        
+        Args:
+            delta: Смещение в страницах.
+        """
+        step_data = self.steps[self.current_step]
+        pages = max(1, -(-step_data['length'] // PAGE_BYTES))
+        step_data['page'] = max(0, min(step_data['page'] + delta, pages - 1))
+        self.display_current_step()
+    
+    def input_source(self):
+        """
+        Возвращает потоковый источник текста или None для однострочного ввода.
+        """
+        if self.input_file:
+            path = self.input_file
+            return EncodedTextSource(lambda: iter_file_text(path), path)
+        if self.multiline_checkbox.isChecked():
+            document = self.text_editor.document()
+            return EncodedTextSource(lambda: iter_document_text(document), "редактор")
+        return None
+    
+    def toggle_multiline_mode(self, enabled):
+        """
+        Переключает ввод между однострочным полем и многострочным редактором.
+        
+        Живой ввод работает только с однострочным полем.
+        
+        Args:
+            enabled: Включен ли многострочный режим.
+        """
+        if enabled and self.live_checkbox.isChecked():
+            self.live_checkbox.setChecked(False)
+        self.live_checkbox.setEnabled(not enabled)
+        self.input_field.setVisible(not enabled)
+        self.text_editor.setVisible(enabled)
+        if not enabled:
+            self.close_text_file()
+    
+    def open_text_file(self):
+        """
+        Открывает текстовый файл UTF-8 в качестве входных данных.
+        
+        Файл не загружается в память целиком: в редакторе показывается
+        только его начало, а при вычислении файл читается порциями.
+        """
+        file_path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Открыть текстовый файл",
+            "",
+            "Текстовые файлы (*.txt);;Все файлы (*)"
+        )
+        if file_path:
+            self.load_text_file(file_path)
+    
+    def load_text_file(self, file_path):
+        """
+        Переключает ввод на текстовый файл.
+        
+        Args:
+            file_path: Путь к файлу.
+        """
+        try:
+            with open(file_path, 'r', encoding='utf-8', newline='') as f:
+                preview = f.read(FILE_PREVIEW_CHARS)
+                truncated = bool(f.read(1))
+        except (OSError, UnicodeDecodeError) as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось открыть файл:\n{str(e)}")
+            return
+        
+        self.multiline_checkbox.setChecked(True)
+        self.input_file = file_path
+        self.text_editor.setPlainText(preview)
+        self.text_editor.setReadOnly(True)
+        note = f" (показаны первые {FILE_PREVIEW_CHARS} символов)" if truncated else ""
+        self.file_label.setText(f"Файл: {file_path}, {os.path.getsize(file_path)} байт{note}")
+        self.file_bar.show()
+    
+    def close_text_file(self):
+        """
+        Возвращает многострочный редактор к вводу текста вручную.
+        """
+        if self.input_file is None:
+            return
+        self.input_file = None
+        self.text_editor.clear()
+        self.text_editor.setReadOnly(False)
+        self.file_bar.hide()
+    
+    def hash_file_with_checkpoint(self):
+        """
+        Хеширует произвольный файл с сохранением контрольных точек.
+        
+        Хеширование можно остановить кнопкой "Отмена": состояние сохраняется
+        в контрольную точку рядом с файлом, и следующий запуск для того же
+        (неизмененного) файла продолжает с сохраненного места.
+        """
+        file_path, _ = QFileDialog.getOpenFileName(self, "Хешировать файл", "", "Все файлы (*)")
+        if not file_path:
+            return
+        
+        try:
+            saved = load_checkpoint(default_checkpoint_path(file_path), file_identity(file_path))
+        except OSError as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось открыть файл:\n{str(e)}")
+            return
+        
+        resume = True
+        if saved:
+            answer = QMessageBox.question(
+                self,
+                "Контрольная точка",
+                f"Найдена контрольная точка: обработано {saved[0]} байт.\n"
+                f"Продолжить с сохраненного места?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.Yes
+            )
+            resume = answer == QMessageBox.StandardButton.Yes
+        
+        dialog = QProgressDialog("Хеширование файла...", "Отмена", 0, 1000, self)
+        dialog.setWindowTitle("Хеширование файла")
+        dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        dialog.setMinimumDuration(0)
+        
+        def progress(offset, size):
+            dialog.setValue(1000 * offset // size if size else 1000)
+            QApplication.processEvents()
+        
+        try:
+            digest, resumed_from = hash_file(file_path, resume=resume, progress=progress,
+                                             should_stop=dialog.wasCanceled)
+        except OSError as e:
+            dialog.close()
+            QMessageBox.critical(self, "Ошибка", f"Не удалось прочитать файл:\n{str(e)}")
+            return
+        dialog.close()
+        
+        if digest is None:
+            QMessageBox.information(self, "Хеширование остановлено",
+                                    "Контрольная точка сохранена; при следующем запуске "
+                                    "хеширование продолжится с сохраненного места.")
+            return
+        note = f"\n(продолжено с {resumed_from} байт)" if resumed_from else ""
+        QMessageBox.information(self, "Результат", f"MD5 ({os.path.basename(file_path)}):\n{digest}{note}")
+    
+    def queue_job(self, name, source, length):
+        """
+        Ставит вход в очередь заданий.
+        
+        Args:
+            name: Название задания.
+            source: Источник текста EncodedTextSource.
+            length: Длина закодированного входа в байтах.
+        """
+        detail, selection, max_traced_blocks = self.trace_plan(length)
+        job = self.job_manager.add(name, source, length, detail, max_traced_blocks, selection)
+        self.jobs_panel.add_job(job)
+        self.jobs_dock.show()
+        return job
+    
+    def queue_current_input(self):
+        """
+        Ставит в очередь текущий ввод: открытый файл, текст редактора или поля ввода.
+        
+        Текст редактора копируется, чтобы дальнейшее редактирование
+        не влияло на задание.
+        """
+        if self.input_file:
+            path = self.input_file
+            self.queue_job(os.path.basename(path), EncodedTextSource(lambda: iter_file_text(path), path),
+                           os.path.getsize(path))
+            return
+        
+        if self.multiline_checkbox.isChecked():
+            text = self.text_editor.toPlainText()
+        else:
+            text = self.input_field.text()
+        source = EncodedTextSource(lambda: iter_string_chunks(text))
+        name = text[:30].replace("\n", " ") + ("..." if len(text) > 30 else "")
+        self.queue_job(f"\"{name}\"", source, source.length())
+    
+    def queue_text_files(self):
+        """
+        Ставит в очередь выбранные текстовые файлы UTF-8.
+        """
+        file_paths, _ = QFileDialog.getOpenFileNames(
+            self,
+            "Добавить файлы в очередь",
+            "",
+            "Текстовые файлы (*.txt);;Все файлы (*)"
+        )
+        for path in file_paths:
+            try:
+                length = os.path.getsize(path)
+            except OSError as e:
+                QMessageBox.critical(self, "Ошибка", f"Не удалось открыть файл:\n{str(e)}")
+                continue
+            self.queue_job(os.path.basename(path),
+                           EncodedTextSource(lambda path=path: iter_file_text(path), path), length)
+    
+    def show_job(self, job):
+        """
+        Переключает основное окно на трассу завершенного задания.
+        
+        Args:
+            job: Завершенное задание HashJob.
+        """
+        if job.blocks is None:
+            QMessageBox.information(self, "Трасса недоступна",
+                                    f"Трасса задания #{job.id} вытеснена из памяти.\n"
+                                    f"Хеш: {job.digest}\n"
+                                    f"Поставьте задание в очередь повторно, чтобы построить трассу.")
+            return
+        
+        self.job_manager.store.touch(job)
+        self.live_timer.stop()
+        self.trace_cache = None
+        self.steps = self.make_stream_steps(job.source, job.length, job.detail, job.blocks,
+                                            job.total_blocks, job.buffers, job.selection)
+        self.show_detail_level(job.detail, job.total_blocks * 64, job.selection)
+        
+        # Индекс поиска строится по трассированным блокам задания
+        self.trace_index = self.index_blocks(job.blocks)
+        self.search_query = None
+        self.search_status.clear()
+        
+        self.trace_model = TraceModel(self.steps[3])
+        self.pinned_view.set_model(self.trace_model)
+        self.current_step = 0
+        self.display_current_step()
+        self.update_navigation_buttons()
+    
+    def toggle_live_mode(self, enabled):
+        """
+        Включает или выключает режим живого ввода.
+        
+        Args:
+            enabled: Новое состояние режима.
+        """
+        if enabled:
+            self.input_field.textChanged.connect(self.schedule_live_update)
+            self.schedule_live_update()
+        else:
+            self.input_field.textChanged.disconnect(self.schedule_live_update)
+            self.live_timer.stop()
+
+    def schedule_live_update(self):
+        """
+        Откладывает пересчет до паузы в наборе текста.
+        """
+        self.live_timer.start(LIVE_UPDATE_DELAY_MS)
+
+    def live_update(self):
+        """
+        Пересчитывает хеш после изменения текста в режиме живого ввода.
+        
+        Пересчитываются только блоки начиная с первого измененного,
+        а на шаге 4 перестраиваются только их секции.
+        """
+        old_detail = self.trace_cache['detail'] if self.trace_cache else None
+        text = self.input_field.text()
+        try:
+            if self.hmac_key is not None:
+                # Трасса HMAC не кэшируется по блокам - строится заново
+                first_block = 0
+                self.build_hmac_steps(EncodedTextSource(lambda: iter_string_chunks(text)))
+            else:
+                first_block = self.build_steps(text)
+        except MemoryError:
+            self.steps = []
+            self.trace_cache = None
+            self.clear_step_views()
+            self.update_navigation_buttons()
+            return
+        
+        self.current_step = min(self.current_step, len(self.steps) - 1)
+        step_data = self.steps[self.current_step]
+        if (isinstance(step_data, dict) and self.rounds_container.isVisible()
+                and old_detail == step_data['detail'] and first_block > 0):
+            self.patch_block_sections(step_data, first_block)
+            self.evict_step_views()
+            self.schedule_prerender()
+        else:
+            self.display_current_step()
+        self.update_navigation_buttons()
     
     def reset_visualization(self):
         """
@@ -818,12 +2668,81 @@ class MD5VisualizerWindow(QMainWindow):
         Очищает поле ввода, список шагов визуализации и сбрасывает
         счетчик текущего шага.
         """
-        self.visualization.clear()
+        self.clear_step_views()
         self.input_field.clear()
+        self.close_text_file()
+        self.text_editor.clear()
+        self.page_bar.hide()
+        self.live_timer.stop()
+        self.detail_label.hide()
+        self.pinned_view.clear()
+        self.trace_model = None
+        self.trace_index = TraceIndex()
+        self.search_query = None
+        self.search_status.clear()
+        self.trace_cache = None
+        self.char_lines_cache = None
         self.steps = []
         self.current_step = 0
         self.update_navigation_buttons()
     
+    def show_detail_level(self, detail, padded_length, selection=None):
+        """
+        Отображает выбранный уровень детализации трассы.
+        
+        Если полная трасса не укладывается в лимит памяти, поясняет,
+        почему детализация была понижена.
+        
+        Args:
+            detail: Выбранный уровень детализации.
+            padded_length: Длина сообщения после padding в байтах.
+            selection: Диапазоны выбранных блоков (None - все блоки).
+        """
+        total_blocks = padded_length // 64
+        traced_blocks = selection_size(selection, total_blocks)
+        text = f"Детализация трассы: {DETAIL_LEVEL_NAMES[detail]}"
+        if selection is not None:
+            text += f", выбрано блоков: {traced_blocks} из {total_blocks}"
+        if self.detail_override:
+            text += " (задана вручную)"
+        elif detail != DETAIL_FULL:
+            full_mb = estimate_trace_bytes(traced_blocks * 64, DETAIL_FULL) / (1024 * 1024)
+            text += (f" (полная трасса заняла бы ~{full_mb:.0f} МБ "
+                     f"при лимите {self.memory_budget_mb} МБ)")
+        self.detail_label.setText(text)
+        self.detail_label.show()
+    
+    def set_trace_selection(self):
+        """
+        Запрашивает блоки и уровень детализации для выборочной трассировки.
+        
+        Настройки применяются при следующем вычислении хеша.
+        """
+        dialog = TraceSelectionDialog(self.block_selection, self.detail_override, self)
+        if dialog.exec():
+            self.block_selection = dialog.selection()
+            self.detail_override = dialog.detail()
+    
+    def set_memory_budget(self):
+        """
+        Запрашивает у пользователя лимит памяти для трассировки.
+        
+        Лимит используется при следующем вычислении хеша для выбора
+        уровня детализации трассы.
+        """
+        value, ok = QInputDialog.getInt(
+            self,
+            "Лимит памяти",
+            "Максимальный объем памяти для трассы (МБ):",
+            self.memory_budget_mb,
+            1,
+            65536
+        )
+        if ok:
+            self.memory_budget_mb = value
+            self.job_manager.store.set_budget(value * 1024 * 1024)
+            self.jobs_panel.poll()
+    
     def convert_step_to_text(self, step_data):
         """
         Преобразует шаг визуализации в текстовый формат.
@@ -840,11 +2759,22 @@ class MD5VisualizerWindow(QMainWindow):
         if isinstance(step_data, str):
             # Шаг уже в текстовом формате
             return step_data
+        elif isinstance(step_data, dict) and step_data.get('type') == 'bytes_pages':
+            # Потоковый ввод: сохраняется текущая страница байтов
+            return self.bytes_page_text(step_data)
         elif isinstance(step_data, dict) and step_data.get('type') == 'rounds':
             # Структурированные данные для раундов
             result = []
             result.append("Шаг 4: Обработка блоков данных")
             
+            detail = step_data.get('detail', DETAIL_FULL)
+            if detail != DETAIL_FULL:
+                result.append(f"Детализация трассы: {DETAIL_LEVEL_NAMES[detail]}")
+            
+            total_blocks = step_data.get('total_blocks', len(step_data.get('blocks', [])))
+            if total_blocks > len(step_data.get('blocks', [])):
+                result.append(self.trace_coverage_text(step_data))
+            
             # Добавляем начальные значения буферов
             if step_data.get('initial_buffers'):
                 buffers = step_data['initial_buffers']
@@ -853,8 +2783,9 @@ class MD5VisualizerWindow(QMainWindow):
                              f"C = {buffers[2]:#010x}, D = {buffers[3]:#010x}\n")
             
             # Обрабатываем каждый блок
-            for block_idx, block_data in enumerate(step_data.get('blocks', [])):
-                result.append(f"\n--- Блок {block_idx + 1} ---")
+            for block_data in step_data.get('blocks', []):
+                block_idx = block_data['block_index']
+                result.append(f"\n--- {block_data.get('label', f'Блок {block_idx + 1}')} ---")
                 result.append(f"Данные блока:\n{block_data['block_hex']}\n")
                 
                 # Обрабатываем раунды внутри блока
@@ -865,6 +2796,9 @@ class MD5VisualizerWindow(QMainWindow):
                     for step_idx, step_info in enumerate(round_data['steps']):
                         result.append(f"\nШаг {step_idx + 1}:")
                         result.append(step_info)
+                    
+                    if round_data.get('summary'):
+                        result.append(round_data['summary'])
                 
                 # Добавляем информацию о буферах после блока
                 if 'final_buffers' in block_data:
@@ -953,7 +2887,7 @@ class MD5VisualizerWindow(QMainWindow):
             return
         
         clipboard = QApplication.clipboard()
-        clipboard.setText(self.steps[self.current_step])
+        clipboard.setText(self.convert_step_to_text(self.steps[self.current_step]))
         QMessageBox.information(self, "Успех", "Данные скопированы в буфер обмена.")
     
     def show_about_dialog(self):
@@ -973,6 +2907,39 @@ class MD5VisualizerWindow(QMainWindow):
         """
         dialog = HelpDialog(self)
         dialog.exec()
+    
+    def show_trace_diff_dialog(self):
+        """
+        Отображает диалог сравнения трасс двух входов.
+        
+        Первый вход заполняется текстом из поля ввода.
+        """
+        dialog = TraceDiffDialog(self.input_field.text(), self)
+        dialog.exec()
+    
+    def show_differential_dialog(self):
+        """
+        Отображает диалог дифференциального эксперимента.
+        
+        Если в диалоге выбран показ на шаге 4 или его отключение,
+        секции блоков перестраиваются с новым наложением.
+        """
+        dialog = DifferentialDialog(self.difference_overlay, self)
+        if dialog.exec() and dialog.overlay != self.difference_overlay:
+            self.set_difference_overlay(dialog.overlay)
+    
+    def set_difference_overlay(self, overlay):
+        """
+        Задает наложение разностей на секции блоков шага 4.
+        
+        Args:
+            overlay: Параметры варианта и разности (с результатом эксперимента
+                в 'result') или None, чтобы убрать наложение.
+        """
+        self.difference_overlay = overlay
+        if self.steps:
+            self.clear_step_views()
+            self.display_current_step()
 
 def main():
     """
@@ -0,0 +1,232 @@
+from PyQt6.QtWidgets import QWidget, QSizePolicy
+from PyQt6.QtCore import Qt, QTimer, QRect, QSize
+from PyQt6.QtGui import QPainter, QColor, QFont
+from md5_algorithm import left_rotate
+
+# Интервал тика анимации (~30 кадров в секунду)
+FRAME_INTERVAL_MS = 33
+
+# Сколько тиков держится кадр операции и кадр сдвига на один бит
+OPERATION_TICKS = 15
+ROTATION_TICKS = 3
+
+ROW_HEIGHT = 22
+CELL_WIDTH = 14
+LABEL_WIDTH = 120
+NIBBLE_GAP = 4
+HEX_WIDTH = 110
+
+BIT_ON_COLOR = QColor("#7158e2")
+BIT_OFF_COLOR = QColor("#eaeefa")
+HIGHLIGHT_COLOR = QColor("#fff4d6")
+TEXT_COLOR = QColor("#2c3e50")
+
+def value_to_bits(value):
+    """
+    Раскладывает 32-битное значение в массив битов (старший бит первым).
+
+    Args:
+        value: 32-битное число.
+
+    Returns:
+        bytes: 32 байта со значениями 0 или 1.
+    """
+    return bytes((value >> (31 - i)) & 1 for i in range(32))
+
+def build_frames(record):
+    """
+    Заранее строит кадры анимации одного шага MD5.
+
+    Кадр - кортеж строк; строка - None (еще не показана) или пара
+    (подпись, значение, биты). Вместе с кадром сохраняются число тиков,
+    которое он держится, подсвеченная строка и номера строк, изменившихся
+    относительно предыдущего кадра (только их нужно перерисовать).
+
+    Args:
+        record: Запись шага из md5_step_records.
+
+    Returns:
+        list: Список кортежей (строки, тики, подсвеченная строка, измененные строки).
+    """
+    func = record['func']
+    rows = [
+        ("B", record['b']),
+        ("C", record['c']),
+        ("D", record['d']),
+        (f"{func}(B,C,D)", record['f']),
+        ("+ A", record['a']),
+        (f"+ M[{record['k']}]", record['m']),
+        (f"+ T[{record['round'] * 16 + record['step']}]", record['t']),
+        ("= сумма", record['sum']),
+        (f"<<< {record['s']}", record['rotated']),
+        ("+ B = новый B", record['result'])
+    ]
+    cells = [(label, value, value_to_bits(value)) for label, value in rows]
+
+    frames = []
+    current = [None] * len(rows)
+
+    def push(ticks, highlight):
+        previous, previous_highlight = (frames[-1][0], frames[-1][2]) if frames else ((None,) * len(rows), None)
+        changed = {index for index in range(len(rows)) if previous[index] != current[index]}
+        if previous_highlight != highlight:
+            changed |= {previous_highlight, highlight} - {None}
+        frames.append((tuple(current), ticks, highlight, sorted(changed)))
+
+    # Операнды функции раунда
+    current[0:3] = cells[0:3]
+    push(OPERATION_TICKS, None)
+
+    # Функция раунда и последовательные сложения по модулю 2^32
+    for row in range(3, 8):
+        current[row] = cells[row]
+        push(OPERATION_TICKS, row)
+
+    # Циклический сдвиг: по одному биту за кадр
+    label = cells[8][0]
+    for shift in range(1, record['s'] + 1):
+        value = left_rotate(record['sum'], shift)
+        current[8] = (label, value, value_to_bits(value))
+        push(ROTATION_TICKS if shift < record['s'] else OPERATION_TICKS, 8)
+
+    current[9] = cells[9]
+    push(OPERATION_TICKS, 9)
+    return frames
+
+class BitOperationWidget(QWidget):
+    """
+    Анимированная побитовая визуализация шагов раунда MD5.
+
+    Показывает операнды функции раунда, сложения по модулю 2^32
+    и циклический сдвиг на уровне отдельных битов. Кадры каждого шага
+    строятся один раз и кэшируются; при смене кадра перерисовываются
+    только изменившиеся строки. Таймер тикает с постоянной частотой
+    и работает только во время воспроизведения.
+
+    Args:
+        records: Записи шагов блока из md5_step_records.
+        step_index: Номер шага (0-63), с которого начинается показ.
+        parent: Родительский виджет.
+    """
+    def __init__(self, records, step_index, parent=None):
+        super().__init__(parent)
+        self.records = records
+        self.step_index = step_index
+        self.frame_index = 0
+        self.ticks_left = 0
+        self.play_through = False
+        self.frames_cache = {}
+
+        self.bit_font = QFont("Consolas", 10)
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.setMinimumHeight(self.sizeHint().height())
+        self.setToolTip("Щелчок - повторить шаг, двойной щелчок - проиграть до конца блока")
+
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.setInterval(FRAME_INTERVAL_MS)
+        self.timer.timeout.connect(self.tick)
+
+    def sizeHint(self):
+        width = LABEL_WIDTH + 32 * CELL_WIDTH + 7 * NIBBLE_GAP + HEX_WIDTH
+        return QSize(width, ROW_HEIGHT * 10 + 30)
+
+    def frames(self):
+        if self.step_index not in self.frames_cache:
+            self.frames_cache[self.step_index] = build_frames(self.records[self.step_index])
+        return self.frames_cache[self.step_index]
+
+    def current_frame(self):
+        frames = self.frames()
+        return frames[min(self.frame_index, len(frames) - 1)]
+
+    def play(self, play_through=False):
+        """
+        Запускает анимацию текущего шага с первого кадра.
+
+        Args:
+            play_through: Продолжать ли с последующими шагами блока.
+        """
+        self.play_through = play_through
+        self.frame_index = 0
+        self.ticks_left = self.current_frame()[1]
+        self.update()
+        self.timer.start()
+
+    def stop(self):
+        """
+        Останавливает анимацию, оставляя на экране последний кадр шага.
+        """
+        self.timer.stop()
+        self.frame_index = len(self.frames()) - 1
+        self.update()
+
+    def tick(self):
+        self.ticks_left -= 1
+        if self.ticks_left > 0:
+            return
+
+        frames = self.frames()
+        if self.frame_index + 1 < len(frames):
+            self.frame_index += 1
+        elif self.play_through and self.step_index + 1 < len(self.records):
+            self.step_index += 1
+            self.frame_index = 0
+            self.ticks_left = self.current_frame()[1]
+            self.update()
+            return
+        else:
+            self.timer.stop()
+            return
+
+        rows, ticks, _, changed = frames[self.frame_index]
+        self.ticks_left = ticks
+        for row in changed:
+            self.update(self.row_rect(row))
+
+    def row_rect(self, row):
+        return QRect(0, 30 + row * ROW_HEIGHT, self.width(), ROW_HEIGHT)
+
+    def mousePressEvent(self, event):
+        self.play()
+
+    def mouseDoubleClickEvent(self, event):
+        self.play(play_through=True)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setFont(self.bit_font)
+        rows, _, highlight, _ = self.current_frame()
+        dirty = event.rect()
+
+        record = self.records[self.step_index]
+        header = QRect(0, 0, self.width(), 30)
+        if dirty.intersects(header):
+            painter.fillRect(header, self.palette().window())
+            painter.setPen(TEXT_COLOR)
+            painter.drawText(header, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter,
+                             f"Раунд {record['round'] + 1}, шаг {record['step'] + 1}: "
+                             f"B' = B + ((A + {record['func']}(B,C,D) + M[{record['k']}] + T) <<< {record['s']})")
+
+        for row, cell in enumerate(rows):
+            rect = self.row_rect(row)
+            if not dirty.intersects(rect):
+                continue
+            painter.fillRect(rect, HIGHLIGHT_COLOR if row == highlight else self.palette().window())
+            if cell is None:
+                continue
+
+            label, value, bits = cell
+            painter.setPen(TEXT_COLOR)
+            painter.drawText(QRect(4, rect.y(), LABEL_WIDTH - 8, ROW_HEIGHT),
+                             Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter, label)
+
+            x = LABEL_WIDTH
+            for index, bit in enumerate(bits):
+                painter.fillRect(x, rect.y() + 3, CELL_WIDTH - 2, ROW_HEIGHT - 6,
+                                 BIT_ON_COLOR if bit else BIT_OFF_COLOR)
+                x += CELL_WIDTH + (NIBBLE_GAP if index % 4 == 3 else 0)
+
+            painter.drawText(QRect(x + 6, rect.y(), HEX_WIDTH, ROW_HEIGHT),
+                             Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, f"{value:#010x}")
+        painter.end()
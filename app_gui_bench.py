@@ -0,0 +1,214 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+
+# Бенчмарк работает без дисплея; платформу можно переопределить из окружения
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import QEvent, QT_VERSION_STR, PYQT_VERSION_STR
+from app_gui import MD5VisualizerWindow, child_sections
+import md5_metrics
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+DEFAULT_BLOCKS = "1,4,16,64"
+
+# Номер шага с обработкой блоков (с нуля)
+ROUNDS_STEP = 3
+
+def text_for_blocks(blocks):
+    """
+    Возвращает ASCII-текст, который после padding занимает ровно blocks блоков.
+    """
+    return "a" * (blocks * 64 - 9)
+
+def proc_status_kb(field):
+    """
+    Возвращает значение поля /proc/self/status в КБ или None.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def rss_kb():
+    """
+    Возвращает текущий объем резидентной памяти процесса (КБ) или None.
+    """
+    return proc_status_kb('VmRSS')
+
+def peak_rss_kb():
+    """
+    Возвращает пиковый объем резидентной памяти процесса (КБ) или None.
+
+    Пик берется из того же /proc/self/status, что и текущий объем
+    (getrusage считает память иначе и может дать пик меньше текущего);
+    getrusage используется, только если /proc недоступен.
+    """
+    peak = proc_status_kb('VmHWM')
+    if peak is None and resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # В macOS ru_maxrss в байтах, в Linux - в килобайтах
+        peak = peak // 1024 if sys.platform == 'darwin' else peak
+    current = rss_kb()
+    if peak is None or current is None:
+        return peak
+    return max(peak, current)
+
+def timed(app, action):
+    """
+    Выполняет действие и обработку накопившихся событий Qt (раскладка, отрисовка).
+
+    Returns:
+        float: Время в секундах.
+    """
+    start = time.perf_counter()
+    action()
+    app.processEvents()
+    return time.perf_counter() - start
+
+def live_widgets(app):
+    """
+    Возвращает число живых виджетов, предварительно удалив отложенные (deleteLater).
+    """
+    app.sendPostedEvents(None, QEvent.Type.DeferredDelete)
+    return len(app.allWidgets())
+
+def all_sections(window):
+    """
+    Возвращает секции блоков и вложенные секции раундов шага 4.
+    """
+    sections = []
+    for block_section in window.collapsible_sections:
+        # Раунды блока создаются при первом раскрытии - создаем их для замеров
+        block_section.ensure_content()
+        sections.append(block_section)
+        sections.extend(child_sections(block_section))
+    return sections
+
+def bench_window(app, blocks, memory_budget_mb):
+    """
+    Замеряет основные операции окна для входа заданного размера.
+
+    Args:
+        app: Экземпляр QApplication.
+        blocks: Число 64-байтовых блоков после padding.
+        memory_budget_mb: Лимит памяти трассировки (None - по умолчанию).
+
+    Returns:
+        dict: Результаты замеров.
+    """
+    window = MD5VisualizerWindow()
+    if memory_budget_mb:
+        window.memory_budget_mb = memory_budget_mb
+    window.resize(1200, 900)
+    window.show()
+    app.processEvents()
+
+    text = text_for_blocks(blocks)
+    window.input_field.setMaxLength(max(len(text), window.input_field.maxLength()))
+    window.input_field.setText(text)
+
+    result = {'blocks': blocks, 'input_bytes': len(text.encode('utf-8'))}
+    result['calculate_md5_s'] = timed(app, window.calculate_md5)
+    result['detail'] = window.steps[ROUNDS_STEP]['detail']
+
+    def open_rounds_step():
+        window.current_step = ROUNDS_STEP
+        window.display_current_step()
+        window.update_navigation_buttons()
+
+    result['step4_first_render_s'] = timed(app, open_rounds_step)
+    # Остальные секции шага 4 достраиваются в простое; для замеров секций они нужны все
+    result['step4_idle_build_s'] = timed(app, window.idle_worker.flush)
+
+    sections = []
+    result['block_contents_s'] = timed(app, lambda: sections.extend(all_sections(window)))
+    result['sections'] = len(sections)
+    result['expand_s'] = timed(app, lambda: [section.expand_immediately() for section in sections])
+    result['widgets_expanded'] = live_widgets(app)
+    result['collapse_s'] = timed(app, lambda: [section.collapse_immediately() for section in sections])
+
+    # Навигация: от шага 4 до последнего шага, затем назад к первому
+    def forward():
+        while window.current_step < len(window.steps) - 1:
+            window.show_next_step()
+            app.processEvents()
+
+    def back():
+        while window.current_step > 0:
+            window.show_previous_step()
+            app.processEvents()
+
+    result['navigation_forward_s'] = timed(app, forward)
+    result['navigation_back_s'] = timed(app, back)
+    result['step4_rerender_s'] = timed(app, open_rounds_step)
+
+    # Переход к шагу 4 с шага 3 после подготовки соседних шагов в простое
+    window.current_step = ROUNDS_STEP - 1
+    window.display_current_step()
+    window.update_navigation_buttons()
+    window.idle_worker.flush()
+    app.processEvents()
+    result['step4_prefetched_switch_s'] = timed(app, window.show_next_step)
+
+    result['widgets'] = live_widgets(app)
+    result['rss_kb'] = rss_kb()
+    result['peak_rss_kb'] = peak_rss_kb()
+
+    window.close()
+    window.deleteLater()
+    live_widgets(app)
+    return result
+
+def main():
+    """
+    Запускает бенчмарк интерфейса и записывает результаты в JSON.
+    """
+    parser = argparse.ArgumentParser(description="Бенчмарк отрисовки интерфейса визуализатора MD5")
+    parser.add_argument('--blocks', default=DEFAULT_BLOCKS,
+                        help=f"Размеры входа в блоках через запятую (по умолчанию {DEFAULT_BLOCKS})")
+    parser.add_argument('--memory-budget', type=int, help="Лимит памяти трассировки (МБ)")
+    parser.add_argument('--output', default='bench_gui.json', help="Файл для результатов (JSON)")
+    parser.add_argument('--metrics-file', help="Собрать метрики движка и записать их в файл (формат Prometheus)")
+    args = parser.parse_args()
+    if args.metrics_file:
+        md5_metrics.enable()
+
+    app = QApplication(sys.argv)
+    results = []
+    for blocks in (int(value) for value in args.blocks.split(',')):
+        result = bench_window(app, blocks, args.memory_budget)
+        results.append(result)
+        print(f"{blocks} блоков: calculate_md5 {result['calculate_md5_s']:.3f} с, "
+              f"шаг 4 {result['step4_first_render_s']:.3f} с, "
+              f"виджетов {result['widgets_expanded']}", file=sys.stderr)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'qt': QT_VERSION_STR,
+        'pyqt': PYQT_VERSION_STR,
+        'platform': platform.platform(),
+        'qpa_platform': os.environ['QT_QPA_PLATFORM'],
+        'results': results
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.metrics_file:
+        md5_metrics.write_metrics(args.metrics_file)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+from PyQt6.QtWidgets import (
+    QWidget,
+    QFrame,
+    QVBoxLayout,
+    QHBoxLayout,
+    QLabel,
+    QPushButton,
+    QProgressBar,
+    QScrollArea
+)
+from PyQt6.QtCore import QTimer, pyqtSignal
+from md5_jobs import JOB_STATUS_NAMES, JOB_DONE, JOB_FAILED
+
+# Период опроса пула, пока есть активные задания (мс)
+POLL_INTERVAL_MS = 50
+
+class JobRow(QFrame):
+    """
+    Строка одного задания: название, состояние, прогресс и кнопки.
+
+    Args:
+        job: Задание HashJob.
+        parent: Родительский виджет.
+    """
+    show_requested = pyqtSignal(object)
+    cancel_requested = pyqtSignal(object)
+    remove_requested = pyqtSignal(object)
+
+    def __init__(self, job, parent=None):
+        super().__init__(parent)
+        self.setObjectName("styled")
+        self.setFrameStyle(QFrame.Shape.StyledPanel | QFrame.Shadow.Raised)
+        self.job = job
+
+        layout = QVBoxLayout(self)
+
+        header = QHBoxLayout()
+        self.name_label = QLabel(f"#{job.id} {job.name}")
+        self.name_label.setToolTip(job.name)
+        self.status_label = QLabel()
+        header.addWidget(self.name_label, 1)
+        header.addWidget(self.status_label)
+        layout.addLayout(header)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximum(1000)
+        self.progress_bar.setTextVisible(False)
+        layout.addWidget(self.progress_bar)
+
+        buttons = QHBoxLayout()
+        self.show_button = QPushButton("Показать")
+        self.show_button.clicked.connect(lambda: self.show_requested.emit(self.job))
+        self.cancel_button = QPushButton("Отменить")
+        self.cancel_button.clicked.connect(lambda: self.cancel_requested.emit(self.job))
+        remove_button = QPushButton("✕")
+        remove_button.setToolTip("Убрать задание из списка")
+        remove_button.clicked.connect(lambda: self.remove_requested.emit(self.job))
+        buttons.addWidget(self.show_button)
+        buttons.addWidget(self.cancel_button)
+        buttons.addWidget(remove_button)
+        layout.addLayout(buttons)
+
+        self.refresh()
+
+    def refresh(self):
+        """
+        Обновляет строку по текущему состоянию задания.
+        """
+        job = self.job
+        status = JOB_STATUS_NAMES[job.status]
+        if job.status == JOB_DONE:
+            if job.evicted:
+                status = job.digest + " (трасса вытеснена)"
+            elif job.truncated:
+                status = job.digest + f" (трасса обрезана до {len(job.blocks)} блоков)"
+            else:
+                status = job.digest
+        elif job.status == JOB_FAILED:
+            status = f"{status}: {job.error}"
+        self.status_label.setText(status)
+        self.progress_bar.setValue(int(1000 * job.progress()))
+        self.show_button.setEnabled(job.status == JOB_DONE)
+        self.cancel_button.setEnabled(job.is_active())
+
+class JobsPanel(QWidget):
+    """
+    Боковая панель очереди заданий хеширования.
+
+    Показывает прогресс каждого задания, позволяет отменять задания
+    и открывать трассу завершенного задания в основном окне. Пока есть
+    активные задания, таймер продвигает менеджер заданий.
+
+    Args:
+        manager: Менеджер заданий JobManager.
+        parent: Родительский виджет.
+    """
+    show_requested = pyqtSignal(object)
+    add_input_requested = pyqtSignal()
+    add_files_requested = pyqtSignal()
+
+    def __init__(self, manager, parent=None):
+        super().__init__(parent)
+        self.manager = manager
+        self.rows = {}
+
+        layout = QVBoxLayout(self)
+
+        buttons = QHBoxLayout()
+        add_input_button = QPushButton("Добавить ввод")
+        add_input_button.setToolTip("Поставить в очередь текущий текст или открытый файл")
+        add_input_button.clicked.connect(self.add_input_requested)
+        add_files_button = QPushButton("Добавить файлы...")
+        add_files_button.clicked.connect(self.add_files_requested)
+        buttons.addWidget(add_input_button)
+        buttons.addWidget(add_files_button)
+        layout.addLayout(buttons)
+
+        self.store_label = QLabel()
+        self.store_label.setWordWrap(True)
+        layout.addWidget(self.store_label)
+
+        scroll_area = QScrollArea()
+        scroll_area.setWidgetResizable(True)
+        scroll_area.setFrameShape(QFrame.Shape.NoFrame)
+        rows_widget = QWidget()
+        self.rows_layout = QVBoxLayout(rows_widget)
+        self.rows_layout.setContentsMargins(0, 0, 0, 0)
+        self.rows_layout.addStretch()
+        scroll_area.setWidget(rows_widget)
+        layout.addWidget(scroll_area, 1)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(POLL_INTERVAL_MS)
+        self.timer.timeout.connect(self.poll)
+        self.update_store_label()
+
+    def add_job(self, job):
+        """
+        Добавляет строку задания и запускает опрос менеджера.
+        """
+        row = JobRow(job)
+        row.show_requested.connect(self.show_requested)
+        row.cancel_requested.connect(self.cancel_job)
+        row.remove_requested.connect(self.remove_job)
+        self.rows[job.id] = row
+        self.rows_layout.insertWidget(self.rows_layout.count() - 1, row)
+        self.timer.start()
+
+    def cancel_job(self, job):
+        self.manager.cancel(job)
+        self.rows[job.id].refresh()
+
+    def remove_job(self, job):
+        self.manager.remove(job)
+        row = self.rows.pop(job.id)
+        row.hide()
+        row.deleteLater()
+        self.update_store_label()
+
+    def poll(self):
+        """
+        Продвигает менеджер заданий и обновляет строки.
+
+        Обновляются все строки: вытеснение трасс из хранилища меняет
+        и задания, которые сами не продвигались.
+        """
+        self.manager.poll()
+        for row in self.rows.values():
+            row.refresh()
+        self.update_store_label()
+        if not self.manager.has_active():
+            self.timer.stop()
+
+    def update_store_label(self):
+        store = self.manager.store
+        self.store_label.setText(f"Трассы в памяти: ~{store.used_bytes() / (1024 * 1024):.1f} МБ "
+                                 f"из {store.budget_bytes / (1024 * 1024):.0f} МБ")
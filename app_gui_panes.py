@@ -0,0 +1,303 @@
+from collections import OrderedDict
+from PyQt6.QtWidgets import (
+    QWidget,
+    QFrame,
+    QVBoxLayout,
+    QHBoxLayout,
+    QLabel,
+    QPushButton,
+    QCheckBox,
+    QSplitter,
+    QSizePolicy
+)
+from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtGui import QFont
+from md5_algorithm import md5_step_records, DETAIL_FULL
+from app_gui_animation import BitOperationWidget
+import md5_metrics
+
+# Сколько блоков с записями шагов держать в кэше модели
+RECORDS_CACHE_BLOCKS = 8
+
+STEPS_PER_BLOCK = 64
+
+class TraceModel:
+    """
+    Общая модель трассы шага 4 для всех представлений.
+
+    Хранит ссылку на уже построенные данные шага 4 и ничего не копирует;
+    записи шагов для побитовой анимации вычисляются по требованию
+    и держатся в небольшом LRU-кэше по блокам.
+
+    Args:
+        step_data: Структурированные данные шага 4.
+    """
+    def __init__(self, step_data):
+        self.step_data = step_data
+        self.blocks = step_data.get('blocks', [])
+        self.detail = step_data.get('detail', DETAIL_FULL)
+        self.records_cache = OrderedDict()
+        self.positions = None
+
+    def block_count(self):
+        return len(self.blocks)
+
+    def total_steps(self):
+        return len(self.blocks) * STEPS_PER_BLOCK
+
+    def start_buffers(self, block):
+        return block_start_buffers(self.step_data, block)
+
+    def block_number(self, block):
+        """
+        Возвращает номер блока в сообщении (при выборочной трассе он
+        может отличаться от позиции блока в модели).
+        """
+        return self.blocks[block].get('block_index', block)
+
+    def position(self, block_number):
+        """
+        Возвращает позицию блока в модели по его номеру или None, если блок не трассировался.
+        """
+        if self.positions is None:
+            self.positions = {self.block_number(block): block for block in range(len(self.blocks))}
+        return self.positions.get(block_number)
+
+    def step_text(self, block, round_index, step):
+        """
+        Возвращает текст шага или None, если шаги не сохранялись
+        (сокращенная детализация).
+        """
+        rounds = self.blocks[block]['rounds']
+        if round_index >= len(rounds) or step >= len(rounds[round_index]['steps']):
+            return None
+        return rounds[round_index]['steps'][step]
+
+    def round_summary(self, block, round_index):
+        rounds = self.blocks[block]['rounds']
+        if round_index >= len(rounds):
+            return None
+        return rounds[round_index].get('summary')
+
+    def records(self, block):
+        """
+        Возвращает записи шагов блока, вычисляя их при первом обращении.
+        """
+        hit = block in self.records_cache
+        if md5_metrics.ENABLED:
+            md5_metrics.count_cache('step_records', int(hit), int(not hit))
+        if hit:
+            self.records_cache.move_to_end(block)
+            return self.records_cache[block]
+        data = bytes.fromhex(self.blocks[block]['block_hex'].replace('-', ''))
+        records = md5_step_records(data, self.start_buffers(block))
+        self.records_cache[block] = records
+        if len(self.records_cache) > RECORDS_CACHE_BLOCKS:
+            self.records_cache.popitem(last=False)
+        return records
+
+    def clamp(self, linear):
+        return max(0, min(linear, self.total_steps() - 1))
+
+def block_start_buffers(step_data, block):
+    """
+    Возвращает буферы перед блоком трассы шага 4.
+
+    Args:
+        step_data: Структурированные данные шага 4.
+        block: Позиция блока в списке трассированных блоков.
+    """
+    blocks = step_data['blocks']
+    if 'start_buffers' in blocks[block]:
+        return blocks[block]['start_buffers']
+    return blocks[block - 1]['final_buffers'] if block else step_data['initial_buffers']
+
+def to_linear(address):
+    block, round_index, step = address
+    return block * STEPS_PER_BLOCK + round_index * 16 + step
+
+def from_linear(linear):
+    block, rest = divmod(linear, STEPS_PER_BLOCK)
+    return block, rest // 16, rest % 16
+
+class StepPane(QFrame):
+    """
+    Легковесное представление одного шага из общей модели трассы.
+
+    Хранит только адрес (блок, раунд, шаг); содержимое строится лениво -
+    при первом показе панели или после смены адреса, пока панель видима.
+
+    Args:
+        model: Общая модель трассы.
+        address: Кортеж (блок, раунд, шаг), нумерация с нуля.
+        parent: Родительский виджет.
+    """
+    navigated = pyqtSignal(object, int)
+    closed = pyqtSignal(object)
+
+    def __init__(self, model, address, parent=None):
+        super().__init__(parent)
+        self.setObjectName("styled")
+        self.setFrameStyle(QFrame.Shape.StyledPanel | QFrame.Shadow.Raised)
+        self.model = model
+        self.linear = model.clamp(to_linear(address))
+        self.dirty = True
+
+        layout = QVBoxLayout(self)
+
+        header = QHBoxLayout()
+        # Переходы на блок, раунд и шаг назад и вперед: все идут через navigated,
+        # поэтому синхронные панели сохраняют смещение блоков и раундов
+        self.prev_buttons = [self.navigation_button(text, tooltip, -delta)
+                             for text, tooltip, delta in (("◀◀◀", "Предыдущий блок", STEPS_PER_BLOCK),
+                                                          ("◀◀", "Предыдущий раунд", 16),
+                                                          ("◀", "Предыдущий шаг", 1))]
+        self.next_buttons = [self.navigation_button(text, tooltip, delta)
+                             for text, tooltip, delta in (("▶", "Следующий шаг", 1),
+                                                          ("▶▶", "Следующий раунд", 16),
+                                                          ("▶▶▶", "Следующий блок", STEPS_PER_BLOCK))]
+        self.address_label = QLabel()
+        self.address_label.setObjectName("stepLabel")
+        self.address_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.sync_checkbox = QCheckBox("Синхронно")
+        self.sync_checkbox.setChecked(True)
+        close_button = QPushButton("✕")
+        close_button.clicked.connect(lambda: self.closed.emit(self))
+
+        for button in self.prev_buttons:
+            header.addWidget(button)
+        header.addWidget(self.address_label, 1)
+        for button in self.next_buttons:
+            header.addWidget(button)
+        header.addWidget(self.sync_checkbox)
+        header.addWidget(close_button)
+        layout.addLayout(header)
+
+        self.body = QWidget()
+        self.body_layout = QVBoxLayout(self.body)
+        self.body_layout.setContentsMargins(0, 0, 0, 0)
+        self.body.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        layout.addWidget(self.body, 1)
+
+    def navigation_button(self, text, tooltip, delta):
+        button = QPushButton(text)
+        button.setToolTip(tooltip)
+        button.clicked.connect(lambda: self.navigated.emit(self, delta))
+        return button
+
+    def address(self):
+        return from_linear(self.linear)
+
+    def set_model(self, model):
+        self.model = model
+        self.set_linear(self.linear)
+
+    def set_linear(self, linear):
+        """
+        Переводит панель на другой шаг; перерисовка откладывается,
+        если панель сейчас не видна.
+        """
+        self.linear = self.model.clamp(linear)
+        self.dirty = True
+        if self.isVisible():
+            self.render()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.dirty:
+            self.render()
+
+    def render(self):
+        """
+        Строит содержимое панели для текущего адреса.
+        """
+        self.dirty = False
+        while self.body_layout.count():
+            item = self.body_layout.takeAt(0)
+            if item.widget():
+                item.widget().deleteLater()
+
+        if not self.model.total_steps():
+            self.address_label.setText("Нет данных")
+            return
+
+        block, round_index, step = self.address()
+        self.address_label.setText(f"Блок {self.model.block_number(block) + 1}, "
+                                   f"раунд {round_index + 1}, шаг {step + 1}")
+        for button in self.prev_buttons:
+            button.setEnabled(self.linear > 0)
+        for button in self.next_buttons:
+            button.setEnabled(self.linear < self.model.total_steps() - 1)
+
+        text = self.model.step_text(block, round_index, step)
+        if text is not None:
+            animation = BitOperationWidget(self.model.records(block), to_linear((0, round_index, step)))
+            self.body_layout.addWidget(animation)
+        else:
+            text = (self.model.round_summary(block, round_index) or
+                    "Шаги этого блока не сохранены при текущей детализации трассы.")
+
+        label = QLabel(text)
+        label.setWordWrap(True)
+        label.setFont(QFont("Consolas", 11))
+        label.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop)
+        self.body_layout.addWidget(label)
+        self.body_layout.addStretch()
+
+class PinnedStepsView(QSplitter):
+    """
+    Разделенное окно с закрепленными шагами для сравнения.
+
+    Все панели ссылаются на одну модель трассы. Навигация в панели
+    с включенной синхронизацией сдвигает на столько же шагов все
+    остальные синхронные панели, сохраняя расстояние между ними.
+    """
+    def __init__(self, parent=None):
+        super().__init__(Qt.Orientation.Horizontal, parent)
+        self.model = None
+        self.panes = []
+        self.setChildrenCollapsible(False)
+        self.hide()
+
+    def set_model(self, model):
+        """
+        Переключает все панели на новую модель трассы.
+        """
+        self.model = model
+        for pane in self.panes:
+            pane.set_model(model)
+
+    def pin(self, address):
+        """
+        Закрепляет шаг в новой панели.
+
+        Args:
+            address: Кортеж (блок, раунд, шаг), нумерация с нуля.
+        """
+        if self.model is None or not self.model.total_steps():
+            return
+        pane = StepPane(self.model, address)
+        pane.navigated.connect(self.navigate)
+        pane.closed.connect(self.unpin)
+        self.panes.append(pane)
+        self.addWidget(pane)
+        self.show()
+
+    def unpin(self, pane):
+        self.panes.remove(pane)
+        pane.hide()
+        pane.deleteLater()
+        if not self.panes:
+            self.hide()
+
+    def clear(self):
+        for pane in list(self.panes):
+            self.unpin(pane)
+
+    def navigate(self, source, delta):
+        if not source.sync_checkbox.isChecked():
+            source.set_linear(source.linear + delta)
+            return
+        for pane in self.panes:
+            if pane.sync_checkbox.isChecked():
+                pane.set_linear(pane.linear + delta)
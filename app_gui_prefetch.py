@@ -0,0 +1,74 @@
+import time
+from collections import deque
+from PyQt6.QtCore import QObject, QTimer
+
+# Сколько времени одна порция фоновой работы может занимать поток интерфейса (мс)
+IDLE_SLICE_MS = 8
+
+class IdleWorker(QObject):
+    """
+    Выполняет задачи небольшими порциями, когда цикл событий простаивает.
+
+    Задача - генератор, который делает единицу работы (например, создает
+    секцию одного блока) между yield. Если задача отдает True, порция
+    завершается досрочно: так задача уступает цикл событий работе,
+    которую Qt выполнит после порции (например, удалению виджетов
+    через deleteLater). Таймер с нулевым интервалом
+    срабатывает после обработки накопившихся событий, а порция ограничена
+    по времени, поэтому ввод пользователя не ждет окончания работы.
+    Виджеты создаются в потоке интерфейса, как того требует Qt.
+
+    Args:
+        slice_ms: Ограничение длительности одной порции.
+        parent: Родительский объект.
+    """
+    def __init__(self, slice_ms=IDLE_SLICE_MS, parent=None):
+        super().__init__(parent)
+        self.slice_seconds = slice_ms / 1000
+        self.tasks = deque()
+        self.timer = QTimer(self)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self.run_slice)
+
+    def submit(self, task):
+        """
+        Ставит задачу-генератор в очередь.
+        """
+        self.tasks.append(task)
+        self.timer.start()
+
+    def clear(self):
+        """
+        Отменяет все невыполненные задачи.
+        """
+        self.tasks.clear()
+        self.timer.stop()
+
+    def is_idle(self):
+        return not self.tasks
+
+    def run_slice(self):
+        """
+        Продвигает задачи по очереди, пока не истечет время порции.
+        """
+        deadline = time.perf_counter() + self.slice_seconds
+        while self.tasks and time.perf_counter() < deadline:
+            if self.step():
+                break
+        if not self.tasks:
+            self.timer.stop()
+
+    def flush(self):
+        """
+        Выполняет все задачи до конца без разбиения на порции.
+        """
+        while self.tasks:
+            self.step()
+        self.timer.stop()
+
+    def step(self):
+        try:
+            return next(self.tasks[0])
+        except StopIteration:
+            self.tasks.popleft()
+            return None
@@ -1,5 +1,9 @@
+import re
 import math
 import binascii
+from bisect import bisect_right
+from array import array
+import md5_metrics
 
 T = [int((2 ** 32) * abs(math.sin(i + 1))) & 0xFFFFFFFF for i in range(64)]
 
@@ -10,56 +14,87 @@ S = [
     [6, 10, 15, 21]
 ]
 
+DETAIL_FULL = 'full'
+DETAIL_ROUNDS = 'rounds'
+DETAIL_BUFFERS = 'buffers'
+
+DETAIL_LEVELS = [DETAIL_FULL, DETAIL_ROUNDS, DETAIL_BUFFERS]
+
+# Примерный объем памяти (в байтах), который занимает трасса одного блока
+# вместе с объектами Python для каждого уровня детализации
+TRACE_BYTES_PER_BLOCK = {
+    DETAIL_FULL: 36 * 1024,
+    DETAIL_ROUNDS: 4 * 1024,
+    DETAIL_BUFFERS: 2 * 1024
+}
+
+# Число записей трассы одного блока: шаги, сводки раундов или снимок буферов
+TRACE_RECORDS_PER_BLOCK = {
+    DETAIL_FULL: 64,
+    DETAIL_ROUNDS: 4,
+    DETAIL_BUFFERS: 1
+}
+
 def text_to_bytearray(text: str) -> bytes:
     return text.encode('utf-8')
 
-def bytearray_visualize_with_chars(byte_data: bytes) -> str:
+def utf8_prefix_length(byte_data: bytes, max_bytes=None) -> int:
+    # Длина префикса не длиннее max_bytes, обрезанного по границе символа UTF-8
+    if max_bytes is None or len(byte_data) <= max_bytes:
+        return len(byte_data)
+    cut = max_bytes
+    while cut > 0 and (byte_data[cut] & 0xC0) == 0x80:
+        cut -= 1
+    return cut
+
+def utf8_char_start(byte_data: bytes, offset: int) -> int:
+    # Начало символа UTF-8, которому принадлежит байт offset
+    while 0 < offset < len(byte_data) and (byte_data[offset] & 0xC0) == 0x80:
+        offset -= 1
+    return offset
+
+def utf8_char_lines(byte_data: bytes) -> list:
+    # Строки "Символ X: hex" по одной на символ; для неверного UTF-8 - UnicodeDecodeError
+    lines = []
+    offset = 0
+    for char in byte_data.decode('utf-8'):
+        size = len(char.encode('utf-8'))
+        hex_vals = binascii.hexlify(byte_data[offset:offset + size], sep='-').decode('utf-8')
+        lines.append(f"Символ {char}: {hex_vals}")
+        offset += size
+    return lines
+
+def format_bytes_with_chars(byte_data: bytes, char_lines=None, total_length=None) -> str:
+    # Собирает шаг 1 из готовых строк символов (None - побайтовый вывод)
     hex_line = binascii.hexlify(byte_data, sep='-').decode('utf-8')
-    hex_values = hex_line.split('-')
-    result = []
-    
-    result.append(hex_line)
-    result.append("")
-    
+    result = [hex_line, ""]
+    if char_lines is not None:
+        result.extend(char_lines)
+    else:
+        result.extend(f"Байт: {hex_val}" for hex_val in hex_line.split('-') if hex_val)
+    text = '\n'.join(result)
+    if total_length is not None and total_length > len(byte_data):
+        text += f"\n... показаны первые {len(byte_data)} из {total_length} байт"
+    return text
+
+def bytearray_visualize_with_chars(byte_data: bytes, max_bytes=None) -> str:
+    shown = byte_data[:utf8_prefix_length(byte_data, max_bytes)]
     try:
-        decoded_text = byte_data.decode('utf-8')
-        chars = list(decoded_text)
-        char_index = 0
-        bytes_per_char = []
-        
-        temp_data = byte_data
-        while temp_data:
-            for i in range(1, 5):
-                try:
-                    temp_data[:i].decode('utf-8')
-                    bytes_per_char.append(i)
-                    temp_data = temp_data[i:]
-                    break
-                except UnicodeDecodeError:
-                    continue
-        
-        i = 0
-        char_index = 0
-        while i < len(hex_values) and char_index < len(chars):
-            char = chars[char_index]
-            num_bytes = bytes_per_char[char_index]
-            hex_vals = '-'.join(hex_values[i:i+num_bytes])
-            result.append(f"Символ {char}: {hex_vals}")
-            i += num_bytes
-            char_index += 1
-                
+        char_lines = utf8_char_lines(shown)
     except UnicodeDecodeError:
-        for i, hex_val in enumerate(hex_values):
-            byte = byte_data[i]
-            char = chr(byte) if 32 <= byte <= 126 else '.'
-            result.append(f"Байт: {hex_val}")
-    
-    return '\n'.join(result)
+        char_lines = None
+    return format_bytes_with_chars(shown, char_lines, len(byte_data))
 
 def bytearray_visualize_simple(byte_data: bytes) -> str:
     hex_line = binascii.hexlify(byte_data, sep='-').decode('utf-8')
     return hex_line
 
+def bytearray_visualize_preview(byte_data: bytes, max_bytes=None) -> str:
+    if max_bytes is None or len(byte_data) <= max_bytes:
+        return bytearray_visualize_simple(byte_data)
+    return (bytearray_visualize_simple(byte_data[:max_bytes]) +
+            f"-... (еще {len(byte_data) - max_bytes} байт)")
+
 def add_padding(byte_data: bytes) -> bytearray:
     original_length_bits = len(byte_data) * 8
     padded_data = bytearray(byte_data)
@@ -92,7 +127,128 @@ def buffer_init():
 def left_rotate(x, c):
     return ((x << c) | (x >> (32 - c))) & 0xFFFFFFFF
 
-def md5_process_block_with_details(block, buffers):
+K_INDEX = ([i for i in range(16)] +
+           [(5 * i + 1) % 16 for i in range(16)] +
+           [(3 * i + 5) % 16 for i in range(16)] +
+           [(7 * i) % 16 for i in range(16)])
+
+def compress_block(block, buffers):
+    # Сжатие блока без учета в метриках - для циклов, которые учитывают блоки сами
+    M = [int.from_bytes(block[i:i + 4], byteorder='little') for i in range(0, 64, 4)]
+    A, B, C, D = buffers
+
+    for round_index, func in enumerate([F, G, H, I]):
+        for i in range(16):
+            step = round_index * 16 + i
+            k = K_INDEX[step]
+            s = S[round_index][i % 4]
+            temp = (A + func(B, C, D) + M[k] + T[step]) & 0xFFFFFFFF
+            A, D, C, B = D, C, B, (B + left_rotate(temp, s)) & 0xFFFFFFFF
+
+    buffers[0] = (buffers[0] + A) & 0xFFFFFFFF
+    buffers[1] = (buffers[1] + B) & 0xFFFFFFFF
+    buffers[2] = (buffers[2] + C) & 0xFFFFFFFF
+    buffers[3] = (buffers[3] + D) & 0xFFFFFFFF
+
+    return buffers
+
+def md5_process_block(block, buffers):
+    compress_block(block, buffers)
+    if md5_metrics.ENABLED:
+        md5_metrics.count_blocks('fast', 1)
+    return buffers
+
+def md5_block_states(block, buffers):
+    # Значения регистров A, B, C, D после каждого из 64 шагов, упакованные в массив
+    M = [int.from_bytes(block[i:i + 4], byteorder='little') for i in range(0, 64, 4)]
+    A, B, C, D = buffers
+    states = array('I')
+
+    for round_index, func in enumerate([F, G, H, I]):
+        for i in range(16):
+            step = round_index * 16 + i
+            k = K_INDEX[step]
+            s = S[round_index][i % 4]
+            temp = (A + func(B, C, D) + M[k] + T[step]) & 0xFFFFFFFF
+            A, D, C, B = D, C, B, (B + left_rotate(temp, s)) & 0xFFFFFFFF
+            states.extend((A, B, C, D))
+
+    if md5_metrics.ENABLED:
+        md5_metrics.count_blocks('states', 1)
+    return states
+
+def md5_step_records(block, buffers):
+    # Операнды и промежуточные значения каждого шага для побитовой визуализации
+    started = md5_metrics.start_timer()
+    M = [int.from_bytes(block[i:i + 4], byteorder='little') for i in range(0, 64, 4)]
+    A, B, C, D = buffers
+    records = []
+
+    for round_index, func in enumerate([F, G, H, I]):
+        for i in range(16):
+            step = round_index * 16 + i
+            k = K_INDEX[step]
+            s = S[round_index][i % 4]
+            f_value = func(B, C, D) & 0xFFFFFFFF
+            temp = (A + f_value + M[k] + T[step]) & 0xFFFFFFFF
+            rotated = left_rotate(temp, s)
+            new_B = (B + rotated) & 0xFFFFFFFF
+            records.append({
+                'round': round_index,
+                'step': i,
+                'func': func.__name__,
+                'k': k,
+                's': s,
+                'a': A, 'b': B, 'c': C, 'd': D,
+                'm': M[k],
+                't': T[step],
+                'f': f_value,
+                'sum': temp,
+                'rotated': rotated,
+                'result': new_B
+            })
+            A, D, C, B = D, C, B, new_B
+
+    if started is not None:
+        md5_metrics.count_blocks('records', 1)
+        md5_metrics.count_trace('step_records', len(records), 0)
+        md5_metrics.observe_call('md5_step_records', started)
+    return records
+
+def count_traced_blocks(detail, blocks):
+    """
+    Учитывает в метриках трассированные блоки.
+    """
+    if not md5_metrics.ENABLED or not blocks:
+        return
+    if detail != DETAIL_BUFFERS:
+        # Блоки уровня DETAIL_BUFFERS сжимаются быстрым путем и учтены в нем
+        md5_metrics.count_blocks('traced', blocks)
+    md5_metrics.count_trace(detail, blocks * TRACE_RECORDS_PER_BLOCK[detail],
+                            blocks * TRACE_BYTES_PER_BLOCK[detail])
+
+def count_pool_blocks(detail, blocks, traced_blocks=0):
+    """
+    Учитывает в метриках блоки, сжатые в процессе пула.
+
+    У процессов пула свои счетчики, которые никуда не выводятся,
+    поэтому работа пула учитывается там, где получен ее результат.
+
+    Args:
+        detail: Уровень детализации трассированных блоков.
+        blocks: Общее число сжатых блоков.
+        traced_blocks: Сколько из них трассировано.
+    """
+    if not md5_metrics.ENABLED:
+        return
+    fast_blocks = blocks - traced_blocks if detail != DETAIL_BUFFERS else blocks
+    if fast_blocks:
+        md5_metrics.count_blocks('fast', fast_blocks)
+    count_traced_blocks(detail, traced_blocks)
+
+def md5_process_block_with_details(block, buffers, detail=DETAIL_FULL, states=None):
+    # states: массив, в который добавляются регистры A, B, C, D после каждого шага (для индекса поиска)
+    started = md5_metrics.start_timer()
     M = [int.from_bytes(block[i:i + 4], byteorder='little') for i in range(0, 64, 4)]
     A, B, C, D = buffers
     original_buffers = buffers.copy()
@@ -102,20 +258,27 @@ def md5_process_block_with_details(block, buffers):
     rounds_data.append(f"Исходные значения буферов:")
     rounds_data.append(f"A = {A:#010x}, B = {B:#010x}, C = {C:#010x}, D = {D:#010x}\n")
 
+    if detail == DETAIL_BUFFERS:
+        # Только буферы: блок сжимается без построения трассы раундов
+        if states is None:
+            md5_process_block(block, buffers)
+        else:
+            states.extend(md5_block_states(block, buffers))
+            for i in range(4):
+                buffers[i] = (buffers[i] + states[i - 4]) & 0xFFFFFFFF
+        rounds_data.append("\nФинальные значения буферов:")
+        rounds_data.append(f"A = {buffers[0]:#010x}, B = {buffers[1]:#010x}, C = {buffers[2]:#010x}, D = {buffers[3]:#010x}")
+        if started is not None:
+            count_traced_blocks(detail, 1)
+            md5_metrics.observe_call('md5_process_block_with_details', started)
+        return buffers, rounds_data
+
     for round_index, func in enumerate([F, G, H, I]):
         rounds_data.append(f"=== Раунд {round_index + 1} ===")
         
         for i in range(16):
             step = round_index * 16 + i
-            if round_index == 0:
-                k = i
-            elif round_index == 1:
-                k = (5 * i + 1) % 16
-            elif round_index == 2:
-                k = (3 * i + 5) % 16
-            else:
-                k = (7 * i) % 16
-
+            k = K_INDEX[step]
             s = S[round_index][i % 4]
             
             old_A, old_B, old_C, old_D = A, B, C, D
@@ -123,13 +286,20 @@ def md5_process_block_with_details(block, buffers):
             temp = (A + func(B, C, D) + M[k] + T[step]) & 0xFFFFFFFF
             new_A = (B + left_rotate(temp, s)) & 0xFFFFFFFF
 
-            rounds_data.append(f"Шаг {i + 1}:")
-            rounds_data.append(f"Функция: {func.__name__}")
-            rounds_data.append(f"M[{k}] = {M[k]:#010x}, T[{step}] = {T[step]:#010x}, S = {s}")
-            rounds_data.append(f"До: A = {old_A:#010x}, B = {old_B:#010x}, C = {old_C:#010x}, D = {old_D:#010x}")
-            rounds_data.append(f"После: A = {D:#010x}, B = {new_A:#010x}, C = {B:#010x}, D = {C:#010x}\n")
+            if detail == DETAIL_FULL:
+                rounds_data.append(f"Шаг {i + 1}:")
+                rounds_data.append(f"Функция: {func.__name__}")
+                rounds_data.append(f"M[{k}] = {M[k]:#010x}, T[{step}] = {T[step]:#010x}, S = {s}")
+                rounds_data.append(f"До: A = {old_A:#010x}, B = {old_B:#010x}, C = {old_C:#010x}, D = {old_D:#010x}")
+                rounds_data.append(f"После: A = {D:#010x}, B = {new_A:#010x}, C = {B:#010x}, D = {C:#010x}\n")
 
             A, D, C, B = D, C, B, new_A
+            if states is not None:
+                states.extend((A, B, C, D))
+
+        if detail == DETAIL_ROUNDS:
+            rounds_data.append(f"Функция: {func.__name__}, шаги 1-16")
+            rounds_data.append(f"После раунда: A = {A:#010x}, B = {B:#010x}, C = {C:#010x}, D = {D:#010x}\n")
 
     buffers[0] = (buffers[0] + A) & 0xFFFFFFFF
     buffers[1] = (buffers[1] + B) & 0xFFFFFFFF
@@ -138,25 +308,281 @@ def md5_process_block_with_details(block, buffers):
 
     rounds_data.append("\nФинальные значения буферов:")
     rounds_data.append(f"A = {buffers[0]:#010x}, B = {buffers[1]:#010x}, C = {buffers[2]:#010x}, D = {buffers[3]:#010x}")
-    
+
+    if started is not None:
+        count_traced_blocks(detail, 1)
+        md5_metrics.observe_call('md5_process_block_with_details', started)
     return buffers, rounds_data
 
-def process_blocks_with_detailed_visualization(data: bytes, buffers, callback=None):
-    for i in range(0, len(data), 64):
+def process_blocks_with_detailed_visualization(data: bytes, buffers, callback=None, detail=DETAIL_FULL, start_block=0,
+                                               index=None):
+    # index: поисковый индекс, заполняемый состояниями из того же прохода (без повторного сжатия)
+    for i in range(start_block * 64, len(data), 64):
         block = data[i:i + 64]
         block_hex = bytearray_visualize_simple(block)
         
-        buffers, rounds_data = md5_process_block_with_details(block, buffers)
+        if index is None:
+            buffers, rounds_data = md5_process_block_with_details(block, buffers, detail)
+        else:
+            start_buffers = buffers.copy()
+            states = array('I')
+            buffers, rounds_data = md5_process_block_with_details(block, buffers, detail, states)
+            index.add_states(i // 64, block, states, start_buffers)
         if callback:
             callback(i // 64, block_hex, rounds_data, buffers.copy())
     
     return buffers
 
+def structure_block_trace(block_index, block_hex, rounds_data, buffers, detail=DETAIL_FULL, start_buffers=None):
+    # Преобразуем rounds_data в структуру с раундами и шагами
+    structured_rounds = []
+
+    # Разбиваем данные на раунды (их 4)
+    round_texts = []
+    current_round = -1
+
+    for line in rounds_data:
+        if line.startswith("=== Раунд "):
+            if current_round >= 0:
+                round_texts.append(current_round_text)
+            current_round = int(line.split()[2]) - 1
+            current_round_text = []  # Изменено: не включаем заголовок раунда в список строк
+        elif current_round >= 0:
+            current_round_text.append(line)
+
+    if current_round >= 0:
+        round_texts.append(current_round_text)
+
+    # Для каждого раунда создаем структуру с шагами
+    for round_idx, round_text in enumerate(round_texts):
+        if detail == DETAIL_ROUNDS:
+            structured_rounds.append({
+                'index': round_idx,
+                'steps': [],
+                'summary': "\n".join(round_text)
+            })
+            continue
+
+        steps = []
+        current_step_text = []
+
+        for line in round_text:
+            if line.startswith("Шаг "):
+                if current_step_text:
+                    steps.append("\n".join(current_step_text))
+                current_step_text = [line]
+            else:
+                current_step_text.append(line)
+
+        if current_step_text:
+            steps.append("\n".join(current_step_text))
+
+        structured_rounds.append({
+            'index': round_idx,
+            'steps': steps
+        })
+
+    block_trace = {
+        'block_index': block_index,
+        'block_hex': block_hex,
+        'rounds': structured_rounds,
+        'final_buffers': buffers.copy()
+    }
+    # У выборочной трассы предыдущий блок может отсутствовать - буферы перед блоком сохраняются явно
+    if start_buffers is not None:
+        block_trace['start_buffers'] = list(start_buffers)
+    return block_trace
+
+def process_blocks(data, buffers):
+    started = md5_metrics.start_timer()
+    for i in range(0, len(data), 64):
+        compress_block(data[i:i + 64], buffers)
+    if started is not None and data:
+        md5_metrics.count_blocks('fast', len(data) // 64)
+        md5_metrics.observe_call('process_blocks', started)
+    return buffers
+
+SELECTION_TOKEN = re.compile(r'^(\d+)(?:-(\d+))?$')
+SELECTION_FIRST = ('first', 'первый')
+SELECTION_LAST = ('last', 'последний')
+
+def parse_block_selection(spec: str, total_blocks: int):
+    """
+    Разбирает выбор блоков для трассировки.
+
+    Поддерживаются first/первый, last/последний (блок с длиной сообщения),
+    номер блока "5" и диапазон "10-20" (нумерация с 1), через запятую
+    или пробел. Номера за пределами сообщения отбрасываются.
+
+    Returns:
+        list: Отсортированные непересекающиеся диапазоны (start, stop)
+        с нумерацией с нуля или None, если выбор пуст (трассировать все блоки).
+    """
+    ranges = []
+    for token in re.split(r'[\s,;]+', spec.strip().lower()):
+        if not token:
+            continue
+        if token in SELECTION_FIRST:
+            ranges.append((0, 1))
+        elif token in SELECTION_LAST:
+            ranges.append((total_blocks - 1, total_blocks))
+        else:
+            match = SELECTION_TOKEN.match(token)
+            if not match:
+                raise ValueError(f"Неверный элемент выбора блоков: {token}")
+            start = int(match.group(1))
+            stop = int(match.group(2) or start)
+            if start < 1 or stop < start:
+                raise ValueError(f"Неверный диапазон блоков: {token}")
+            ranges.append((start - 1, stop))
+    if not ranges:
+        return None
+
+    merged = []
+    for start, stop in sorted(ranges):
+        start, stop = max(0, start), min(stop, total_blocks)
+        if start >= stop:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+def selection_contains(selection, block_index) -> bool:
+    if selection is None:
+        return True
+    position = bisect_right(selection, (block_index, float('inf'))) - 1
+    return position >= 0 and block_index < selection[position][1]
+
+def selection_size(selection, total_blocks) -> int:
+    if selection is None:
+        return total_blocks
+    return sum(stop - start for start, stop in selection)
+
+def truncate_selection(selection, max_blocks):
+    """
+    Оставляет в выборе только первые max_blocks блоков.
+
+    Returns:
+        list: Диапазоны выбора, в сумме не больше max_blocks блоков.
+    """
+    truncated = []
+    for start, stop in selection:
+        if max_blocks <= 0:
+            break
+        stop = min(stop, start + max_blocks)
+        truncated.append((start, stop))
+        max_blocks -= stop - start
+    return truncated
+
+def trace_selected_blocks(data, buffers, first_block=0, detail=DETAIL_FULL, selection=None, limit=None):
+    """
+    Сжимает блоки, строя трассу только для выбранных.
+
+    Серии невыбранных блоков сжимаются быстрым путем без записей шагов,
+    поэтому стоимость определяется быстрым хешированием и числом
+    выбранных блоков.
+
+    Args:
+        data: Данные блоков (кратны 64 байтам), начиная с блока first_block.
+        buffers: Буферы перед блоком first_block; обновляются на месте.
+        first_block: Номер первого блока в data.
+        detail: Уровень детализации трассы.
+        selection: Диапазоны выбранных блоков (None - все блоки).
+        limit: Трассировать только блоки с номером меньше limit.
+
+    Returns:
+        tuple: Структурированные данные трассированных блоков и итоговые буферы.
+    """
+    started = md5_metrics.start_timer()
+    data = memoryview(data)
+    total = first_block + len(data) // 64
+    end = total if limit is None else min(total, max(limit, first_block))
+    ranges = [(first_block, end)] if selection is None else selection
+
+    blocks_data = []
+    position = first_block
+    for start, stop in ranges:
+        start, stop = max(start, position), min(stop, end)
+        if start >= stop:
+            continue
+        process_blocks(data[(position - first_block) * 64:(start - first_block) * 64], buffers)
+        for index in range(start, stop):
+            block = data[(index - first_block) * 64:(index - first_block + 1) * 64]
+            start_buffers = buffers.copy() if selection is not None else None
+            buffers, rounds_data = md5_process_block_with_details(block, buffers, detail)
+            blocks_data.append(structure_block_trace(index, bytearray_visualize_simple(block), rounds_data,
+                                                     buffers, detail, start_buffers))
+        position = stop
+    process_blocks(data[(position - first_block) * 64:], buffers)
+    md5_metrics.observe_call('trace_selected_blocks', started)
+    return blocks_data, buffers
+
+def first_changed_block(old_data, new_data) -> int:
+    blocks = min(len(old_data), len(new_data)) // 64
+    for index in range(blocks):
+        offset = index * 64
+        if old_data[offset:offset + 64] != new_data[offset:offset + 64]:
+            return index
+    return blocks
+
+def first_changed_byte(old_data, new_data) -> int:
+    offset = first_changed_block(old_data, new_data) * 64
+    end = min(len(old_data), len(new_data))
+    while offset < end and old_data[offset] == new_data[offset]:
+        offset += 1
+    return offset
+
+def padding_for_length(length: int) -> bytes:
+    padding_length = (55 - length) % 64
+    return b'\x80' + b'\x00' * padding_length + (length * 8 & 0xFFFFFFFFFFFFFFFF).to_bytes(8, byteorder='little')
+
+class MD5Hasher:
+    # Потоковый хешер: данные подаются частями, полные блоки сжимаются сразу,
+    # в памяти остается только неполный хвост (< 64 байт)
+    def __init__(self, buffers=None, length=0):
+        self.buffers = buffers.copy() if buffers else buffer_init()
+        self.length = length
+        self.tail = b''
+
+    def update(self, data):
+        self.length += len(data)
+        if self.tail:
+            data = self.tail + bytes(data)
+        data = memoryview(data)
+        full = len(data) - len(data) % 64
+        process_blocks(data[:full], self.buffers)
+        self.tail = bytes(data[full:])
+        return self
+
+    def copy(self):
+        other = MD5Hasher(self.buffers, self.length)
+        other.tail = self.tail
+        return other
+
+    def final_buffers(self):
+        buffers = self.buffers.copy()
+        return process_blocks(self.tail + padding_for_length(self.length), buffers)
+
+    def hexdigest(self):
+        return finalize_hash(self.final_buffers())
+
+def estimate_trace_bytes(padded_length: int, detail=DETAIL_FULL) -> int:
+    return (padded_length // 64) * TRACE_BYTES_PER_BLOCK[detail]
+
+def choose_detail_level(padded_length: int, budget_bytes: int) -> str:
+    for detail in DETAIL_LEVELS:
+        if estimate_trace_bytes(padded_length, detail) <= budget_bytes:
+            return detail
+    # Даже минимальная трасса не укладывается в бюджет - оставляем только буферы
+    return DETAIL_BUFFERS
+
 def finalize_hash(buffers):
     return ''.join(buffer.to_bytes(4, byteorder='little').hex() for buffer in buffers)
 
-def visualize_padding(original: bytes, padded: bytearray) -> str:
-    original_hex = bytearray_visualize_simple(original)
+def visualize_padding(original: bytes, padded: bytearray, max_bytes=None) -> str:
+    original_hex = bytearray_visualize_preview(original, max_bytes)
     
 
     padding_start = len(original) + 1
@@ -164,7 +590,7 @@ def visualize_padding(original: bytes, padded: bytearray) -> str:
 
     padding_hex = bytearray_visualize_simple(padded[len(original):length_start])
     length_hex = bytearray_visualize_simple(padded[length_start:])
-    full_hex = bytearray_visualize_simple(padded)
+    full_hex = bytearray_visualize_preview(padded, max_bytes)
     
     separator = "-" * 50
     return (f"Полное сообщение после padding ({len(padded)} байт):\n{full_hex}\n\n"
@@ -174,3 +600,29 @@ def visualize_padding(original: bytes, padded: bytearray) -> str:
             f"Padding ({length_start - len(original)} байт):\n{padding_hex}\n\n"
             f"{separator}\n"
             f"Длина сообщения (8 байт):\n{length_hex}")
+
+def visualize_padding_stream(length, head: bytes) -> str:
+    """
+    Визуализирует padding для потокового сообщения, не держа его целиком.
+
+    Args:
+        length: Длина исходного сообщения в байтах.
+        head: Начало сообщения для предпросмотра.
+
+    Returns:
+        str: Текстовое представление padding.
+    """
+    padding = padding_for_length(length)
+    length_start = len(padding) - 8
+    head_hex = bytearray_visualize_simple(head)
+    if len(head) < length:
+        head_hex += f"-... (еще {length - len(head)} байт)"
+
+    separator = "-" * 50
+    return (f"Полное сообщение после padding ({length + len(padding)} байт)\n\n"
+            f"{separator}\n"
+            f"Начальное сообщение ({length} байт):\n{head_hex}\n\n"
+            f"{separator}\n"
+            f"Padding ({length_start} байт):\n{bytearray_visualize_simple(padding[:length_start])}\n\n"
+            f"{separator}\n"
+            f"Длина сообщения (8 байт):\n{bytearray_visualize_simple(padding[length_start:])}")
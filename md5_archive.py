@@ -0,0 +1,403 @@
+import os
+import tarfile
+import zipfile
+from md5_algorithm import MD5Hasher, padding_for_length, count_pool_blocks, DETAIL_FULL
+from md5_checkpoint import READ_SIZE
+from md5_dupes import hash_files_parallel
+from md5_pipeline import submit_task
+from md5_watch import manifest_line
+import md5_metrics
+
+# Разделитель архива и элемента в манифесте: архив.zip!каталог/файл
+MEMBER_SEPARATOR = '!'
+
+ARCHIVE_ZIP = 'zip'
+# Несжатый tar: смещения данных элементов известны, элементы читаются параллельно
+ARCHIVE_TAR = 'tar'
+# Сжатый tar (gz, bz2, xz): только последовательное чтение потока
+ARCHIVE_TAR_STREAM = 'tar-stream'
+
+# Элементов меньше - пул процессов не запускается
+MIN_PARALLEL_MEMBERS = 8
+
+def archive_kind(path):
+    """
+    Определяет вид архива по содержимому файла.
+
+    Returns:
+        str: ARCHIVE_ZIP, ARCHIVE_TAR, ARCHIVE_TAR_STREAM или None, если это не архив.
+    """
+    if not os.path.isfile(path):
+        return None
+    if zipfile.is_zipfile(path):
+        return ARCHIVE_ZIP
+    try:
+        with tarfile.open(path, 'r:'):
+            return ARCHIVE_TAR
+    except (tarfile.TarError, OSError):
+        pass
+    return ARCHIVE_TAR_STREAM if tarfile.is_tarfile(path) else None
+
+def member_path(archive, member):
+    return f"{archive}{MEMBER_SEPARATOR}{member}"
+
+def split_member_path(path, base='.'):
+    """
+    Делит путь манифеста вида архив!элемент на архив и имя элемента.
+
+    Архивом считается самый короткий префикс перед '!', который является
+    файлом, поэтому '!' допускается и в именах каталогов, и в именах элементов.
+
+    Returns:
+        tuple: Путь к архиву и имя элемента (None, если это обычный файл).
+    """
+    position = path.find(MEMBER_SEPARATOR)
+    while position > 0:
+        if os.path.isfile(os.path.join(base, path[:position])):
+            return path[:position], path[position + 1:]
+        position = path.find(MEMBER_SEPARATOR, position + 1)
+    return path, None
+
+def hash_reader(read, size=None):
+    """
+    Хеширует поток порциями READ_SIZE.
+
+    Args:
+        read: Функция чтения read(n).
+        size: Сколько байт прочитать (None - до конца потока).
+
+    Returns:
+        tuple: Hex-хеш и число сжатых блоков.
+
+    Raises:
+        EOFError: Если поток закончился раньше size байт.
+    """
+    hasher = MD5Hasher()
+    remaining = size
+    while remaining is None or remaining > 0:
+        chunk = read(READ_SIZE if remaining is None else min(READ_SIZE, remaining))
+        if not chunk:
+            if remaining:
+                raise EOFError("архив обрезан")
+            break
+        hasher.update(chunk)
+        if remaining is not None:
+            remaining -= len(chunk)
+    return hasher.hexdigest(), (hasher.length + len(padding_for_length(hasher.length))) // 64
+
+def hash_zip_members(path, indexes):
+    """
+    Хеширует элементы zip-архива по номерам в infolist (в процессе пула).
+
+    Каждый процесс открывает архив сам и читает только свои элементы;
+    при чтении zipfile проверяет CRC элемента.
+
+    Returns:
+        list: Для каждого элемента - hex-хеш или текст ошибки и число сжатых блоков.
+    """
+    results = []
+    with zipfile.ZipFile(path) as archive:
+        infos = archive.infolist()
+        for index in indexes:
+            try:
+                with archive.open(infos[index]) as member:
+                    digest, blocks = hash_reader(member.read)
+            except (zipfile.BadZipFile, OSError, EOFError, RuntimeError, NotImplementedError) as e:
+                results.append((None, str(e), 0))
+                continue
+            results.append((digest, None, blocks))
+    return results
+
+def hash_tar_ranges(path, ranges):
+    """
+    Хеширует данные элементов несжатого tar по смещениям (в процессе пула).
+
+    Args:
+        path: Путь к архиву.
+        ranges: Пары (смещение данных, размер).
+
+    Returns:
+        list: Для каждого элемента - hex-хеш или текст ошибки и число сжатых блоков.
+    """
+    results = []
+    with open(path, 'rb') as f:
+        for offset, size in ranges:
+            f.seek(offset)
+            try:
+                digest, blocks = hash_reader(f.read, size)
+            except (OSError, EOFError) as e:
+                results.append((None, str(e), 0))
+                continue
+            results.append((digest, None, blocks))
+    return results
+
+def split_tasks(sizes, workers):
+    """
+    Делит элементы на задания примерно равного объема.
+
+    Returns:
+        list: Списки номеров элементов.
+    """
+    # Несколько заданий на процесс, чтобы выровнять нагрузку при разных размерах
+    target = max(1, sum(sizes) // (workers * 4))
+    tasks, current, current_size = [], [], 0
+    for index, size in enumerate(sizes):
+        current.append(index)
+        current_size += size
+        if current_size >= target:
+            tasks.append(current)
+            current, current_size = [], 0
+    if current:
+        tasks.append(current)
+    return tasks
+
+def run_member_tasks(worker, path, items, sizes, workers, progress):
+    """
+    Хеширует элементы функцией worker(path, items) на пуле процессов или в текущем процессе.
+
+    Returns:
+        list: Результаты worker по порядку элементов.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(items) < MIN_PARALLEL_MEMBERS:
+        results = []
+        for item in items:
+            results.extend(worker(path, [item]))
+            if progress:
+                progress(len(results), len(items))
+        return results
+
+    tasks = split_tasks(sizes, workers)
+    futures = [submit_task(workers, worker, path, [items[index] for index in task]) for task in tasks]
+    results = [None] * len(items)
+    done = 0
+    for task, future in zip(tasks, futures):
+        task_results = future.result()
+        count_pool_blocks(DETAIL_FULL, sum(blocks for _, _, blocks in task_results))
+        for index, result in zip(task, task_results):
+            results[index] = result
+        done += len(task)
+        if progress:
+            progress(done, len(items))
+    return results
+
+def hash_archive(path, workers=None, names=None, progress=None):
+    """
+    Хеширует элементы архива без распаковки на диск.
+
+    Элементы читаются порциями прямо из архива, поэтому память не зависит
+    от их размера. В zip и несжатом tar элементы доступны по отдельности
+    и хешируются на пуле процессов; сжатый tar читается одним потоком.
+    Хешируются только обычные файлы (не каталоги и не ссылки).
+
+    Args:
+        path: Путь к архиву.
+        workers: Число процессов пула (1 - без пула).
+        names: Имена элементов, которые нужно хешировать (None - все).
+        progress: Функция progress(done_members, total_members); для сжатого
+            tar число элементов заранее неизвестно и total равен None.
+
+    Returns:
+        list: Тройки (имя элемента, hex-хеш или None, текст ошибки или None)
+        в порядке элементов архива.
+
+    Raises:
+        ValueError: Если файл не является архивом.
+        OSError, tarfile.TarError, zipfile.BadZipFile: Если архив не читается.
+    """
+    started = md5_metrics.start_timer()
+    kind = archive_kind(path)
+    if kind is None:
+        raise ValueError(f"{path} не является архивом zip или tar")
+
+    if kind == ARCHIVE_ZIP:
+        with zipfile.ZipFile(path) as archive:
+            members = [(index, info.filename, info.file_size) for index, info in enumerate(archive.infolist())
+                       if not info.is_dir() and (names is None or info.filename in names)]
+        results = run_member_tasks(hash_zip_members, path, [index for index, _, _ in members],
+                                   [size for _, _, size in members], workers, progress)
+    elif kind == ARCHIVE_TAR:
+        with tarfile.open(path, 'r:') as archive:
+            members = [(member, member.name, member.size) for member in archive.getmembers()
+                       if member.isreg() and (names is None or member.name in names)]
+        # Разреженные элементы по смещению не прочитать - их данные разворачивает tarfile
+        sparse = {index for index, (member, _, _) in enumerate(members) if member.issparse()}
+        dense = [index for index in range(len(members)) if index not in sparse]
+        dense_results = run_member_tasks(hash_tar_ranges, path,
+                                         [(members[index][0].offset_data, members[index][2]) for index in dense],
+                                         [members[index][2] for index in dense], workers, progress)
+        results = [None] * len(members)
+        for index, result in zip(dense, dense_results):
+            results[index] = result
+        if sparse:
+            with tarfile.open(path, 'r:') as archive:
+                for index in sparse:
+                    try:
+                        with archive.extractfile(members[index][0]) as member:
+                            digest, blocks = hash_reader(member.read)
+                        results[index] = (digest, None, blocks)
+                    except (OSError, EOFError, tarfile.TarError) as e:
+                        results[index] = (None, str(e), 0)
+    else:
+        members, results = [], []
+        with tarfile.open(path, 'r|*') as archive:
+            for member in archive:
+                if not member.isreg() or (names is not None and member.name not in names):
+                    continue
+                try:
+                    with archive.extractfile(member) as data:
+                        digest, blocks = hash_reader(data.read, member.size)
+                    results.append((digest, None, blocks))
+                except (OSError, EOFError, tarfile.TarError) as e:
+                    results.append((None, str(e), 0))
+                members.append((None, member.name, member.size))
+                if progress:
+                    progress(len(results), None)
+
+    md5_metrics.observe_call('hash_archive', started)
+    return [(name, digest, error) for (_, name, _), (digest, error, _) in zip(members, results)]
+
+def hash_paths(paths, workers=None, progress=None):
+    """
+    Хеширует файлы, а у архивов - каждый элемент.
+
+    Args:
+        paths: Пути к файлам и архивам.
+        workers: Число процессов пула.
+        progress: Функция progress(path, done, total) для элементов архивов.
+
+    Returns:
+        tuple: Записи манифеста (путь или архив!элемент, hex-хеш) и ошибки (путь, текст).
+    """
+    entries, errors = [], []
+    plain = []
+    for path in paths:
+        kind = archive_kind(path)
+        if kind is None:
+            plain.append(path)
+            continue
+        member_progress = (lambda done, total, path=path: progress(path, done, total)) if progress else None
+        try:
+            members = hash_archive(path, workers, progress=member_progress)
+        except (OSError, tarfile.TarError, zipfile.BadZipFile) as e:
+            errors.append((path, str(e)))
+            continue
+        for name, digest, error in members:
+            if digest is None:
+                errors.append((member_path(path, name), error))
+            else:
+                entries.append((member_path(path, name), digest))
+
+    digests = hash_files_parallel(plain, workers)
+    for path in plain:
+        digest, error, _ = digests[path]
+        if digest is None:
+            errors.append((path, error))
+        else:
+            entries.append((path, digest))
+    return entries, errors
+
+def write_archive_manifest(manifest_path, entries):
+    """
+    Атомарно записывает манифест в формате md5sum со строками архив!элемент.
+
+    Пути архивов и файлов записываются относительно каталога манифеста,
+    имена элементов - как в архиве; порядок записей сохраняется.
+    """
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    temp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8', newline='\n') as f:
+        for path, digest in entries:
+            archive, member = split_member_path(path)
+            relative = os.path.relpath(os.path.abspath(archive), base)
+            f.write(manifest_line(digest, relative if member is None else member_path(relative, member)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, manifest_path)
+
+def parse_manifest_line(line):
+    """
+    Разбирает строку манифеста md5sum (с экранированием имен через обратную косую черту).
+
+    Returns:
+        tuple: Hex-хеш и путь или None, если строка не является записью манифеста.
+    """
+    line = line.rstrip('\n')
+    escaped = line.startswith('\\')
+    if escaped:
+        line = line[1:]
+    digest, separator, path = line[:32], line[32:34], line[34:]
+    if separator not in ('  ', ' *') or not path or len(digest) != 32:
+        return None
+    try:
+        int(digest, 16)
+    except ValueError:
+        return None
+    if escaped:
+        path = path.replace('\\\\', '\0').replace('\\n', '\n').replace('\0', '\\')
+    return digest.lower(), path
+
+def verify_manifest(manifest_path, workers=None, progress=None):
+    """
+    Проверяет файлы и элементы архивов по манифесту без распаковки.
+
+    Записи группируются по архивам: каждый архив читается один раз,
+    и хешируются только перечисленные в манифесте элементы.
+
+    Args:
+        manifest_path: Путь к манифесту (пути в нем - относительно его каталога).
+        workers: Число процессов пула.
+        progress: Функция progress(path, done, total) для элементов архивов.
+
+    Returns:
+        dict: Результаты в порядке манифеста ('results': путь и статус 'OK',
+        'FAILED' или 'MISSING' с текстом ошибки) и число неразобранных строк ('malformed').
+    """
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    entries = []
+    malformed = 0
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            parsed = parse_manifest_line(line)
+            if parsed is None:
+                malformed += bool(line.strip())
+                continue
+            entries.append(parsed)
+
+    archives = {}
+    plain = {}
+    for _, path in entries:
+        archive, member = split_member_path(path, base)
+        if member is None:
+            plain[os.path.join(base, path)] = path
+        else:
+            archives.setdefault(archive, set()).add(member)
+
+    actual = {}
+    for archive, names in archives.items():
+        archive_path = os.path.join(base, archive)
+        member_progress = (lambda done, total, archive=archive: progress(archive, done, total)) if progress else None
+        try:
+            members = hash_archive(archive_path, workers, names, member_progress)
+        except (ValueError, OSError, tarfile.TarError, zipfile.BadZipFile) as e:
+            for name in names:
+                actual[member_path(archive, name)] = [(None, str(e))]
+            continue
+        # Элементы с повторяющимися именами сверяются с записями манифеста по порядку
+        for name, digest, error in members:
+            actual.setdefault(member_path(archive, name), []).append((digest, error))
+
+    digests = hash_files_parallel(list(plain), workers)
+    for full_path, path in plain.items():
+        digest, error, _ = digests[full_path]
+        actual[path] = [(digest, error)]
+
+    results = []
+    for expected, path in entries:
+        found = actual.get(path, [(None, "нет в архиве")])
+        digest, error = found.pop(0) if len(found) > 1 else found[0]
+        if digest is None:
+            results.append((path, 'MISSING', error))
+        else:
+            results.append((path, 'OK' if digest == expected else 'FAILED', None))
+    return {'results': results, 'malformed': malformed}
@@ -0,0 +1,308 @@
+import os
+import json
+import time
+import struct
+from md5_algorithm import MD5Hasher
+from md5_checkpoint import READ_SIZE
+import md5_metrics
+
+# Границы частей по умолчанию: минимальный, средний и максимальный размер
+DEFAULT_MIN_SIZE = 2 * 1024
+DEFAULT_AVG_SIZE = 8 * 1024
+DEFAULT_MAX_SIZE = 64 * 1024
+
+INDEX_NAME = 'chunks.idx'
+PACK_NAME = 'chunks.pack'
+RECIPES_NAME = 'recipes.jsonl'
+
+# Заголовок индекса: сигнатура, версия, хранятся ли данные частей и
+# параметры разбиения (с другими параметрами границы частей не совпадут)
+INDEX_MAGIC = b'MD5CDC'
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct('<6sBBIII')
+# Запись индекса: MD5 части, смещение в pack-файле и длина - 28 байт
+INDEX_RECORD = struct.Struct('<16sQI')
+
+HASH_MASK = 0xFFFFFFFFFFFFFFFF
+
+def gear_table():
+    """
+    Таблица Gear: 256 псевдослучайных 64-битных чисел.
+
+    Числа берутся из MD5 номера байта, поэтому таблица (а значит, и границы
+    частей) одинакова в любой версии Python и на любой платформе.
+    """
+    return [int.from_bytes(bytes.fromhex(MD5Hasher().update(bytes([value])).hexdigest())[:8], 'little')
+            for value in range(256)]
+
+GEAR = gear_table()
+
+def boundary_masks(avg_size):
+    """
+    Маски нормализованного разбиения FastCDC.
+
+    До среднего размера граница ищется по маске с двумя лишними битами
+    (реже), после - с двумя битами меньше (чаще), поэтому размеры частей
+    собираются вокруг среднего. Маски берут старшие биты хеша: в сдвиговом
+    хеше Gear они зависят от последних 64 байт, а младшие - от нескольких.
+    """
+    bits = max(1, avg_size.bit_length() - 1)
+    strict_bits, loose_bits = bits + 2, max(1, bits - 2)
+    return ((1 << strict_bits) - 1) << (64 - strict_bits), ((1 << loose_bits) - 1) << (64 - loose_bits)
+
+def cut_point(data, start, end, min_size, avg_size, max_size, masks):
+    """
+    Находит конец части, начинающейся в data[start].
+
+    Первые min_size байт части пропускаются без вычисления хеша.
+
+    Args:
+        data: Буфер.
+        start: Начало части.
+        end: Конец доступных данных.
+        min_size, avg_size, max_size: Границы размера части.
+        masks: Маски из boundary_masks.
+
+    Returns:
+        int: Позиция конца части (не включается).
+    """
+    length = min(end - start, max_size)
+    if length <= min_size:
+        return start + length
+    strict_mask, loose_mask = masks
+    gear = GEAR
+    position = start + min_size
+    barrier = start + min(avg_size, length)
+    limit = start + length
+    fingerprint = 0
+    while position < barrier:
+        fingerprint = ((fingerprint << 1) + gear[data[position]]) & HASH_MASK
+        position += 1
+        if not fingerprint & strict_mask:
+            return position
+    while position < limit:
+        fingerprint = ((fingerprint << 1) + gear[data[position]]) & HASH_MASK
+        position += 1
+        if not fingerprint & loose_mask:
+            return position
+    return limit
+
+def iter_chunks(stream, min_size=DEFAULT_MIN_SIZE, avg_size=DEFAULT_AVG_SIZE, max_size=DEFAULT_MAX_SIZE):
+    """
+    Разбивает поток байтов на части с границами по содержимому.
+
+    Граница зависит только от последних байт перед ней, поэтому вставка
+    или удаление в середине файла меняет лишь соседние части, а остальные
+    совпадают с частями прежней версии.
+
+    Args:
+        stream: Итератор порций байтов.
+        min_size, avg_size, max_size: Границы размера части.
+
+    Yields:
+        bytes: Части по порядку.
+    """
+    if not 0 < min_size <= avg_size <= max_size:
+        raise ValueError("Нужно 0 < min_size <= avg_size <= max_size")
+    masks = boundary_masks(avg_size)
+    buffer = b''
+    for data in stream:
+        buffer = buffer + data if buffer else bytes(data)
+        start = 0
+        # Часть можно отрезать, только когда за ней достаточно данных
+        while len(buffer) - start >= max_size:
+            end = cut_point(buffer, start, len(buffer), min_size, avg_size, max_size, masks)
+            yield buffer[start:end]
+            start = end
+        buffer = buffer[start:]
+    start = 0
+    while start < len(buffer):
+        end = cut_point(buffer, start, len(buffer), min_size, avg_size, max_size, masks)
+        yield buffer[start:end]
+        start = end
+
+def iter_file(path, read_size=READ_SIZE):
+    with open(path, 'rb') as f:
+        yield from iter(lambda: f.read(read_size), b'')
+
+class ChunkStore:
+    """
+    Хранилище частей с дедупликацией между файлами.
+
+    Индекс - компактный двоичный файл: заголовок с параметрами разбиения
+    и записи по 28 байт (MD5 части, смещение в pack-файле, длина).
+    Уникальные части дописываются в pack-файл, а для каждого файла в
+    recipes.jsonl сохраняется список его частей, по которому файл
+    восстанавливается. Без данных (store_data=False) хранится только
+    индекс - для оценки дедупликации.
+
+    Args:
+        directory: Каталог хранилища (создается при необходимости).
+        min_size, avg_size, max_size: Параметры разбиения нового хранилища.
+        store_data: Сохранять ли данные частей.
+
+    Raises:
+        ValueError: Если индекс поврежден или построен с другими параметрами.
+    """
+    def __init__(self, directory, min_size=DEFAULT_MIN_SIZE, avg_size=DEFAULT_AVG_SIZE, max_size=DEFAULT_MAX_SIZE,
+                 store_data=True):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.params = (min_size, avg_size, max_size)
+        self.store_data = store_data
+        self.chunks = {}
+        self.stored_bytes = 0
+        self.pending_records = []
+        self.load_index()
+        self.index_file = open(os.path.join(directory, INDEX_NAME), 'ab')
+        if not self.index_file.tell():
+            self.index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, int(store_data), *self.params))
+        self.pack_file = open(os.path.join(directory, PACK_NAME), 'ab') if store_data else None
+
+    def load_index(self):
+        path = os.path.join(self.directory, INDEX_NAME)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        if not data:
+            return
+        if len(data) < INDEX_HEADER.size:
+            raise ValueError(f"Поврежден индекс {path}")
+        magic, version, with_data, *params = INDEX_HEADER.unpack_from(data)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"{path} не является индексом частей")
+        if bool(with_data) != self.store_data:
+            raise ValueError("Хранилище создано " + ("с данными частей" if with_data else "только с индексом"))
+        if tuple(params) != self.params:
+            raise ValueError(f"Индекс построен с размерами частей {params[0]}/{params[1]}/{params[2]}")
+        # Неполная последняя запись (прерванная запись) отбрасывается
+        records_end = INDEX_HEADER.size + (len(data) - INDEX_HEADER.size) // INDEX_RECORD.size * INDEX_RECORD.size
+        for digest, offset, length in INDEX_RECORD.iter_unpack(data[INDEX_HEADER.size:records_end]):
+            self.chunks[digest] = (offset, length)
+            self.stored_bytes += length
+        if records_end != len(data):
+            with open(path, 'r+b') as f:
+                f.truncate(records_end)
+
+    def add_chunk(self, chunk):
+        """
+        Добавляет часть, если ее еще нет.
+
+        Returns:
+            tuple: MD5 части и True, если часть новая.
+        """
+        digest = bytes.fromhex(MD5Hasher().update(chunk).hexdigest())
+        if digest in self.chunks:
+            return digest, False
+        offset = 0
+        if self.pack_file is not None:
+            offset = self.pack_file.tell()
+            self.pack_file.write(chunk)
+        self.chunks[digest] = (offset, len(chunk))
+        self.stored_bytes += len(chunk)
+        self.pending_records.append(INDEX_RECORD.pack(digest, offset, len(chunk)))
+        return digest, True
+
+    def add_stream(self, name, stream):
+        """
+        Разбивает поток на части и добавляет их в хранилище.
+
+        Args:
+            name: Имя файла для рецепта.
+            stream: Итератор порций байтов.
+
+        Returns:
+            dict: Статистика: размер, число частей, новые части и байты,
+            время разбиения (вместе с чтением) и хеширования частей.
+        """
+        started = md5_metrics.start_timer()
+        stats = {'name': name, 'size': 0, 'chunks': 0, 'new_chunks': 0, 'new_bytes': 0,
+                 'chunking_seconds': 0.0, 'hashing_seconds': 0.0}
+        recipe = []
+        chunks = iter_chunks(stream, *self.params)
+        while True:
+            chunk_started = time.perf_counter()
+            chunk = next(chunks, None)
+            hash_started = time.perf_counter()
+            stats['chunking_seconds'] += hash_started - chunk_started
+            if chunk is None:
+                break
+            digest, new = self.add_chunk(chunk)
+            stats['hashing_seconds'] += time.perf_counter() - hash_started
+            recipe.append(digest.hex())
+            stats['size'] += len(chunk)
+            stats['chunks'] += 1
+            if new:
+                stats['new_chunks'] += 1
+                stats['new_bytes'] += len(chunk)
+        self.flush()
+
+        if self.store_data:
+            with open(os.path.join(self.directory, RECIPES_NAME), 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'name': name, 'size': stats['size'], 'chunks': recipe}) + "\n")
+        if md5_metrics.ENABLED:
+            md5_metrics.count_cache('cdc_chunks', stats['chunks'] - stats['new_chunks'], stats['new_chunks'])
+        md5_metrics.observe_call('cdc_add_stream', started)
+        return stats
+
+    def recipe(self, name):
+        """
+        Возвращает последний рецепт файла name или None.
+        """
+        found = None
+        try:
+            with open(os.path.join(self.directory, RECIPES_NAME), 'r', encoding='utf-8') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if entry['name'] == name:
+                        found = entry
+        except FileNotFoundError:
+            pass
+        return found
+
+    def restore(self, name, output):
+        """
+        Восстанавливает файл по рецепту, проверяя MD5 каждой части.
+
+        Args:
+            name: Имя файла в хранилище.
+            output: Открытый на запись двоичный файл.
+
+        Raises:
+            KeyError: Если файла или его части нет в хранилище.
+            ValueError: Если MD5 части в pack-файле не совпал с индексом.
+        """
+        entry = self.recipe(name)
+        if entry is None:
+            raise KeyError(name)
+        self.flush()
+        with open(os.path.join(self.directory, PACK_NAME), 'rb') as pack:
+            for digest in entry['chunks']:
+                offset, length = self.chunks[bytes.fromhex(digest)]
+                pack.seek(offset)
+                chunk = pack.read(length)
+                if MD5Hasher().update(chunk).hexdigest() != digest:
+                    raise ValueError(f"Часть {digest} файла {name} повреждена")
+                output.write(chunk)
+
+    def flush(self):
+        # Сначала данные, затем индекс: запись индекса не должна ссылаться на недописанные данные
+        if self.pack_file is not None:
+            self.pack_file.flush()
+        self.index_file.write(b''.join(self.pending_records))
+        self.pending_records.clear()
+        self.index_file.flush()
+
+    def close(self):
+        self.flush()
+        if self.pack_file is not None:
+            self.pack_file.close()
+        self.index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
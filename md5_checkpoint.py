@@ -0,0 +1,146 @@
+import os
+import json
+import time
+from md5_algorithm import MD5Hasher
+
+CHECKPOINT_VERSION = 1
+CHECKPOINT_SUFFIX = '.md5ckpt'
+
+# Размер чтения файла (кратен 64, чтобы после каждой порции не оставалось хвоста)
+READ_SIZE = 1024 * 1024
+
+# Интервал между сохранениями контрольной точки (с)
+DEFAULT_CHECKPOINT_INTERVAL = 10.0
+
+def default_checkpoint_path(path):
+    return path + CHECKPOINT_SUFFIX
+
+def file_identity(path):
+    """
+    Возвращает идентификатор файла: абсолютный путь, размер и время изменения.
+    """
+    stat = os.stat(path)
+    return {
+        'path': os.path.abspath(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns
+    }
+
+def save_checkpoint(checkpoint_path, identity, offset, buffers):
+    """
+    Атомарно сохраняет контрольную точку.
+
+    Данные пишутся во временный файл рядом с контрольной точкой, сбрасываются
+    на диск и подменяют старый файл через os.replace, поэтому при сбое
+    на диске остается либо старая, либо новая контрольная точка целиком.
+
+    Args:
+        checkpoint_path: Путь к файлу контрольной точки.
+        identity: Идентификатор хешируемого файла (file_identity).
+        offset: Число уже обработанных байт (кратно 64).
+        buffers: Буферы A, B, C, D после обработки offset байт.
+    """
+    checkpoint = dict(identity, version=CHECKPOINT_VERSION, offset=offset, buffers=list(buffers))
+    temp_path = f"{checkpoint_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, checkpoint_path)
+
+def load_checkpoint(checkpoint_path, identity):
+    """
+    Загружает контрольную точку, если она относится к тому же файлу.
+
+    Returns:
+        tuple: Смещение и буферы или None, если контрольной точки нет,
+        она повреждена или файл изменился.
+    """
+    try:
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if checkpoint.get('version') != CHECKPOINT_VERSION:
+        return None
+    if any(checkpoint.get(key) != value for key, value in identity.items()):
+        return None
+
+    offset = checkpoint.get('offset')
+    buffers = checkpoint.get('buffers')
+    if (not isinstance(offset, int) or offset % 64 or not 0 <= offset <= identity['size']
+            or not isinstance(buffers, list) or len(buffers) != 4):
+        return None
+    return offset, buffers
+
+def remove_checkpoint(checkpoint_path):
+    try:
+        os.remove(checkpoint_path)
+    except FileNotFoundError:
+        pass
+
+def hash_file(path, checkpoint_path=None, interval=DEFAULT_CHECKPOINT_INTERVAL, resume=True,
+              progress=None, should_stop=None):
+    """
+    Хеширует файл с периодическим сохранением контрольных точек.
+
+    Если для файла есть контрольная точка с тем же размером и временем
+    изменения, хеширование продолжается с сохраненных буферов и смещения.
+    Контрольная точка сохраняется каждые interval секунд, при остановке
+    и при прерывании (KeyboardInterrupt) - на последней границе порции,
+    где состояние хешера согласовано. После успешного завершения
+    контрольная точка удаляется.
+
+    Args:
+        path: Путь к файлу.
+        checkpoint_path: Путь к контрольной точке (по умолчанию рядом с файлом).
+        interval: Интервал между сохранениями (с).
+        resume: Продолжать ли с сохраненной контрольной точки.
+        progress: Функция progress(offset, size), вызываемая после каждой порции.
+        should_stop: Функция без аргументов; если возвращает True,
+            хеширование останавливается с сохранением контрольной точки.
+
+    Returns:
+        tuple: Хеш (или None, если хеширование остановлено) и смещение,
+        с которого оно было продолжено.
+    """
+    checkpoint_path = checkpoint_path or default_checkpoint_path(path)
+    identity = file_identity(path)
+
+    saved = load_checkpoint(checkpoint_path, identity) if resume else None
+    start_offset, buffers = saved if saved else (0, None)
+    hasher = MD5Hasher(buffers, start_offset)
+
+    # Последнее согласованное состояние: смещение и копия буферов.
+    # Присваивается одним кортежем, чтобы прерывание не разорвало пару
+    state = (start_offset, hasher.buffers.copy())
+    last_save = time.monotonic()
+
+    with open(path, 'rb') as f:
+        f.seek(start_offset)
+        try:
+            while True:
+                if should_stop and should_stop():
+                    save_checkpoint(checkpoint_path, identity, *state)
+                    return None, start_offset
+
+                chunk = f.read(READ_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                # Неполный хвост бывает только в конце файла; его обработает финализация
+                state = (hasher.length - len(hasher.tail), hasher.buffers.copy())
+
+                if progress:
+                    progress(hasher.length, identity['size'])
+                if time.monotonic() - last_save >= interval:
+                    save_checkpoint(checkpoint_path, identity, *state)
+                    last_save = time.monotonic()
+        except KeyboardInterrupt:
+            save_checkpoint(checkpoint_path, identity, *state)
+            raise
+
+    digest = hasher.hexdigest()
+    remove_checkpoint(checkpoint_path)
+    return digest, start_offset
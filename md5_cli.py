@@ -0,0 +1,480 @@
+import os
+import sys
+import time
+import argparse
+import md5_metrics
+from md5_checkpoint import hash_file, default_checkpoint_path, DEFAULT_CHECKPOINT_INTERVAL
+from md5_hmac import HMACMD5, hmac_md5_batch, parse_key
+from md5_dupes import find_duplicates, iter_files
+from md5_cdc import ChunkStore, iter_file, DEFAULT_MIN_SIZE, DEFAULT_AVG_SIZE, DEFAULT_MAX_SIZE
+from md5_watch import rescan, watch, manifest_line, DEFAULT_INDEX_PATH, DEFAULT_MANIFEST_PATH, DEFAULT_POLL_INTERVAL
+from md5_tree import (
+    tree_hash_file,
+    rehash_ranges,
+    verify_tree,
+    chunk_ranges,
+    save_sidecar,
+    load_sidecar,
+    default_sidecar_path,
+    DEFAULT_CHUNK_SIZE
+)
+from md5_archive import hash_paths, verify_manifest, write_archive_manifest
+from md5_reduced import (
+    run_experiment,
+    render_experiment,
+    parse_delta,
+    parse_functions,
+    DIFFERENCE_XOR,
+    DIFFERENCE_MODULAR,
+    DEFAULT_PAIRS,
+    DEFAULT_BATCH_SIZE
+)
+
+# Размер порции чтения файла для HMAC
+HMAC_READ_SIZE = 1024 * 1024
+
+def print_progress(offset, size):
+    percent = 100 * offset // size if size else 100
+    print(f"\r{offset}/{size} байт ({percent}%)", end='', file=sys.stderr, flush=True)
+
+def command_hash(args):
+    """
+    Хеширует файлы с контрольными точками; вывод совместим с md5sum.
+    """
+    if args.checkpoint and len(args.files) > 1:
+        print("--checkpoint можно указать только для одного файла", file=sys.stderr)
+        return 2
+
+    status = 0
+    for path in args.files:
+        try:
+            digest, resumed_from = hash_file(
+                path,
+                args.checkpoint,
+                interval=args.interval,
+                resume=not args.no_resume,
+                progress=print_progress if args.progress else None
+            )
+        except KeyboardInterrupt:
+            checkpoint = args.checkpoint or default_checkpoint_path(path)
+            print(f"\nПрервано, контрольная точка сохранена: {checkpoint}", file=sys.stderr)
+            return 130
+        except OSError as e:
+            print(f"{path}: {e.strerror}", file=sys.stderr)
+            status = 1
+            continue
+
+        if args.progress:
+            print(file=sys.stderr)
+        if resumed_from:
+            print(f"{path}: продолжено с {resumed_from} байт", file=sys.stderr)
+        print(f"{digest}  {path}")
+    return status
+
+def command_hmac(args):
+    """
+    Вычисляет HMAC-MD5 файлов или каждой строки входа под одним ключом.
+    
+    Блоки ключа сжимаются один раз на запуск; в режиме --lines все строки
+    обрабатываются пакетом (hmac_md5_batch).
+    """
+    try:
+        key = parse_key(args.key)
+    except ValueError:
+        print("Ключ после hex: должен состоять из пар шестнадцатеричных цифр", file=sys.stderr)
+        return 2
+
+    if args.lines:
+        status = 0
+        for path in args.files or ['-']:
+            try:
+                if path == '-':
+                    lines = sys.stdin.buffer.read().splitlines()
+                else:
+                    with open(path, 'rb') as f:
+                        lines = f.read().splitlines()
+            except OSError as e:
+                print(f"{path}: {e.strerror}", file=sys.stderr)
+                status = 1
+                continue
+            for digest in hmac_md5_batch(key, lines):
+                print(digest)
+        return status
+
+    status = 0
+    for path in args.files or ['-']:
+        mac = HMACMD5(key)
+        try:
+            if path == '-':
+                stream = sys.stdin.buffer
+                for chunk in iter(lambda: stream.read(HMAC_READ_SIZE), b''):
+                    mac.update(chunk)
+            else:
+                with open(path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(HMAC_READ_SIZE), b''):
+                        mac.update(chunk)
+        except OSError as e:
+            print(f"{path}: {e.strerror}", file=sys.stderr)
+            status = 1
+            continue
+        print(f"{mac.hexdigest()}  {path}")
+    return status
+
+def parse_byte_ranges(spec):
+    """
+    Разбирает диапазоны байтов вида "0-4096,1048576-1050000" (конец не включается).
+    """
+    ranges = []
+    for token in spec.split(','):
+        start, _, end = token.strip().partition('-')
+        start, end = int(start), int(end or start) + (0 if end else 1)
+        if start < 0 or end <= start:
+            raise ValueError(token)
+        ranges.append((start, end))
+    return ranges
+
+def format_byte_ranges(ranges):
+    return ", ".join(f"{start}-{end}" for start, end in ranges)
+
+def command_tree(args):
+    """
+    Древовидный хеш файлов (дерево Меркла над MD5 частей) на пуле процессов.
+    """
+    try:
+        ranges = parse_byte_ranges(args.update) if args.update else None
+    except ValueError:
+        print("Диапазоны задаются как НАЧАЛО-КОНЕЦ через запятую", file=sys.stderr)
+        return 2
+
+    status = 0
+    for path in args.files:
+        sidecar_path = default_sidecar_path(path)
+        progress = None
+        if args.progress:
+            progress = lambda done, total: print(f"\r{done}/{total} частей", end='', file=sys.stderr, flush=True)
+        try:
+            if args.verify or ranges is not None:
+                tree = load_sidecar(sidecar_path)
+                if tree is None:
+                    print(f"{path}: нет сохраненного дерева {sidecar_path}", file=sys.stderr)
+                    status = 1
+                    continue
+
+            if args.verify:
+                matched, mismatched = verify_tree(path, tree, args.workers, progress)
+                if args.progress:
+                    print(file=sys.stderr)
+                if matched:
+                    print(f"{path}: OK")
+                else:
+                    changed = chunk_ranges(mismatched, tree['chunk_size'], max(tree['size'], os.path.getsize(path)))
+                    print(f"{path}: ИЗМЕНЕН, байты {format_byte_ranges(changed)}")
+                    status = 1
+                continue
+
+            if ranges is not None:
+                tree, rehashed = rehash_ranges(path, tree, ranges, args.workers, progress)
+                if args.progress:
+                    print(file=sys.stderr)
+                print(f"{path}: пересчитано частей {len(rehashed)} из {len(tree['chunks'])}", file=sys.stderr)
+            else:
+                tree = tree_hash_file(path, args.chunk_size, args.workers, progress)
+                if args.progress:
+                    print(file=sys.stderr)
+            if args.sidecar or ranges is not None:
+                save_sidecar(sidecar_path, path, tree)
+        except OSError as e:
+            print(f"{path}: {e.strerror}", file=sys.stderr)
+            status = 1
+            continue
+        except ValueError as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            return 2
+        print(f"{tree['root']}  {path}")
+    return status
+
+def command_dupes(args):
+    """
+    Ищет одинаковые файлы и выводит их наборы с освобождаемым объемом.
+    """
+    progress = None
+    if args.progress:
+        stage_names = {'edges': "края файлов", 'hash': "полный хеш"}
+        progress = lambda stage, done, total: print(f"\r{stage_names[stage]}: {done}/{total}", end='',
+                                                    file=sys.stderr, flush=True)
+    result = find_duplicates(args.paths, args.min_size, args.workers, progress)
+    if args.progress:
+        print(file=sys.stderr)
+
+    for group in result['groups']:
+        print(f"{group['digest']}  {group['size']} байт x {len(group['paths'])}, "
+              f"освобождается {group['reclaimable']} байт")
+        for path in group['paths']:
+            print(f"  {path}")
+    for path, error in result['errors']:
+        print(f"{path}: {error}", file=sys.stderr)
+
+    stats = result['stats']
+    print(f"Наборов: {len(result['groups'])}, можно освободить {stats['reclaimable']} байт", file=sys.stderr)
+    print(f"Файлов: {stats['files']}, одного размера: {stats['size_candidates']}, "
+          f"прочитано целиком: {stats['edge_candidates']}; "
+          f"прочитано {stats['bytes_read']} из {stats['bytes_total']} байт", file=sys.stderr)
+    return 1 if result['errors'] else 0
+
+def print_scan_stats(stats, mode=None):
+    for path, error in stats['errors']:
+        print(f"{path}: {error}", file=sys.stderr)
+    source = f" ({mode})" if mode else ""
+    print(f"{time.strftime('%H:%M:%S')}{source} файлов: {stats['files']}, из индекса: {stats['hits']}, "
+          f"перехешировано: {stats['rehashed']} (новых {stats['added']}), удалено: {stats['removed']}, "
+          f"прочитано {stats['bytes_hashed']} байт", file=sys.stderr)
+
+def command_watch(args):
+    """
+    Пересканирует файлы по индексу хешей и обновляет манифест md5sum.
+    """
+    if args.once:
+        stats = rescan(args.paths, args.index, args.manifest, args.workers)
+        print_scan_stats(stats)
+        return 1 if stats['errors'] else 0
+    try:
+        watch(args.paths, args.index, args.manifest, args.workers, args.interval, not args.poll, print_scan_stats)
+    except KeyboardInterrupt:
+        print(file=sys.stderr)
+    return 0
+
+def megabytes_per_second(size, seconds):
+    return size / seconds / 1e6 if seconds else 0.0
+
+def command_cdc(args):
+    """
+    Разбивает файлы на части по содержимому и добавляет их в хранилище с дедупликацией.
+    """
+    try:
+        store = ChunkStore(args.store, args.min_size, args.avg_size, args.max_size, not args.index_only)
+    except (ValueError, OSError) as e:
+        print(f"{args.store}: {e}", file=sys.stderr)
+        return 2
+
+    with store:
+        if args.restore:
+            if not args.output:
+                print("Для --restore нужен --output", file=sys.stderr)
+                return 2
+            try:
+                with open(args.output, 'wb') as output:
+                    store.restore(args.restore, output)
+            except (KeyError, ValueError, OSError) as e:
+                message = "нет в хранилище" if isinstance(e, KeyError) else e
+                print(f"{args.restore}: {message}", file=sys.stderr)
+                # Недовосстановленный файл не оставляем
+                if os.path.exists(args.output):
+                    os.remove(args.output)
+                return 1
+            return 0
+
+        errors = []
+        total = {'size': 0, 'chunks': 0, 'new_chunks': 0, 'new_bytes': 0,
+                 'chunking_seconds': 0.0, 'hashing_seconds': 0.0}
+        for path, _ in iter_files(args.paths, errors):
+            try:
+                stats = store.add_stream(path, iter_file(path))
+            except OSError as e:
+                errors.append((path, e.strerror))
+                continue
+            for key in total:
+                total[key] += stats[key]
+            print(f"{path}: частей {stats['chunks']}, новых {stats['new_chunks']} "
+                  f"({stats['new_bytes']} байт)")
+        for path, error in errors:
+            print(f"{path}: {error}", file=sys.stderr)
+
+        ratio = total['size'] / total['new_bytes'] if total['new_bytes'] else float('inf') if total['size'] else 1.0
+        print(f"Прочитано {total['size']} байт в {total['chunks']} частях, новых {total['new_bytes']} байт; "
+              f"коэффициент дедупликации {ratio:.2f}", file=sys.stderr)
+        print(f"Разбиение с чтением: {megabytes_per_second(total['size'], total['chunking_seconds']):.1f} МБ/с, "
+              f"MD5 частей: {megabytes_per_second(total['size'], total['hashing_seconds']):.1f} МБ/с; "
+              f"в хранилище {len(store.chunks)} частей, {store.stored_bytes} байт", file=sys.stderr)
+    return 1 if errors else 0
+
+def command_diffexp(args):
+    """
+    Оценивает вероятности дифференциальной характеристики сокращенного MD5.
+    """
+    try:
+        functions = parse_functions(args.functions)
+        delta = parse_delta(args.delta)
+        progress = None
+        if args.progress:
+            progress = lambda done, total: print(f"\rпар: {done}/{total}", end='', file=sys.stderr, flush=True)
+        result = run_experiment(args.steps, functions, delta, args.kind, args.pairs, args.batch_size, args.seed,
+                                progress=progress)
+    except (ValueError, RuntimeError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    if args.progress:
+        print(file=sys.stderr)
+    print(render_experiment(result))
+    return 0
+
+def print_member_progress(path, done, total):
+    total_text = f"/{total}" if total is not None else ""
+    print(f"\r{path}: элементов {done}{total_text}", end='', file=sys.stderr, flush=True)
+
+def command_archive(args):
+    """
+    Хеширует элементы архивов zip и tar без распаковки или проверяет манифест архив!элемент.
+    """
+    progress = print_member_progress if args.progress else None
+    if args.check:
+        try:
+            report = verify_manifest(args.check, args.workers, progress)
+        except OSError as e:
+            print(f"{args.check}: {e.strerror}", file=sys.stderr)
+            return 2
+        if args.progress:
+            print(file=sys.stderr)
+        failed = missing = 0
+        for path, status, error in report['results']:
+            if status == 'OK':
+                print(f"{path}: OK")
+            elif status == 'FAILED':
+                failed += 1
+                print(f"{path}: FAILED")
+            else:
+                missing += 1
+                print(f"{path}: FAILED open or read")
+                print(f"{path}: {error}", file=sys.stderr)
+        if report['malformed']:
+            print(f"Строк не в формате md5sum: {report['malformed']}", file=sys.stderr)
+        if failed:
+            print(f"Не совпало хешей: {failed}", file=sys.stderr)
+        if missing:
+            print(f"Не прочитано: {missing}", file=sys.stderr)
+        return 1 if failed or missing or not report['results'] else 0
+
+    if not args.paths:
+        print("Укажите архивы или файлы, либо --check МАНИФЕСТ", file=sys.stderr)
+        return 2
+    entries, errors = hash_paths(args.paths, args.workers, progress)
+    if args.progress:
+        print(file=sys.stderr)
+    if args.output:
+        write_archive_manifest(args.output, entries)
+    else:
+        for path, digest in entries:
+            sys.stdout.write(manifest_line(digest, path))
+    for path, error in errors:
+        print(f"{path}: {error}", file=sys.stderr)
+    return 1 if errors else 0
+
+def main():
+    """
+    Точка входа командной строки.
+    """
+    parser = argparse.ArgumentParser(description="Инструменты хеширования MD5")
+    parser.add_argument('--metrics-file', help="Записать метрики в формате Prometheus в файл по завершении")
+    parser.add_argument('--metrics-port', type=int,
+                        help="Отдавать метрики по http://127.0.0.1:ПОРТ/metrics во время работы")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    hash_parser = subparsers.add_parser('hash', help="Хеширование файлов с возобновлением")
+    hash_parser.add_argument('files', nargs='+', help="Файлы для хеширования")
+    hash_parser.add_argument('--checkpoint', help="Путь к контрольной точке (по умолчанию ФАЙЛ.md5ckpt)")
+    hash_parser.add_argument('--interval', type=float, default=DEFAULT_CHECKPOINT_INTERVAL,
+                             help="Интервал сохранения контрольной точки, с")
+    hash_parser.add_argument('--no-resume', action='store_true',
+                             help="Не продолжать с сохраненной контрольной точки")
+    hash_parser.add_argument('--progress', action='store_true', help="Показывать прогресс")
+    hash_parser.set_defaults(handler=command_hash)
+
+    hmac_parser = subparsers.add_parser('hmac', help="HMAC-MD5 файлов или строк под одним ключом")
+    hmac_parser.add_argument('files', nargs='*', help="Файлы (по умолчанию или '-' - стандартный ввод)")
+    hmac_parser.add_argument('--key', required=True,
+                             help="Ключ: текст в UTF-8 или шестнадцатеричные байты с префиксом hex:")
+    hmac_parser.add_argument('--lines', action='store_true',
+                             help="Вычислить HMAC каждой строки входа (пакетно)")
+    hmac_parser.set_defaults(handler=command_hmac)
+
+    dupes_parser = subparsers.add_parser('dupes', help="Поиск одинаковых файлов")
+    dupes_parser.add_argument('paths', nargs='+', help="Файлы и каталоги (обходятся рекурсивно)")
+    dupes_parser.add_argument('--min-size', type=int, default=1, help="Минимальный размер файла в байтах")
+    dupes_parser.add_argument('--workers', type=int, help="Число процессов (по умолчанию - число ядер)")
+    dupes_parser.add_argument('--progress', action='store_true', help="Показывать прогресс")
+    dupes_parser.set_defaults(handler=command_dupes)
+
+    watch_parser = subparsers.add_parser('watch', help="Инкрементальное пересканирование с индексом хешей")
+    watch_parser.add_argument('paths', nargs='+', help="Файлы и каталоги (обходятся рекурсивно)")
+    watch_parser.add_argument('--index', default=DEFAULT_INDEX_PATH,
+                              help=f"Индекс хешей (по умолчанию {DEFAULT_INDEX_PATH})")
+    watch_parser.add_argument('--manifest', default=DEFAULT_MANIFEST_PATH,
+                              help=f"Манифест в формате md5sum (по умолчанию {DEFAULT_MANIFEST_PATH})")
+    watch_parser.add_argument('--once', action='store_true', help="Пересканировать один раз и выйти")
+    watch_parser.add_argument('--poll', action='store_true', help="Опрашивать по таймеру вместо inotify")
+    watch_parser.add_argument('--interval', type=float, default=DEFAULT_POLL_INTERVAL, help="Интервал опроса, с")
+    watch_parser.add_argument('--workers', type=int, help="Число процессов (по умолчанию - число ядер)")
+    watch_parser.set_defaults(handler=command_watch)
+
+    cdc_parser = subparsers.add_parser('cdc', help="Разбиение на части по содержимому с дедупликацией")
+    cdc_parser.add_argument('paths', nargs='*', help="Файлы и каталоги (обходятся рекурсивно)")
+    cdc_parser.add_argument('--store', required=True, help="Каталог хранилища частей")
+    cdc_parser.add_argument('--min-size', type=int, default=DEFAULT_MIN_SIZE, help="Минимальный размер части")
+    cdc_parser.add_argument('--avg-size', type=int, default=DEFAULT_AVG_SIZE, help="Средний размер части")
+    cdc_parser.add_argument('--max-size', type=int, default=DEFAULT_MAX_SIZE, help="Максимальный размер части")
+    cdc_parser.add_argument('--index-only', action='store_true',
+                            help="Хранить только индекс частей, без данных (оценка дедупликации)")
+    cdc_parser.add_argument('--restore', metavar='ИМЯ', help="Восстановить файл из хранилища")
+    cdc_parser.add_argument('--output', help="Куда записать восстановленный файл")
+    cdc_parser.set_defaults(handler=command_cdc)
+
+    diffexp_parser = subparsers.add_parser('diffexp', help="Дифференциальный эксперимент с сокращенным MD5 (NumPy)")
+    diffexp_parser.add_argument('--steps', type=int, default=64, help="Число шагов (1-64)")
+    diffexp_parser.add_argument('--functions', default='FGHI',
+                                help="Функции четырех раундов, например FGHI или FFHI")
+    diffexp_parser.add_argument('--delta', required=True,
+                                help="Разность слов сообщения, например 4:0x80000000,11:0x8000")
+    diffexp_parser.add_argument('--kind', choices=[DIFFERENCE_XOR, DIFFERENCE_MODULAR], default=DIFFERENCE_XOR,
+                                help="Вид разности: xor или mod (по модулю 2^32)")
+    diffexp_parser.add_argument('--pairs', type=int, default=DEFAULT_PAIRS, help="Число пар сообщений")
+    diffexp_parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Пар в одном пакете")
+    diffexp_parser.add_argument('--seed', type=int, default=0, help="Зерно генератора сообщений")
+    diffexp_parser.add_argument('--progress', action='store_true', help="Показывать прогресс")
+    diffexp_parser.set_defaults(handler=command_diffexp)
+
+    archive_parser = subparsers.add_parser('archive', help="Хеширование элементов zip и tar без распаковки")
+    archive_parser.add_argument('paths', nargs='*', help="Архивы (и обычные файлы)")
+    archive_parser.add_argument('--output', '-o', help="Записать манифест архив!элемент в файл")
+    archive_parser.add_argument('--check', metavar='МАНИФЕСТ', help="Проверить архивы и файлы по манифесту")
+    archive_parser.add_argument('--workers', type=int, help="Число процессов (по умолчанию - число ядер)")
+    archive_parser.add_argument('--progress', action='store_true', help="Показывать прогресс")
+    archive_parser.set_defaults(handler=command_archive)
+
+    tree_parser = subparsers.add_parser('tree', help="Параллельный древовидный хеш (дерево Меркла над частями)")
+    tree_parser.add_argument('files', nargs='+', help="Файлы для хеширования")
+    tree_parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                             help="Размер части в байтах (кратен 64)")
+    tree_parser.add_argument('--workers', type=int, help="Число процессов (по умолчанию - число ядер)")
+    tree_parser.add_argument('--sidecar', action='store_true',
+                             help="Сохранить хеши частей в ФАЙЛ.md5tree")
+    tree_parser.add_argument('--verify', action='store_true',
+                             help="Проверить файл по ФАЙЛ.md5tree и показать измененные диапазоны")
+    tree_parser.add_argument('--update', metavar='ДИАПАЗОНЫ',
+                             help="Пересчитать только измененные байты (например 0-4096,65536-70000) "
+                                  "по ФАЙЛ.md5tree и обновить его")
+    tree_parser.add_argument('--progress', action='store_true', help="Показывать прогресс")
+    tree_parser.set_defaults(handler=command_tree)
+
+    args = parser.parse_args()
+    if args.metrics_file:
+        md5_metrics.enable()
+    if args.metrics_port is not None:
+        md5_metrics.serve_metrics(args.metrics_port)
+    try:
+        status = args.handler(args)
+    finally:
+        if args.metrics_file:
+            md5_metrics.write_metrics(args.metrics_file)
+    sys.exit(status)
+
+if __name__ == "__main__":
+    main()
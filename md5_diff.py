@@ -0,0 +1,177 @@
+from md5_algorithm import (
+    add_padding,
+    buffer_init,
+    md5_process_block,
+    md5_block_states,
+    finalize_hash,
+    K_INDEX
+)
+
+REGISTER_NAMES = ['A', 'B', 'C', 'D']
+
+def hamming_weight(value: int) -> int:
+    return bin(value).count('1')
+
+def first_divergent_word(states_a, states_b) -> int:
+    """
+    Находит индекс первого различающегося слова в упакованных массивах.
+
+    Сравнение идет целыми 16-байтовыми строками (все четыре регистра шага),
+    поэтому совпадающие шаги пропускаются без распаковки слов.
+
+    Args:
+        states_a: Массив состояний регистров первого входа.
+        states_b: Массив состояний регистров второго входа.
+
+    Returns:
+        int: Индекс первого различающегося слова или -1, если массивы равны.
+    """
+    raw_a = states_a.tobytes()
+    raw_b = states_b.tobytes()
+    if raw_a == raw_b:
+        return -1
+
+    row = 4 * states_a.itemsize
+    for offset in range(0, len(raw_a), row):
+        if raw_a[offset:offset + row] != raw_b[offset:offset + row]:
+            base = offset // states_a.itemsize
+            for word_index in range(base, base + 4):
+                if states_a[word_index] != states_b[word_index]:
+                    return word_index
+    return -1
+
+def find_trace_divergence(data_a: bytes, data_b: bytes):
+    """
+    Ищет первое расхождение трасс MD5 для двух входов.
+
+    Пока блоки двух сообщений совпадают, совпадают и буферы, поэтому такие
+    блоки сжимаются один раз быстрым путем без трассировки. Для первого
+    отличающегося блока строятся упакованные массивы регистров по шагам
+    и сравниваются между собой.
+
+    Args:
+        data_a: Первое сообщение.
+        data_b: Второе сообщение.
+
+    Returns:
+        dict: Описание расхождения или None, если сообщения совпадают.
+    """
+    if data_a == data_b:
+        return None
+
+    padded_a = add_padding(data_a)
+    padded_b = add_padding(data_b)
+    buffers = buffer_init()
+
+    total_blocks = max(len(padded_a), len(padded_b)) // 64
+    for block_index in range(total_blocks):
+        offset = block_index * 64
+        block_a = padded_a[offset:offset + 64]
+        block_b = padded_b[offset:offset + 64]
+        if block_a == block_b:
+            md5_process_block(block_a, buffers)
+            continue
+
+        start_buffers = buffers.copy()
+        if not block_a or not block_b:
+            # Одно из сообщений короче - расходится само число блоков
+            states_a = md5_block_states(block_a, start_buffers) if block_a else None
+            states_b = md5_block_states(block_b, start_buffers) if block_b else None
+            word_index = 0
+            break
+
+        states_a = md5_block_states(block_a, start_buffers)
+        states_b = md5_block_states(block_b, start_buffers)
+        word_index = first_divergent_word(states_a, states_b)
+        if word_index >= 0:
+            break
+
+        # Внутренняя коллизия: разные блоки дали одинаковые регистры
+        md5_process_block(block_a, buffers)
+    else:
+        return None
+
+    step = word_index // 4
+
+    return {
+        'block': block_index,
+        'round': step // 16,
+        'step': step,
+        'start_buffers': start_buffers,
+        'block_a': bytes(block_a),
+        'block_b': bytes(block_b),
+        'states_a': states_a,
+        'states_b': states_b,
+        'blocks_a': len(padded_a) // 64,
+        'blocks_b': len(padded_b) // 64,
+        'hash_a': _finish_hash(padded_a, block_index, start_buffers),
+        'hash_b': _finish_hash(padded_b, block_index, start_buffers)
+    }
+
+def _finish_hash(padded, block_index, buffers):
+    buffers = buffers.copy()
+    for offset in range(block_index * 64, len(padded), 64):
+        md5_process_block(padded[offset:offset + 64], buffers)
+    return finalize_hash(buffers)
+
+def _message_word(block, k):
+    return int.from_bytes(block[k * 4:k * 4 + 4], byteorder='little')
+
+def render_trace_divergence(divergence) -> str:
+    """
+    Формирует текстовый отчет только для области расхождения.
+
+    Шаги до первого расхождения не выводятся; для каждого последующего шага
+    блока показываются значения регистров обоих входов, их XOR и вес Хэмминга.
+
+    Args:
+        divergence: Результат find_trace_divergence.
+
+    Returns:
+        str: Текстовое представление расхождения.
+    """
+    if divergence is None:
+        return "Входы совпадают - трассы идентичны."
+
+    result = []
+    block_number = divergence['block'] + 1
+    result.append(f"Блоков: {divergence['blocks_a']} / {divergence['blocks_b']}")
+    result.append(f"Итоговый хеш 1: {divergence['hash_a']}")
+    result.append(f"Итоговый хеш 2: {divergence['hash_b']}")
+    result.append("")
+
+    start = divergence['start_buffers']
+    result.append(f"Совпадающих блоков в начале: {divergence['block']}")
+    result.append(f"Буферы перед блоком {block_number}: "
+                  f"A = {start[0]:#010x}, B = {start[1]:#010x}, "
+                  f"C = {start[2]:#010x}, D = {start[3]:#010x}")
+
+    states_a = divergence['states_a']
+    states_b = divergence['states_b']
+    if states_a is None or states_b is None:
+        shorter = 1 if states_a is None else 2
+        result.append(f"Сообщение {shorter} заканчивается раньше: блока {block_number} в нем нет.")
+        return "\n".join(result)
+
+    block_a = divergence['block_a']
+    block_b = divergence['block_b']
+    different_words = [k for k in range(16) if _message_word(block_a, k) != _message_word(block_b, k)]
+    result.append("Отличающиеся слова сообщения: " +
+                  ", ".join(f"M[{k}]" for k in different_words))
+
+    step = divergence['step']
+    result.append(f"\nПервое расхождение: блок {block_number}, раунд {divergence['round'] + 1}, "
+                  f"шаг {step % 16 + 1} (шаг {step + 1} из 64)\n")
+
+    for step_index in range(step, 64):
+        k = K_INDEX[step_index]
+        result.append(f"Раунд {step_index // 16 + 1}, шаг {step_index % 16 + 1} (M[{k}]):")
+        for register in range(4):
+            value_a = states_a[step_index * 4 + register]
+            value_b = states_b[step_index * 4 + register]
+            diff = value_a ^ value_b
+            result.append(f"  {REGISTER_NAMES[register]}: {value_a:#010x} | {value_b:#010x} | "
+                          f"XOR {diff:#010x} | HW {hamming_weight(diff):2d}")
+        result.append("")
+
+    return "\n".join(result)
@@ -0,0 +1,210 @@
+import os
+import stat
+from md5_algorithm import MD5Hasher, buffer_init, compress_block, count_pool_blocks, padding_for_length, DETAIL_FULL
+from md5_checkpoint import READ_SIZE
+from md5_pipeline import submit_task
+import md5_metrics
+
+# Файлы, которые нужно прочитать целиком, отдаются пулу пачками
+FILES_PER_TASK = 8
+
+def iter_files(paths, errors):
+    """
+    Перечисляет обычные файлы в путях (каталоги обходятся рекурсивно).
+
+    Символические ссылки пропускаются, чтобы не посчитать один файл дважды
+    и не выйти за пределы сканируемого дерева.
+
+    Args:
+        paths: Файлы и каталоги.
+        errors: Список, в который добавляются пары (путь, ошибка).
+
+    Yields:
+        tuple: Путь и os.stat_result файла.
+    """
+    for path in paths:
+        if os.path.isdir(path) and not os.path.islink(path):
+            for root, dirs, files in os.walk(path, onerror=lambda e: errors.append((e.filename, e.strerror))):
+                dirs.sort()
+                for name in sorted(files):
+                    yield from stat_regular(os.path.join(root, name), errors)
+        else:
+            yield from stat_regular(path, errors)
+
+def stat_regular(path, errors):
+    try:
+        info = os.lstat(path)
+    except OSError as e:
+        errors.append((path, e.strerror))
+        return
+    if stat.S_ISREG(info.st_mode):
+        yield path, info
+
+def edge_key(path, size):
+    """
+    Сжимает первый и последний 64-байтовые блоки файла.
+
+    Одинаковые по размеру файлы с разными краями заведомо различны, и их
+    не нужно читать целиком. Короткий блок дополняется нулями: у файлов
+    одного размера дополнение одинаково.
+
+    Returns:
+        tuple: Буферы после первого и после последнего блока.
+    """
+    with open(path, 'rb') as f:
+        first = f.read(64)
+        if size > 64:
+            f.seek(max(64, size - 64))
+            last = f.read(64)
+        else:
+            last = b''
+    first_buffers = compress_block(first.ljust(64, b'\x00'), buffer_init())
+    last_buffers = compress_block(last.ljust(64, b'\x00'), buffer_init()) if last else []
+    return tuple(first_buffers), tuple(last_buffers)
+
+def hash_files(paths):
+    """
+    Хеширует файлы целиком (в процессе пула).
+
+    Returns:
+        list: Для каждого файла - hex-хеш или текст ошибки и число сжатых блоков.
+    """
+    results = []
+    for path in paths:
+        hasher = MD5Hasher()
+        try:
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(READ_SIZE), b''):
+                    hasher.update(chunk)
+        except OSError as e:
+            results.append((None, e.strerror, 0))
+            continue
+        blocks = (hasher.length + len(padding_for_length(hasher.length))) // 64
+        results.append((hasher.hexdigest(), None, blocks))
+    return results
+
+def hash_files_parallel(paths, workers=None, progress=None):
+    """
+    Хеширует файлы целиком на пуле процессов.
+
+    Args:
+        paths: Пути к файлам.
+        workers: Число процессов (1 - без пула).
+        progress: Функция progress(done_files, total_files).
+
+    Returns:
+        dict: Для каждого пути - hex-хеш (или None), текст ошибки и число сжатых блоков.
+    """
+    digests = {}
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(paths) <= FILES_PER_TASK:
+        for path in paths:
+            digests[path] = hash_files([path])[0]
+            if progress:
+                progress(len(digests), len(paths))
+        return digests
+
+    tasks = [paths[i:i + FILES_PER_TASK] for i in range(0, len(paths), FILES_PER_TASK)]
+    futures = [submit_task(workers, hash_files, task) for task in tasks]
+    for task, future in zip(tasks, futures):
+        results = future.result()
+        count_pool_blocks(DETAIL_FULL, sum(blocks for _, _, blocks in results))
+        digests.update(zip(task, results))
+        if progress:
+            progress(len(digests), len(paths))
+    return digests
+
+def find_duplicates(paths, min_size=1, workers=None, progress=None):
+    """
+    Находит наборы одинаковых файлов.
+
+    Поиск идет в три этапа, каждый из которых отсеивает файлы дешевле
+    следующего:
+    1. Группировка по размеру (только stat, без чтения).
+    2. Сжатие первого и последнего блоков у файлов из групп одного размера.
+    3. Полный MD5 оставшихся кандидатов на пуле процессов.
+    Жесткие ссылки на один и тот же файл учитываются один раз.
+
+    Args:
+        paths: Файлы и каталоги.
+        min_size: Минимальный размер файла (пустые файлы по умолчанию пропускаются).
+        workers: Число процессов пула (1 - без пула).
+        progress: Функция progress(stage, done, total), stage - 'edges' или 'hash'.
+
+    Returns:
+        dict: Наборы дубликатов ('groups': размер, хеш, пути, освобождаемые
+        байты), статистика этапов ('stats') и ошибки чтения ('errors').
+    """
+    started = md5_metrics.start_timer()
+    errors = []
+    stats = {
+        'files': 0,
+        'size_candidates': 0,
+        'edge_candidates': 0,
+        'bytes_total': 0,
+        'bytes_read': 0
+    }
+
+    # Этап 1: размер; повторные жесткие ссылки отбрасываются
+    by_size = {}
+    seen_inodes = set()
+    for path, info in iter_files(paths, errors):
+        if info.st_size < min_size:
+            continue
+        inode = (info.st_dev, info.st_ino)
+        if inode in seen_inodes:
+            continue
+        seen_inodes.add(inode)
+        stats['files'] += 1
+        stats['bytes_total'] += info.st_size
+        by_size.setdefault(info.st_size, []).append(path)
+    size_groups = [(size, group) for size, group in by_size.items() if len(group) > 1]
+
+    # Этап 2: края файлов
+    stats['size_candidates'] = sum(len(group) for _, group in size_groups)
+    candidates = []
+    done = 0
+    for size, group in size_groups:
+        by_edges = {}
+        for path in group:
+            try:
+                by_edges.setdefault(edge_key(path, size), []).append(path)
+            except OSError as e:
+                errors.append((path, e.strerror))
+            stats['bytes_read'] += min(size, 128)
+            done += 1
+            if progress:
+                progress('edges', done, stats['size_candidates'])
+        if md5_metrics.ENABLED:
+            md5_metrics.count_blocks('fast', sum(2 if size > 64 else 1 for _ in group))
+        candidates.extend((size, edge_group) for edge_group in by_edges.values() if len(edge_group) > 1)
+
+    # Этап 3: полный хеш оставшихся кандидатов
+    stats['edge_candidates'] = sum(len(group) for _, group in candidates)
+    hash_progress = (lambda done, total: progress('hash', done, total)) if progress else None
+    digests = hash_files_parallel([path for _, group in candidates for path in group], workers, hash_progress)
+
+    groups = []
+    for size, group in candidates:
+        by_digest = {}
+        for path in group:
+            digest, error, _ = digests[path]
+            if digest is None:
+                errors.append((path, error))
+                continue
+            stats['bytes_read'] += size
+            by_digest.setdefault(digest, []).append(path)
+        for digest, same in by_digest.items():
+            if len(same) > 1:
+                groups.append({
+                    'size': size,
+                    'digest': digest,
+                    'paths': same,
+                    'reclaimable': size * (len(same) - 1)
+                })
+
+    # Сначала наборы, удаление которых освобождает больше всего места
+    groups.sort(key=lambda group: (-group['reclaimable'], group['paths'][0]))
+    stats['reclaimable'] = sum(group['reclaimable'] for group in groups)
+    md5_metrics.observe_call('find_duplicates', started)
+    return {'groups': groups, 'stats': stats, 'errors': errors}
@@ -0,0 +1,246 @@
+from collections import OrderedDict
+from md5_algorithm import (
+    buffer_init,
+    process_blocks,
+    padding_for_length,
+    finalize_hash,
+    md5_process_block_with_details,
+    structure_block_trace,
+    bytearray_visualize_simple,
+    MD5Hasher,
+    DETAIL_FULL
+)
+from md5_stream import hash_stream
+import md5_metrics
+
+# Размер блока MD5, под который дополняется ключ HMAC
+HMAC_BLOCK_SIZE = 64
+
+IPAD = 0x36
+OPAD = 0x5C
+
+# Сколько ключей держит кэш промежуточных состояний
+MIDSTATE_CACHE_KEYS = 32
+
+# Внешнее сообщение - блок ключа и 16 байт внутреннего хеша, поэтому его
+# хвост всегда укладывается в один блок с одинаковым padding
+OUTER_PADDING = padding_for_length(HMAC_BLOCK_SIZE + 16)
+
+def digest_bytes(buffers) -> bytes:
+    return bytes.fromhex(finalize_hash(buffers))
+
+def parse_key(text: str) -> bytes:
+    """
+    Разбирает ключ из строки: с префиксом "hex:" - шестнадцатеричные байты, иначе текст в UTF-8.
+
+    Raises:
+        ValueError: Если после "hex:" стоят не шестнадцатеричные цифры.
+    """
+    if text.startswith('hex:'):
+        return bytes.fromhex(text[4:])
+    return text.encode('utf-8')
+
+def prepare_key(key: bytes) -> bytes:
+    """
+    Приводит ключ к размеру блока: длинный ключ заменяется его MD5, короткий дополняется нулями.
+    """
+    if len(key) > HMAC_BLOCK_SIZE:
+        key = digest_bytes(MD5Hasher().update(key).final_buffers())
+    return key.ljust(HMAC_BLOCK_SIZE, b'\x00')
+
+def xor_key(key_block: bytes, pad: int) -> bytes:
+    return bytes(byte ^ pad for byte in key_block)
+
+def key_midstates(key: bytes):
+    """
+    Сжимает блоки K0 ⊕ ipad и K0 ⊕ opad.
+
+    Returns:
+        tuple: Буферы после внутреннего и после внешнего блока ключа.
+    """
+    key_block = prepare_key(key)
+    inner = process_blocks(xor_key(key_block, IPAD), buffer_init())
+    outer = process_blocks(xor_key(key_block, OPAD), buffer_init())
+    return inner, outer
+
+class MidstateCache:
+    """
+    Кэш промежуточных состояний HMAC по ключам.
+
+    Блоки ключа сжимаются один раз на ключ; при превышении max_keys
+    вытесняется давно не использованный ключ.
+
+    Args:
+        max_keys: Максимальное число ключей в кэше.
+    """
+    def __init__(self, max_keys=MIDSTATE_CACHE_KEYS):
+        self.max_keys = max_keys
+        self.midstates = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: bytes):
+        """
+        Возвращает промежуточные состояния ключа, вычисляя их при первом обращении.
+
+        Returns:
+            tuple: Внутреннее и внешнее промежуточные состояния (не изменять).
+        """
+        key = bytes(key)
+        midstates = self.midstates.get(key)
+        hit = midstates is not None
+        if hit:
+            self.midstates.move_to_end(key)
+            self.hits += 1
+        else:
+            midstates = self.midstates[key] = key_midstates(key)
+            self.misses += 1
+            if len(self.midstates) > self.max_keys:
+                self.midstates.popitem(last=False)
+        if md5_metrics.ENABLED:
+            md5_metrics.count_cache('hmac_midstates', int(hit), int(not hit))
+        return midstates
+
+    def __contains__(self, key):
+        return bytes(key) in self.midstates
+
+    def clear(self):
+        self.midstates.clear()
+
+DEFAULT_CACHE = MidstateCache()
+
+def outer_digest(outer, inner_buffers) -> bytes:
+    """
+    Завершает HMAC: сжимает один внешний блок с внутренним хешем.
+    """
+    return digest_bytes(process_blocks(digest_bytes(inner_buffers) + OUTER_PADDING, list(outer)))
+
+class HMACMD5:
+    """
+    Потоковый HMAC-MD5 (аналог hmac.new(key, digestmod='md5')).
+
+    Внутренний хеш продолжается с кэшированного промежуточного состояния,
+    поэтому сообщение стоит своих блоков и одного внешнего блока.
+
+    Args:
+        key: Ключ.
+        message: Начальная часть сообщения.
+        cache: Кэш промежуточных состояний.
+    """
+    def __init__(self, key: bytes, message: bytes = b'', cache=DEFAULT_CACHE):
+        inner, self.outer = cache.get(key)
+        self.inner = MD5Hasher(inner, HMAC_BLOCK_SIZE)
+        if message:
+            self.update(message)
+
+    def update(self, data):
+        self.inner.update(data)
+        return self
+
+    def copy(self):
+        other = HMACMD5.__new__(HMACMD5)
+        other.outer = self.outer
+        other.inner = self.inner.copy()
+        return other
+
+    def digest(self) -> bytes:
+        return outer_digest(self.outer, self.inner.final_buffers())
+
+    def hexdigest(self) -> str:
+        return self.digest().hex()
+
+def hmac_md5(key: bytes, message: bytes, cache=DEFAULT_CACHE) -> str:
+    return HMACMD5(key, message, cache).hexdigest()
+
+def hmac_md5_batch(key: bytes, messages, cache=DEFAULT_CACHE):
+    """
+    Вычисляет HMAC-MD5 множества сообщений под одним ключом.
+
+    Промежуточные состояния берутся из кэша один раз на весь пакет,
+    а каждое сообщение сжимается целиком за один вызов вместе с padding.
+
+    Args:
+        key: Ключ.
+        messages: Итерируемый набор сообщений (bytes).
+        cache: Кэш промежуточных состояний.
+
+    Returns:
+        list: Шестнадцатеричные HMAC в порядке сообщений.
+    """
+    inner, outer = cache.get(key)
+    started = md5_metrics.start_timer()
+    results = []
+    for message in messages:
+        buffers = process_blocks(bytes(message) + padding_for_length(HMAC_BLOCK_SIZE + len(message)), list(inner))
+        results.append(outer_digest(outer, buffers).hex())
+    md5_metrics.observe_call('hmac_md5_batch', started)
+    return results
+
+def trace_key_block(block: bytes, block_index: int, detail, label):
+    """
+    Трассирует блок ключа (сжимается с начальных буферов).
+    """
+    start_buffers = buffer_init()
+    buffers, rounds_data = md5_process_block_with_details(block, buffer_init(), detail)
+    block_trace = structure_block_trace(block_index, bytearray_visualize_simple(block), rounds_data, buffers,
+                                        detail, start_buffers)
+    block_trace['label'] = label
+    return block_trace
+
+def trace_hmac(key: bytes, chunks, detail=DETAIL_FULL, max_traced_blocks=None, selection=None,
+               cache=DEFAULT_CACHE, progress=None):
+    """
+    Вычисляет HMAC-MD5 с трассой внутреннего и внешнего хеша.
+
+    Трасса состоит из блока K0 ⊕ ipad, блоков сообщения внутреннего хеша
+    (номера 1, 2, ... - сообщение идет после блока ключа), блока
+    K0 ⊕ opad и внешнего блока с внутренним хешем. Блоки сообщения
+    трассируются по тем же правилам, что и в hash_stream; промежуточные
+    состояния берутся из кэша, как при обычном вычислении.
+
+    Args:
+        key: Ключ.
+        chunks: Итератор порций байтов сообщения.
+        detail: Уровень детализации трассы.
+        max_traced_blocks: Граница номеров трассируемых блоков внутреннего хеша.
+        selection: Диапазоны выбранных блоков внутреннего хеша.
+        cache: Кэш промежуточных состояний.
+        progress: Функция progress(processed_bytes).
+
+    Returns:
+        dict: Ключ K0, блоки ключа, промежуточные состояния, трасса блоков,
+        длина сообщения, внутренний хеш и HMAC.
+    """
+    key_block = prepare_key(key)
+    cached = key in cache
+    inner, outer = cache.get(key)
+
+    blocks = [trace_key_block(xor_key(key_block, IPAD), 0, detail, "Внутренний хеш, блок 1: K0 ⊕ ipad")]
+    inner_buffers, length, message_blocks = hash_stream(chunks, detail, max_traced_blocks, blocks.append,
+                                                        progress, selection, inner, HMAC_BLOCK_SIZE)
+    for block_trace in blocks[1:]:
+        block_trace['label'] = f"Внутренний хеш, блок {block_trace['block_index'] + 1}"
+
+    # Внешний хеш нумеруется после блоков внутреннего
+    outer_index = message_blocks + 1
+    blocks.append(trace_key_block(xor_key(key_block, OPAD), outer_index, detail, "Внешний хеш, блок 1: K0 ⊕ opad"))
+    outer_block = digest_bytes(inner_buffers) + OUTER_PADDING
+    buffers, rounds_data = md5_process_block_with_details(outer_block, list(outer), detail)
+    block_trace = structure_block_trace(outer_index + 1, bytearray_visualize_simple(outer_block), rounds_data,
+                                        buffers, detail, outer)
+    block_trace['label'] = "Внешний хеш, блок 2: внутренний хеш и padding"
+    blocks.append(block_trace)
+
+    return {
+        'key_length': len(key),
+        'key_block': key_block,
+        'key_hashed': len(key) > HMAC_BLOCK_SIZE,
+        'cached': cached,
+        'inner_midstate': list(inner),
+        'outer_midstate': list(outer),
+        'blocks': blocks,
+        'length': length,
+        'total_blocks': message_blocks + 3,
+        'inner_digest': finalize_hash(inner_buffers),
+        'digest': digest_bytes(buffers).hex()
+    }
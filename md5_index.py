@@ -0,0 +1,193 @@
+import re
+from array import array
+from bisect import bisect_left
+from md5_algorithm import md5_block_states, K_INDEX
+
+STEPS_PER_BLOCK = 64
+
+ADDRESS_PATTERN = re.compile(r'^(?:блок\s*)?(\d+)[\s,:;/]+(?:раунд\s*)?(\d+)[\s,:;/]+(?:шаг\s*)?(\d+)$',
+                             re.IGNORECASE)
+VALUE_PATTERN = re.compile(r'^(?:0x)?([0-9a-f]{1,8})$', re.IGNORECASE)
+WORD_PATTERN = re.compile(r'^m\s*\[?\s*(\d{1,2})\s*\]?$', re.IGNORECASE)
+
+class TraceIndex:
+    """
+    Поисковый индекс по трассе MD5.
+
+    Заполняется по мере сжатия блоков: для каждого шага запоминается
+    новое значение регистра B, для каждого блока - слова сообщения M[k],
+    буферы после блока и, если предыдущий блок не индексирован (первый
+    блок или выборочная трассировка), буферы перед блоком. Значения
+    в A, C и D - сдвинутые копии B с предыдущих шагов или буферов перед
+    блоком, поэтому отдельно не индексируются: поиск находит шаг, на
+    котором значение появилось, а не все шаги, где оно лежит в других
+    регистрах. Значения хранятся в словаре со списками номеров шагов
+    в упакованных массивах. При выборочной трассировке индексируются
+    только трассированные блоки; их номера хранятся в порядке возрастания.
+    """
+    def __init__(self):
+        self.register_steps = {}
+        self.message_words = {}
+        self.block_count = 0
+        self.indexed_blocks = array('I')
+        # Значения, добавленные каждым индексированным блоком (для truncate)
+        self.block_values = []
+
+    def add_block(self, block_index, block, buffers):
+        """
+        Сжимает блок, добавляя его значения в индекс.
+
+        Args:
+            block_index: Номер блока.
+            block: Данные блока (64 байта).
+            buffers: Буферы перед блоком; обновляются на месте.
+
+        Returns:
+            list: Буферы после блока.
+        """
+        return self.add_states(block_index, block, md5_block_states(block, buffers), buffers)
+
+    def add_states(self, block_index, block, states, buffers):
+        """
+        Добавляет в индекс блок по уже вычисленным состояниям шагов.
+
+        Используется, когда блок сжимается при построении трассы:
+        повторно сжимать его ради индекса не нужно.
+
+        Args:
+            block_index: Номер блока.
+            block: Данные блока (64 байта).
+            states: Регистры A, B, C, D после каждого из 64 шагов (как у md5_block_states).
+            buffers: Буферы перед блоком; обновляются на месте.
+
+        Returns:
+            list: Буферы после блока.
+        """
+        base = block_index * STEPS_PER_BLOCK
+        registers = array('I')
+        if not self.indexed_blocks or self.indexed_blocks[-1] != block_index - 1:
+            # Буферы перед блоком не попали в индекс как итог предыдущего блока
+            registers.extend(buffers)
+
+        for step in range(STEPS_PER_BLOCK):
+            # Новое значение на шаге попадает в регистр B
+            registers.append(states[step * 4 + 1])
+
+        words = array('I', (int.from_bytes(block[k * 4:k * 4 + 4], byteorder='little') for k in range(16)))
+
+        A, B, C, D = states[-4:]
+        buffers[0] = (buffers[0] + A) & 0xFFFFFFFF
+        buffers[1] = (buffers[1] + B) & 0xFFFFFFFF
+        buffers[2] = (buffers[2] + C) & 0xFFFFFFFF
+        buffers[3] = (buffers[3] + D) & 0xFFFFFFFF
+        registers.extend(buffers)
+
+        # Буферы перед блоком относятся к его первому шагу, итоговые - к последнему
+        first = len(registers) - STEPS_PER_BLOCK - 4
+        for position, value in enumerate(registers):
+            step = min(max(position - first, 0), STEPS_PER_BLOCK - 1)
+            self._add(self.register_steps, value, base + step)
+        for k, word in enumerate(words):
+            self._add(self.message_words, word, block_index * 16 + k)
+
+        self.block_count = max(self.block_count, block_index + 1)
+        self.indexed_blocks.append(block_index)
+        self.block_values.append((registers, words))
+        return buffers
+
+    def _add(self, table, value, position):
+        positions = table.get(value)
+        if positions is None:
+            table[value] = array('I', [position])
+        elif positions[-1] != position:
+            positions.append(position)
+
+    def truncate(self, first_block):
+        """
+        Удаляет из индекса блоки начиная с first_block (для частичного пересчета).
+
+        Просматриваются только значения удаляемых блоков: их номера шагов
+        находятся в конце списков, так как блоки добавляются по возрастанию.
+        """
+        cut = bisect_left(self.indexed_blocks, first_block)
+        for registers, words in self.block_values[cut:]:
+            for table, values, per_block in ((self.register_steps, registers, STEPS_PER_BLOCK),
+                                             (self.message_words, words, 16)):
+                limit = first_block * per_block
+                for value in values:
+                    positions = table.get(value)
+                    if positions is None:
+                        continue
+                    while positions and positions[-1] >= limit:
+                        positions.pop()
+                    if not positions:
+                        del table[value]
+        del self.block_values[cut:]
+        self.block_count = min(self.block_count, first_block)
+        del self.indexed_blocks[cut:]
+
+    def has_block(self, block_index):
+        position = bisect_left(self.indexed_blocks, block_index)
+        return position < len(self.indexed_blocks) and self.indexed_blocks[position] == block_index
+
+    def find_value(self, value):
+        """
+        Находит шаги, на которых значение появляется в регистрах
+        или используется как слово сообщения.
+
+        Returns:
+            list: Адреса (блок, раунд, шаг) в порядке следования.
+        """
+        steps = set(self.register_steps.get(value, ()))
+        for position in self.message_words.get(value, ()):
+            block, k = divmod(position, 16)
+            steps.update(block * STEPS_PER_BLOCK + step for step in WORD_STEPS[k])
+        return [address_from_linear(step) for step in sorted(steps)]
+
+    def find_word(self, k, limit=None):
+        """
+        Возвращает шаги, использующие слово сообщения M[k].
+        """
+        addresses = []
+        for block in self.indexed_blocks:
+            for step in WORD_STEPS[k]:
+                addresses.append(address_from_linear(block * STEPS_PER_BLOCK + step))
+                if limit and len(addresses) >= limit:
+                    return addresses
+        return addresses
+
+    def search(self, query, limit=1000):
+        """
+        Выполняет поиск по строке запроса.
+
+        Поддерживаемые запросы:
+        - "0x1234abcd" или "1234abcd" - значение регистра или слова сообщения;
+        - "M[7]" - шаги, использующие слово сообщения M[7];
+        - "500 3 12" или "блок 500 раунд 3 шаг 12" - прямой адрес (нумерация с 1).
+
+        Returns:
+            list: Адреса (блок, раунд, шаг), нумерация с нуля.
+        """
+        query = query.strip()
+        match = WORD_PATTERN.match(query)
+        if match and int(match.group(1)) < 16:
+            return self.find_word(int(match.group(1)), limit)
+
+        match = ADDRESS_PATTERN.match(query)
+        if match:
+            block, round_index, step = (int(part) - 1 for part in match.groups())
+            if self.has_block(block) and 0 <= round_index < 4 and 0 <= step < 16:
+                return [(block, round_index, step)]
+            return []
+
+        match = VALUE_PATTERN.match(query)
+        if match:
+            return self.find_value(int(match.group(1), 16))[:limit]
+        return []
+
+def address_from_linear(linear):
+    block, rest = divmod(linear, STEPS_PER_BLOCK)
+    return block, rest // 16, rest % 16
+
+# Номера шагов блока, на которых используется каждое слово сообщения
+WORD_STEPS = [[step for step in range(STEPS_PER_BLOCK) if K_INDEX[step] == k] for k in range(16)]
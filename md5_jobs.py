@@ -0,0 +1,300 @@
+import itertools
+from collections import OrderedDict
+from md5_algorithm import (
+    buffer_init,
+    trace_selected_blocks,
+    padding_for_length,
+    finalize_hash,
+    count_pool_blocks,
+    TRACE_BYTES_PER_BLOCK
+)
+from md5_pipeline import submit_task
+
+# Размер сегмента, который одно задание отправляет в пул за раз
+SEGMENT_BYTES = 256 * 1024
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_CANCELLED = 'cancelled'
+JOB_FAILED = 'failed'
+
+JOB_STATUS_NAMES = {
+    JOB_QUEUED: "в очереди",
+    JOB_RUNNING: "выполняется",
+    JOB_DONE: "готово",
+    JOB_CANCELLED: "отменено",
+    JOB_FAILED: "ошибка"
+}
+
+def process_segment(data, buffers, first_block, detail, traced_blocks, selection=None):
+    """
+    Сжимает сегмент блоков (в процессе пула).
+
+    Трассируются выбранные блоки с номером меньше traced_blocks,
+    остальные сжимаются быстрым путем.
+
+    Args:
+        data: Данные сегмента (кратны 64 байтам).
+        buffers: Буферы перед первым блоком сегмента.
+        first_block: Номер первого блока сегмента.
+        detail: Уровень детализации трассы.
+        traced_blocks: Граница номеров трассируемых блоков (None - без ограничения).
+        selection: Диапазоны выбранных блоков (None - все блоки).
+
+    Returns:
+        tuple: Буферы после сегмента и структурированные данные трассированных блоков.
+    """
+    blocks_data, buffers = trace_selected_blocks(data, list(buffers), first_block, detail,
+                                                 selection, traced_blocks)
+    return buffers, blocks_data
+
+class HashJob:
+    """
+    Задание хеширования одного входа.
+
+    Вход читается из источника EncodedTextSource по мере отправки сегментов,
+    поэтому в памяти находится только сегмент, отправленный в пул.
+    Сегменты одного задания обрабатываются последовательно (каждый
+    продолжает буферы предыдущего), а разные задания - параллельно.
+
+    Args:
+        job_id: Номер задания.
+        name: Название для интерфейса.
+        source: Источник текста EncodedTextSource.
+        length: Длина закодированного входа в байтах.
+        detail: Уровень детализации трассы.
+        traced_blocks: Граница номеров трассируемых блоков (None - без ограничения).
+        selection: Диапазоны выбранных для трассы блоков (None - все блоки).
+    """
+    def __init__(self, job_id, name, source, length, detail, traced_blocks, selection=None):
+        self.id = job_id
+        self.name = name
+        self.source = source
+        self.length = length
+        self.detail = detail
+        self.traced_blocks = traced_blocks
+        self.selection = selection
+        self.total_blocks = (length + len(padding_for_length(length))) // 64
+
+        self.status = JOB_QUEUED
+        self.error = None
+        self.buffers = buffer_init()
+        self.blocks = []
+        self.digest = None
+        self.evicted = False
+        self.truncated = False
+
+        self.chunks = None
+        self.pending = b''
+        self.read_bytes = 0
+        self.next_block = 0
+        self.last_segment = False
+        self.segment_blocks = 0
+        self.future = None
+
+    def progress(self):
+        """
+        Возвращает долю обработанных блоков (0..1).
+        """
+        return self.next_block / self.total_blocks
+
+    def is_active(self):
+        return self.status in (JOB_QUEUED, JOB_RUNNING)
+
+    def trace_bytes(self):
+        """
+        Оценивает объем памяти, занимаемый трассой задания.
+        """
+        return len(self.blocks or ()) * TRACE_BYTES_PER_BLOCK[self.detail]
+
+    def next_segment(self):
+        """
+        Читает из источника следующий сегмент; последний сегмент дополняется padding.
+        """
+        if self.chunks is None:
+            self.chunks = self.source.iter_bytes()
+        while len(self.pending) < SEGMENT_BYTES:
+            data = next(self.chunks, None)
+            if data is None:
+                self.last_segment = True
+                segment = self.pending + padding_for_length(self.read_bytes)
+                self.pending = b''
+                return segment
+            self.read_bytes += len(data)
+            self.pending += data
+        segment = self.pending[:SEGMENT_BYTES]
+        self.pending = self.pending[SEGMENT_BYTES:]
+        return segment
+
+class TraceStore:
+    """
+    Хранилище трасс завершенных заданий с ограничением по памяти.
+
+    Трассы учитываются по оценке размера; при превышении лимита трассы
+    давно не просматривавшихся заданий вытесняются (хеш при этом сохраняется).
+
+    Args:
+        budget_bytes: Лимит памяти на все трассы.
+    """
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.jobs = OrderedDict()
+
+    def used_bytes(self):
+        return sum(job.trace_bytes() for job in self.jobs.values())
+
+    def add(self, job):
+        self.jobs[job.id] = job
+        self.evict()
+
+    def touch(self, job):
+        """
+        Отмечает трассу задания как недавно использованную.
+        """
+        if job.id in self.jobs:
+            self.jobs.move_to_end(job.id)
+
+    def set_budget(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.evict()
+
+    def evict(self):
+        while len(self.jobs) > 1 and self.used_bytes() > self.budget_bytes:
+            _, job = self.jobs.popitem(last=False)
+            job.blocks = None
+            job.evicted = True
+        
+        # Единственная трасса больше лимита: оставляем помещающиеся блоки
+        # или, если не помещается ни один, вытесняем трассу целиком
+        if self.jobs and self.used_bytes() > self.budget_bytes:
+            job_id, job = next(iter(self.jobs.items()))
+            fit = self.budget_bytes // TRACE_BYTES_PER_BLOCK[job.detail]
+            if fit > 0:
+                del job.blocks[fit:]
+                job.truncated = True
+            else:
+                del self.jobs[job_id]
+                job.blocks = None
+                job.evicted = True
+
+    def remove(self, job):
+        self.jobs.pop(job.id, None)
+
+class JobManager:
+    """
+    Очередь заданий хеширования на общем пуле процессов.
+
+    Одновременно выполняется не больше max_running заданий, у каждого
+    в пуле не больше одного сегмента. Состояние продвигается вызовами
+    poll() (в интерфейсе - по таймеру), поэтому менеджер не создает
+    своих потоков.
+
+    Args:
+        store: Хранилище трасс TraceStore.
+        max_running: Число одновременно выполняемых заданий.
+    """
+    def __init__(self, store, max_running=2):
+        self.store = store
+        self.max_running = max_running
+        self.jobs = []
+        self.ids = itertools.count(1)
+
+    def add(self, name, source, length, detail, traced_blocks, selection=None):
+        job = HashJob(next(self.ids), name, source, length, detail, traced_blocks, selection)
+        self.jobs.append(job)
+        return job
+
+    def has_active(self):
+        return any(job.is_active() for job in self.jobs)
+
+    def cancel(self, job):
+        if not job.is_active():
+            return
+        if job.future is not None:
+            job.future.cancel()
+            job.future = None
+        job.status = JOB_CANCELLED
+        job.chunks = None
+        job.pending = b''
+        job.blocks = None
+
+    def remove(self, job):
+        self.cancel(job)
+        self.store.remove(job)
+        self.jobs.remove(job)
+
+    def trace_room(self, job):
+        """
+        Возвращает число блоков, которые задание еще может добавить в трассу.
+
+        Лимит хранилища делится с трассами других выполняемых заданий;
+        трассы завершенных заданий при необходимости вытесняются позже.
+        """
+        others = sum(other.trace_bytes() for other in self.jobs
+                     if other is not job and other.status == JOB_RUNNING)
+        room = (self.store.budget_bytes - others) // TRACE_BYTES_PER_BLOCK[job.detail]
+        return max(0, room - len(job.blocks))
+
+    def submit(self, job):
+        segment = job.next_segment()
+        job.segment_blocks = len(segment) // 64
+        job.future = submit_task(None, process_segment, segment, job.buffers,
+                                 job.next_block, job.detail, job.traced_blocks, job.selection)
+
+    def poll(self):
+        """
+        Забирает готовые сегменты, отправляет следующие и запускает задания из очереди.
+
+        Returns:
+            list: Задания, состояние которых изменилось.
+        """
+        changed = []
+        for job in self.jobs:
+            if job.status != JOB_RUNNING or not job.future.done():
+                continue
+            try:
+                buffers, blocks_data = job.future.result()
+                job.buffers = buffers
+                count_pool_blocks(job.detail, job.segment_blocks, len(blocks_data))
+                job.next_block += job.segment_blocks
+                room = self.trace_room(job)
+                if len(blocks_data) > room:
+                    # Лимит памяти исчерпан: трасса обрезается, а следующие
+                    # сегменты сжимаются без трассировки
+                    del blocks_data[room:]
+                    job.truncated = True
+                    job.traced_blocks = job.next_block
+                job.blocks.extend(blocks_data)
+                if job.last_segment:
+                    job.future = None
+                    job.digest = finalize_hash(job.buffers)
+                    job.status = JOB_DONE
+                    if job.truncated and not job.blocks:
+                        # В лимит не поместился ни один блок трассы
+                        job.blocks = None
+                        job.evicted = True
+                    else:
+                        self.store.add(job)
+                else:
+                    self.submit(job)
+            except Exception as e:
+                job.future = None
+                job.status = JOB_FAILED
+                job.error = str(e)
+            changed.append(job)
+
+        running = sum(1 for job in self.jobs if job.status == JOB_RUNNING)
+        for job in self.jobs:
+            if running >= self.max_running:
+                break
+            if job.status == JOB_QUEUED:
+                job.status = JOB_RUNNING
+                try:
+                    self.submit(job)
+                except Exception as e:
+                    job.status = JOB_FAILED
+                    job.error = str(e)
+                running += job.status == JOB_RUNNING
+                changed.append(job)
+        return changed
@@ -0,0 +1,128 @@
+import os
+import time
+import json
+import asyncio
+import hashlib
+import argparse
+from md5_service import DEFAULT_HOST, DEFAULT_PORT
+
+WRITE_SIZE = 64 * 1024
+
+async def open_connection(host, port, unix_path):
+    if unix_path:
+        return await asyncio.open_unix_connection(unix_path)
+    return await asyncio.open_connection(host, port)
+
+async def send_request(host, port, unix_path, path, body):
+    """
+    Отправляет один POST-запрос, передавая тело порциями.
+
+    Returns:
+        tuple: HTTP-код и тело ответа (для chunked-ответа - уже собранное).
+    """
+    reader, writer = await open_connection(host, port, unix_path)
+    try:
+        writer.write(f"POST {path} HTTP/1.1\r\n"
+                     f"Host: {host}\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n".encode('latin-1'))
+        view = memoryview(body)
+        for offset in range(0, len(body), WRITE_SIZE):
+            writer.write(view[offset:offset + WRITE_SIZE])
+            await writer.drain()
+
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding') == 'chunked':
+            parts = []
+            while True:
+                size = int((await reader.readline()).strip(), 16)
+                if size == 0:
+                    break
+                parts.append(await reader.readexactly(size))
+                await reader.readline()
+            return status, b''.join(parts)
+        return status, await reader.read()
+    finally:
+        writer.close()
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+async def run_load(host, port, unix_path, path, size, total, concurrency, verify):
+    """
+    Выполняет нагрузочный прогон и собирает задержки запросов.
+
+    Returns:
+        dict: Сводка с пропускной способностью и перцентилями задержки.
+    """
+    body = os.urandom(size)
+    expected = hashlib.md5(body).hexdigest()
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def client():
+        nonlocal errors
+        for _ in counter:
+            started = time.perf_counter()
+            status, response = await send_request(host, port, unix_path, path, body)
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors += 1
+            elif verify:
+                last_line = response.decode('utf-8').strip().splitlines()[-1]
+                if json.loads(last_line).get('md5') != expected:
+                    errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': total,
+        'errors': errors,
+        'body_bytes': size,
+        'concurrency': concurrency,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(total / elapsed, 2),
+        'megabytes_per_second': round(total * size / elapsed / (1024 * 1024), 3),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99': round(percentile(latencies, 0.99) * 1000, 2),
+            'max': round(max(latencies) * 1000, 2)
+        }
+    }
+
+def main():
+    """
+    Точка входа генератора нагрузки для сервиса хеширования.
+    """
+    parser = argparse.ArgumentParser(description="Генератор нагрузки для сервиса MD5")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix', help="путь Unix-сокета сервиса")
+    parser.add_argument('--endpoint', choices=['hash', 'trace'], default='hash')
+    parser.add_argument('--detail', default='buffers', help="детализация для /trace")
+    parser.add_argument('--size', type=int, default=64 * 1024, help="размер тела запроса в байтах")
+    parser.add_argument('--requests', type=int, default=100, help="общее число запросов")
+    parser.add_argument('--concurrency', type=int, default=8, help="число одновременных клиентов")
+    parser.add_argument('--no-verify', action='store_true', help="не проверять хеш в ответах")
+    args = parser.parse_args()
+
+    path = '/hash' if args.endpoint == 'hash' else f'/trace?detail={args.detail}'
+    summary = asyncio.run(run_load(args.host, args.port, args.unix, path, args.size,
+                                   args.requests, args.concurrency, not args.no_verify))
+    print(json.dumps(summary, indent=2))
+
+if __name__ == "__main__":
+    main()
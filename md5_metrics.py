@@ -0,0 +1,245 @@
+import os
+import time
+import threading
+from bisect import bisect_left
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Сбор метрик включается явно; пока он выключен, точки учета в движке
+# сводятся к проверке этого флага
+ENABLED = False
+
+# Границы корзин гистограммы длительности вызовов, с
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_METRICS_HOST = '127.0.0.1'
+
+def format_labels(labelnames, labels, extra=()):
+    pairs = list(zip(labelnames, labels)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+def format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """
+    Монотонный счетчик с метками.
+
+    Args:
+        name: Имя метрики.
+        help_text: Описание для строки HELP.
+        labelnames: Имена меток; значения передаются кортежем в том же порядке.
+    """
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.values = {}
+
+    def inc(self, labels=(), amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def reset(self):
+        self.values.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}")
+        return lines
+
+class Histogram:
+    """
+    Гистограмма с фиксированными корзинами и метками.
+
+    Наблюдение хранится в одной корзине; накопленные значения,
+    которых требует формат Prometheus, считаются при выводе.
+
+    Args:
+        name: Имя метрики.
+        help_text: Описание для строки HELP.
+        labelnames: Имена меток.
+        buckets: Верхние границы корзин по возрастанию.
+    """
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.values = {}
+
+    def observe(self, value, labels=()):
+        series = self.values.get(labels)
+        if series is None:
+            # Корзины, сумма и число наблюдений; последняя корзина - +Inf
+            series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def reset(self):
+        self.values.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                bucket_labels = format_labels(self.labelnames, labels, [('le', format_value(bound))])
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            series_labels = format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{series_labels} {format_value(total)}")
+            lines.append(f"{self.name}_count{series_labels} {count}")
+        return lines
+
+class MetricsRegistry:
+    """
+    Набор метрик процесса и их вывод в текстовом формате Prometheus.
+
+    Обновления и вывод выполняются под общей блокировкой, так как метрики
+    читает поток HTTP-сервера, а обновляют поток интерфейса и рабочие потоки.
+    """
+    def __init__(self):
+        self.metrics = []
+        self.lock = threading.Lock()
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def reset(self):
+        with self.lock:
+            for metric in self.metrics:
+                metric.reset()
+
+    def render(self):
+        with self.lock:
+            lines = []
+            for metric in self.metrics:
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+BYTES_HASHED = REGISTRY.counter(
+    'md5_bytes_hashed_total', "Байты, сжатые движком, включая дополнение.", ('engine',))
+BLOCKS_COMPRESSED = REGISTRY.counter(
+    'md5_blocks_compressed_total', "Блоки по 64 байта, сжатые движком.", ('engine',))
+TRACE_RECORDS = REGISTRY.counter(
+    'md5_trace_records_total', "Записи трассы (шаги, сводки раундов, снимки буферов).", ('kind',))
+TRACE_BYTES = REGISTRY.counter(
+    'md5_trace_bytes_allocated_total', "Оценка памяти, выделенной под трассы, в байтах.", ('kind',))
+CACHE_HITS = REGISTRY.counter(
+    'md5_cache_hits_total', "Обращения к кешу, обслуженные из кеша.", ('cache',))
+CACHE_MISSES = REGISTRY.counter(
+    'md5_cache_misses_total', "Обращения к кешу, потребовавшие пересчета.", ('cache',))
+CALL_DURATION = REGISTRY.histogram(
+    'md5_call_duration_seconds', "Длительность вызовов движка.", ('call',))
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+def count_blocks(engine, blocks):
+    """
+    Учитывает сжатые блоки и их байты для движка engine.
+    """
+    with REGISTRY.lock:
+        BLOCKS_COMPRESSED.inc((engine,), blocks)
+        BYTES_HASHED.inc((engine,), blocks * 64)
+
+def count_trace(kind, records, trace_bytes):
+    """
+    Учитывает записи трассы и оценку занятой ими памяти.
+    """
+    with REGISTRY.lock:
+        TRACE_RECORDS.inc((kind,), records)
+        TRACE_BYTES.inc((kind,), trace_bytes)
+
+def count_cache(cache, hits, misses):
+    with REGISTRY.lock:
+        if hits:
+            CACHE_HITS.inc((cache,), hits)
+        if misses:
+            CACHE_MISSES.inc((cache,), misses)
+
+def start_timer():
+    """
+    Возвращает отметку времени для observe_call (None, если сбор выключен).
+    """
+    return time.perf_counter() if ENABLED else None
+
+def observe_call(call, started):
+    """
+    Записывает длительность вызова call, начатого в момент started.
+    """
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    with REGISTRY.lock:
+        CALL_DURATION.observe(elapsed, (call,))
+
+def render_metrics():
+    return REGISTRY.render()
+
+def write_metrics(path):
+    """
+    Записывает метрики в файл для textfile-коллектора.
+
+    Файл заменяется атомарно, чтобы коллектор не прочитал его наполовину.
+    """
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(render_metrics())
+    os.replace(temp_path, path)
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Отдает метрики по пути /metrics.
+    """
+    def do_GET(self):
+        if self.path not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = render_metrics().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_metrics(port, host=DEFAULT_METRICS_HOST):
+    """
+    Включает сбор метрик и запускает HTTP-сервер метрик в фоновом потоке.
+
+    Args:
+        port: Порт (0 - выбрать свободный).
+        host: Адрес; по умолчанию только локальный.
+
+    Returns:
+        ThreadingHTTPServer: Сервер; адрес - server.server_address.
+    """
+    enable()
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name='md5-metrics', daemon=True)
+    thread.start()
+    return server
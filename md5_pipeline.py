@@ -0,0 +1,207 @@
+import os
+import multiprocessing
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from md5_algorithm import (
+    md5_process_block,
+    md5_process_block_with_details,
+    bytearray_visualize_simple,
+    structure_block_trace,
+    process_blocks_with_detailed_visualization,
+    count_pool_blocks,
+    DETAIL_FULL
+)
+
+# Минимальное число блоков в одном задании пула: меньшие задания
+# не окупают передачу данных между процессами
+MIN_BLOCKS_PER_TASK = 16
+
+_executor = None
+_executor_workers = 0
+
+def available_cpus():
+    """
+    Число ядер, доступных процессу (с учетом привязки к ядрам, если она задана).
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+def effective_workers(workers=None):
+    return workers or available_cpus()
+
+def get_executor(workers=None):
+    """
+    Возвращает общий пул процессов, создавая его при первом обращении.
+
+    Пул переиспользуется между вычислениями, чтобы не платить за запуск
+    процессов при каждом хешировании.
+
+    Args:
+        workers: Число процессов (по умолчанию - число доступных ядер).
+
+    Returns:
+        ProcessPoolExecutor: Пул процессов.
+    """
+    global _executor, _executor_workers
+    workers = effective_workers(workers)
+    if _executor is None or _executor_workers != workers:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        # spawn: пул может создаваться из процесса с потоками Qt, где fork небезопасен
+        _executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+        _executor_workers = workers
+    return _executor
+
+def reset_executor():
+    """
+    Закрывает общий пул; следующий get_executor() создаст новый.
+    """
+    global _executor, _executor_workers
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+    _executor_workers = 0
+
+def submit_task(workers, func, *args):
+    """
+    Отправляет задачу в общий пул процессов.
+
+    Если процесс пула завершился аварийно (нехватка памяти, сбой),
+    пул становится непригодным и отклоняет новые задачи - тогда он
+    пересоздается и отправка повторяется один раз.
+
+    Args:
+        workers: Число процессов (None - число доступных ядер).
+        func: Функция, выполняемая в процессе пула.
+        *args: Аргументы функции.
+
+    Returns:
+        Future: Результат задачи.
+    """
+    try:
+        return get_executor(workers).submit(func, *args)
+    except BrokenProcessPool:
+        reset_executor()
+        return get_executor(workers).submit(func, *args)
+
+def collect_block_buffers(data, buffers, start_block=0, index=None):
+    """
+    Первая фаза: быстрый последовательный проход без трассировки.
+
+    Args:
+        data: Сообщение после padding.
+        buffers: Буферы перед блоком start_block.
+        start_block: Номер первого обрабатываемого блока.
+        index: Поисковый индекс TraceIndex, заполняемый во время прохода.
+
+    Returns:
+        array: Упакованные буферы (по 4 слова) перед каждым блоком начиная
+        с start_block; последние 4 слова - итоговые буферы.
+    """
+    buffers = buffers.copy()
+    block_buffers = array('I', buffers)
+    for offset in range(start_block * 64, len(data), 64):
+        if index is not None:
+            index.add_block(offset // 64, data[offset:offset + 64], buffers)
+        else:
+            md5_process_block(data[offset:offset + 64], buffers)
+        block_buffers.extend(buffers)
+    return block_buffers
+
+def trace_block_range(chunk, buffers, first_block, detail):
+    """
+    Вторая фаза: трасса и форматирование диапазона блоков (в процессе пула).
+
+    Args:
+        chunk: Данные блоков диапазона.
+        buffers: Буферы перед первым блоком диапазона.
+        first_block: Номер первого блока диапазона.
+        detail: Уровень детализации трассы.
+
+    Returns:
+        list: Структурированные данные блоков диапазона.
+    """
+    blocks_data = []
+    for offset in range(0, len(chunk), 64):
+        block = chunk[offset:offset + 64]
+        buffers, rounds_data = md5_process_block_with_details(block, buffers, detail)
+        blocks_data.append(structure_block_trace(first_block + offset // 64,
+                                                 bytearray_visualize_simple(block),
+                                                 rounds_data, buffers, detail))
+    return blocks_data
+
+def trace_blocks_parallel(data, buffers, detail=DETAIL_FULL, start_block=0, workers=None, progress=None,
+                          index=None):
+    """
+    Строит трассу блоков в две фазы.
+
+    Сначала быстрый проход собирает буферы перед каждым блоком; после этого
+    трассы блоков независимы, и их построение и форматирование
+    распределяется по пулу процессов. Результаты собираются по порядку.
+    Если процессу доступно одно ядро (или workers=1), пул только замедлил бы
+    работу, и трасса строится одним проходом в текущем процессе.
+
+    Args:
+        data: Сообщение после padding.
+        buffers: Буферы перед блоком start_block.
+        detail: Уровень детализации трассы.
+        start_block: Номер первого обрабатываемого блока.
+        workers: Число процессов в пуле.
+        progress: Функция progress(done_blocks, total_blocks), вызываемая
+            по мере готовности диапазонов.
+        index: Поисковый индекс, заполняемый в первой фазе.
+
+    Returns:
+        tuple: Список структурированных данных блоков и итоговые буферы.
+    """
+    if effective_workers(workers) <= 1:
+        return trace_blocks_inline(data, buffers, detail, start_block, progress, index)
+
+    block_buffers = collect_block_buffers(data, buffers, start_block, index)
+    total_blocks = len(block_buffers) // 4 - 1
+    final_buffers = block_buffers[-4:].tolist()
+    if not total_blocks:
+        return [], final_buffers
+
+    get_executor(workers)
+    workers = _executor_workers
+    blocks_per_task = max(MIN_BLOCKS_PER_TASK, -(-total_blocks // (workers * 4)))
+
+    futures = []
+    for first in range(0, total_blocks, blocks_per_task):
+        count = min(blocks_per_task, total_blocks - first)
+        offset = (start_block + first) * 64
+        futures.append(submit_task(workers, trace_block_range,
+                                   bytes(data[offset:offset + count * 64]),
+                                   block_buffers[first * 4:first * 4 + 4].tolist(),
+                                   start_block + first,
+                                   detail))
+
+    blocks_data = []
+    for future in futures:
+        range_data = future.result()
+        count_pool_blocks(detail, len(range_data), len(range_data))
+        blocks_data.extend(range_data)
+        if progress:
+            progress(len(blocks_data), total_blocks)
+    return blocks_data, final_buffers
+
+def trace_blocks_inline(data, buffers, detail=DETAIL_FULL, start_block=0, progress=None, index=None):
+    """
+    Строит трассу блоков одним проходом в текущем процессе (без пула).
+
+    Аргументы и результат - как у trace_blocks_parallel.
+    """
+    total_blocks = len(data) // 64 - start_block
+    blocks_data = []
+
+    def block_callback(block_index, block_hex, rounds_data, buffers):
+        blocks_data.append(structure_block_trace(block_index, block_hex, rounds_data, buffers, detail))
+        if progress and (len(blocks_data) % MIN_BLOCKS_PER_TASK == 0 or len(blocks_data) == total_blocks):
+            progress(len(blocks_data), total_blocks)
+
+    buffers = process_blocks_with_detailed_visualization(data, buffers.copy(), block_callback, detail,
+                                                         start_block, index)
+    return blocks_data, buffers
@@ -0,0 +1,348 @@
+import math
+import time
+from md5_algorithm import F, G, H, I, T, S, K_INDEX, left_rotate, buffer_init
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAS_NUMPY = np is not None
+
+ROUND_FUNCTION_NAMES = 'FGHI'
+ROUND_FUNCTIONS = {'F': F, 'G': G, 'H': H, 'I': I}
+
+DIFFERENCE_XOR = 'xor'
+DIFFERENCE_MODULAR = 'mod'
+DIFFERENCE_NAMES = {
+    DIFFERENCE_XOR: "XOR",
+    DIFFERENCE_MODULAR: "по модулю 2^32"
+}
+
+# Пар в одном пакете NumPy: массивы пакета (16 слов и 4 регистра на пару)
+# занимают несколько мегабайт и помещаются в кэш
+DEFAULT_BATCH_SIZE = 65536
+DEFAULT_PAIRS = 1000000
+
+MASK32 = 0xFFFFFFFF
+
+def parse_functions(spec: str) -> str:
+    """
+    Проверяет функции раундов: четыре буквы из F, G, H, I (например FGHI или FFFF).
+
+    Raises:
+        ValueError: При неверной записи.
+    """
+    spec = spec.strip().upper()
+    if len(spec) != 4 or any(name not in ROUND_FUNCTIONS for name in spec):
+        raise ValueError("Функции раундов задаются четырьмя буквами из F, G, H, I, например FGHI")
+    return spec
+
+def parse_delta(spec: str):
+    """
+    Разбирает разность сообщения вида "4:0x80000000, 11:0x8000".
+
+    Returns:
+        dict: Номер слова M[k] -> разность.
+
+    Raises:
+        ValueError: При неверной записи.
+    """
+    delta = {}
+    for token in spec.split(','):
+        word, separator, value = token.strip().partition(':')
+        if not separator:
+            raise ValueError("Разность задается как НОМЕР_СЛОВА:ЗНАЧЕНИЕ, например 4:0x80000000")
+        word, value = int(word.strip().lstrip('M[').rstrip(']')), int(value.strip(), 0) & MASK32
+        if not 0 <= word < 16:
+            raise ValueError("Номер слова сообщения - от 0 до 15")
+        delta[word] = value
+    if not any(delta.values()):
+        raise ValueError("Разность не должна быть нулевой")
+    return delta
+
+def check_steps(steps):
+    if not 1 <= steps <= 64:
+        raise ValueError("Число шагов - от 1 до 64")
+
+def reduced_step_words(words, buffers, steps=64, functions=ROUND_FUNCTION_NAMES):
+    """
+    Выполняет первые steps шагов сжатия MD5 с заданными функциями раундов.
+
+    Порядок слов сообщения, сдвиги и константы - как в MD5; при 64 шагах
+    и функциях FGHI результат совпадает с обычным сжатием.
+
+    Args:
+        words: 16 слов сообщения.
+        buffers: Буферы A, B, C, D перед блоком.
+        steps: Число шагов (1-64).
+        functions: Функции четырех раундов.
+
+    Returns:
+        list: Новое слово (регистр B) после каждого шага. Состояние после
+        шага t - (w[t-3], w[t], w[t-1], w[t-2]).
+    """
+    A, B, C, D = buffers
+    new_words = []
+    for step in range(steps):
+        round_index = step // 16
+        function = ROUND_FUNCTIONS[functions[round_index]]
+        temp = (A + function(B, C, D) + words[K_INDEX[step]] + T[step]) & MASK32
+        A, D, C, B = D, C, B, (B + left_rotate(temp, S[round_index][step % 4])) & MASK32
+        new_words.append(B)
+    return new_words
+
+def reduced_compress(block: bytes, buffers, steps=64, functions=ROUND_FUNCTION_NAMES):
+    """
+    Сжатие блока сокращенным вариантом MD5 с прибавлением исходных буферов.
+    """
+    words = [int.from_bytes(block[i:i + 4], 'little') for i in range(0, 64, 4)]
+    new_words = reduced_step_words(words, buffers, steps, functions)
+    history = [buffers[0], buffers[3], buffers[2], buffers[1]] + new_words
+    state = (history[-4], history[-1], history[-2], history[-3])
+    return [(start + value) & MASK32 for start, value in zip(buffers, state)]
+
+def apply_difference(value, difference, kind):
+    if kind == DIFFERENCE_XOR:
+        return value ^ difference
+    return (value + difference) & MASK32
+
+def word_difference(value, other, kind):
+    if kind == DIFFERENCE_XOR:
+        return value ^ other
+    return (other - value) & MASK32
+
+def pair_step_differences(block: bytes, buffers, steps, functions, delta, kind=DIFFERENCE_XOR):
+    """
+    Разности по шагам для блока и его пары с разностью delta.
+
+    Args:
+        block: Блок (64 байта).
+        buffers: Буферы перед блоком.
+        steps: Число шагов варианта.
+        functions: Функции раундов.
+        delta: Разность слов сообщения (parse_delta).
+        kind: Вид разности.
+
+    Returns:
+        list: Для каждого шага - разность нового слова, вес Хэмминга XOR-разности
+        всего состояния и погашена ли разность состояния полностью (после
+        того как она появилась).
+    """
+    words = [int.from_bytes(block[i:i + 4], 'little') for i in range(0, 64, 4)]
+    other = [apply_difference(word, delta.get(k, 0), kind) for k, word in enumerate(words)]
+    words_a = reduced_step_words(words, buffers, steps, functions)
+    words_b = reduced_step_words(other, buffers, steps, functions)
+    result = []
+    entered = False
+    for step in range(steps):
+        # Состояние после шага - последние четыре новых слова (до начала - равные буферы)
+        window = range(max(0, step - 3), step + 1)
+        weight = sum(bin(words_a[t] ^ words_b[t]).count('1') for t in window)
+        entered = entered or weight > 0
+        result.append({
+            'difference': word_difference(words_a[step], words_b[step], kind),
+            'weight': weight,
+            'cancelled': entered and weight == 0
+        })
+    return result
+
+def require_numpy():
+    if np is None:
+        raise RuntimeError("Для пакетных экспериментов нужен NumPy: pip install numpy")
+
+def popcount32(values):
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    values = values - ((values >> np.uint32(1)) & np.uint32(0x55555555))
+    values = (values & np.uint32(0x33333333)) + ((values >> np.uint32(2)) & np.uint32(0x33333333))
+    values = (values + (values >> np.uint32(4))) & np.uint32(0x0F0F0F0F)
+    return (values * np.uint32(0x01010101)) >> np.uint32(24)
+
+def batch_step_words(words, buffers, steps, functions):
+    """
+    Пакетный вариант reduced_step_words: каждое слово - массив uint32 по всем входам.
+
+    Yields:
+        ndarray: Новое слово всех входов после очередного шага.
+    """
+    A, B, C, D = (np.full(len(words[0]), value, dtype=np.uint32) for value in buffers)
+    for step in range(steps):
+        round_index = step // 16
+        name = functions[round_index]
+        if name == 'F':
+            value = (B & C) | (~B & D)
+        elif name == 'G':
+            value = (B & D) | (C & ~D)
+        elif name == 'H':
+            value = B ^ C ^ D
+        else:
+            value = C ^ (B | ~D)
+        temp = A + value + words[K_INDEX[step]] + np.uint32(T[step])
+        shift = S[round_index][step % 4]
+        rotated = (temp << np.uint32(shift)) | (temp >> np.uint32(32 - shift))
+        A, D, C, B = D, C, B, B + rotated
+        yield B
+
+def batch_differences(words, delta, kind, buffers, steps, functions):
+    """
+    Разности новых слов по шагам для пакета пар.
+
+    Yields:
+        tuple: Разность нового слова (вида kind) и его XOR-разность.
+    """
+    if kind == DIFFERENCE_XOR:
+        other = [word ^ np.uint32(delta[k]) if delta.get(k) else word for k, word in enumerate(words)]
+    else:
+        other = [word + np.uint32(delta[k]) if delta.get(k) else word for k, word in enumerate(words)]
+    for new_a, new_b in zip(batch_step_words(words, buffers, steps, functions),
+                            batch_step_words(other, buffers, steps, functions)):
+        xor = new_a ^ new_b
+        yield (xor if kind == DIFFERENCE_XOR else new_b - new_a), xor
+
+def random_words(rng, count):
+    return list(rng.integers(0, 1 << 32, size=(16, count), dtype=np.uint32))
+
+def dominant_trail(words, delta, kind, buffers, steps, functions):
+    """
+    Строит наиболее вероятную дифференциальную характеристику по выборке.
+
+    На каждом шаге среди пар, которые до сих пор шли по характеристике,
+    выбирается самая частая разность нового слова.
+
+    Returns:
+        list: Разность нового слова на каждом шаге (None, если пар не осталось).
+    """
+    trail = []
+    on_trail = np.ones(len(words[0]), dtype=bool)
+    for difference, _ in batch_differences(words, delta, kind, buffers, steps, functions):
+        selected = difference[on_trail]
+        if not selected.size:
+            trail.append(None)
+            continue
+        values, counts = np.unique(selected, return_counts=True)
+        mode = values[counts.argmax()]
+        trail.append(int(mode))
+        on_trail &= difference == mode
+    return trail
+
+def run_experiment(steps=64, functions=ROUND_FUNCTION_NAMES, delta=None, kind=DIFFERENCE_XOR,
+                   pairs=DEFAULT_PAIRS, batch_size=DEFAULT_BATCH_SIZE, seed=0, buffers=None, progress=None):
+    """
+    Оценивает распространение разности в сокращенном MD5 на случайных парах.
+
+    Сначала по одному пакету строится наиболее вероятная характеристика
+    (dominant_trail), затем на pairs новых парах считаются вероятности
+    следования ей, доля пар, у которых появившаяся разность состояния
+    полностью погасилась, и средний вес Хэмминга разности состояния после каждого шага.
+    Пары обрабатываются пакетами NumPy по batch_size; статистика копится
+    по ходу, поэтому память не зависит от числа пар.
+
+    Args:
+        steps: Число шагов (1-64).
+        functions: Функции раундов, например FGHI.
+        delta: Разность слов сообщения (parse_delta).
+        kind: Вид разности: DIFFERENCE_XOR или DIFFERENCE_MODULAR.
+        pairs: Число пар.
+        batch_size: Размер пакета.
+        seed: Зерно генератора сообщений.
+        buffers: Начальные буферы (по умолчанию - стандартные).
+        progress: Функция progress(done_pairs, total_pairs).
+
+    Returns:
+        dict: Параметры, характеристика и статистика по шагам.
+    """
+    require_numpy()
+    check_steps(steps)
+    functions = parse_functions(functions)
+    if not delta or not any(delta.values()):
+        raise ValueError("Разность не должна быть нулевой")
+    if kind not in DIFFERENCE_NAMES:
+        raise ValueError(f"Неизвестный вид разности: {kind}")
+    if pairs <= 0 or batch_size <= 0:
+        raise ValueError("Число пар и размер пакета должны быть положительными")
+    buffers = buffers or buffer_init()
+    started = time.perf_counter()
+
+    rng = np.random.default_rng(seed)
+    trail = dominant_trail(random_words(rng, min(batch_size, pairs)), delta, kind, buffers, steps, functions)
+    trail_values = [np.uint32(value if value is not None else 0) for value in trail]
+
+    on_trail_counts = np.zeros(steps, dtype=np.int64)
+    cancelled_counts = np.zeros(steps, dtype=np.int64)
+    weight_sums = np.zeros(steps, dtype=np.int64)
+    done = 0
+    while done < pairs:
+        count = min(batch_size, pairs - done)
+        words = random_words(rng, count)
+        on_trail = np.ones(count, dtype=bool)
+        # Разность считается погашенной, только если она уже появлялась в состоянии
+        entered = np.zeros(count, dtype=bool)
+        # Вес и нулевая разность состояния - по последним четырем новым словам
+        recent_weights = [np.zeros(count, dtype=np.int64)] * 3
+        for step, (difference, xor) in enumerate(batch_differences(words, delta, kind, buffers, steps, functions)):
+            if trail[step] is None:
+                on_trail[:] = False
+            else:
+                on_trail &= difference == trail_values[step]
+            on_trail_counts[step] += np.count_nonzero(on_trail)
+            recent_weights = recent_weights[-3:] + [popcount32(xor).astype(np.int64)]
+            state_weight = recent_weights[0] + recent_weights[1] + recent_weights[2] + recent_weights[3]
+            weight_sums[step] += int(state_weight.sum())
+            zero = state_weight == 0
+            entered |= ~zero
+            cancelled_counts[step] += np.count_nonzero(entered & zero)
+        done += count
+        if progress:
+            progress(done, pairs)
+
+    seconds = time.perf_counter() - started
+    trail_probability = (on_trail_counts / pairs).tolist()
+    step_probability = [trail_probability[0]] + [
+        current / previous if previous else 0.0
+        for previous, current in zip(trail_probability, trail_probability[1:])
+    ]
+    return {
+        'steps': steps,
+        'functions': functions,
+        'kind': kind,
+        'delta': dict(delta),
+        'pairs': pairs,
+        'seed': seed,
+        'trail': trail,
+        'trail_probability': trail_probability,
+        'step_probability': step_probability,
+        'cancelled_probability': (cancelled_counts / pairs).tolist(),
+        'mean_weight': (weight_sums / pairs).tolist(),
+        'seconds': seconds,
+        'pairs_per_second': pairs / seconds if seconds else 0.0
+    }
+
+def format_probability(probability):
+    # Вероятность и ее двоичный логарифм, как принято для характеристик
+    if probability <= 0:
+        return "0"
+    exponent = math.log2(probability)
+    return f"{probability:.4g} (2^{exponent:.1f})"
+
+def render_experiment(result) -> str:
+    """
+    Формирует текстовый отчет эксперимента по шагам.
+    """
+    delta_text = ", ".join(f"M[{k}] {value:#010x}" for k, value in sorted(result['delta'].items()))
+    lines = [
+        f"Вариант: {result['steps']} шагов, функции раундов {result['functions']}",
+        f"Разность ({DIFFERENCE_NAMES[result['kind']]}): {delta_text}",
+        f"Пар: {result['pairs']}, время {result['seconds']:.2f} с "
+        f"({result['pairs_per_second']:.0f} пар/с)",
+        "",
+        "Шаг  M[k]  Разность слова  P(шага)            P(характеристики)  Погашена  Вес",
+    ]
+    for step in range(result['steps']):
+        trail_value = result['trail'][step]
+        trail_text = f"{trail_value:#010x}" if trail_value is not None else "-"
+        lines.append(f"{step + 1:>4}  {K_INDEX[step]:>4}  {trail_text:>14}  "
+                     f"{format_probability(result['step_probability'][step]):<18} "
+                     f"{format_probability(result['trail_probability'][step]):<18} "
+                     f"{result['cancelled_probability'][step]:>8.4f}  {result['mean_weight'][step]:5.1f}")
+    return "\n".join(lines)
@@ -0,0 +1,409 @@
+import os
+import json
+import asyncio
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+import md5_metrics
+from md5_algorithm import (
+    buffer_init,
+    process_blocks,
+    padding_for_length,
+    finalize_hash,
+    md5_process_block_with_details,
+    bytearray_visualize_simple,
+    count_pool_blocks,
+    DETAIL_LEVELS,
+    DETAIL_FULL
+)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Размер порции, отправляемой в пул процессов (кратен 64 байтам)
+HASH_CHUNK_SIZE = 256 * 1024
+TRACE_CHUNK_SIZE = 64 * 64
+
+# Размер одного чтения тела запроса из сокета
+READ_SIZE = 64 * 1024
+
+# Заголовок потокового ответа /trace
+TRACE_RESPONSE_HEADER = (b"HTTP/1.1 200 OK\r\n"
+                         b"Content-Type: application/x-ndjson\r\n"
+                         b"Transfer-Encoding: chunked\r\n"
+                         b"Connection: close\r\n\r\n")
+
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error"
+}
+
+class HttpError(Exception):
+    """
+    Ошибка обработки HTTP-запроса с кодом ответа.
+
+    Args:
+        status: HTTP-код ответа.
+        message: Текст ошибки для клиента.
+    """
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+def compress_chunk(buffers, chunk):
+    """
+    Сжимает порцию целых блоков быстрым путем (выполняется в пуле процессов).
+
+    Args:
+        buffers: Буферы перед первым блоком порции.
+        chunk: Данные, длина которых кратна 64 байтам.
+
+    Returns:
+        list: Буферы после последнего блока порции.
+    """
+    return process_blocks(chunk, buffers)
+
+def trace_chunk(buffers, chunk, first_block, detail):
+    """
+    Строит трассу для порции целых блоков (выполняется в пуле процессов).
+
+    Args:
+        buffers: Буферы перед первым блоком порции.
+        chunk: Данные, длина которых кратна 64 байтам.
+        first_block: Номер первого блока порции в сообщении.
+        detail: Уровень детализации трассы.
+
+    Returns:
+        tuple: Список записей трассы по блокам и буферы после порции.
+    """
+    records = []
+    for offset in range(0, len(chunk), 64):
+        block = chunk[offset:offset + 64]
+        buffers, rounds_data = md5_process_block_with_details(block, buffers, detail)
+        records.append({
+            'block': first_block + offset // 64,
+            'block_hex': bytearray_visualize_simple(block),
+            'rounds_data': rounds_data,
+            'buffers': buffers.copy()
+        })
+    return records, buffers
+
+async def read_headers(reader):
+    """
+    Читает строку запроса и заголовки HTTP.
+
+    Returns:
+        tuple: Метод, путь с параметрами и словарь заголовков
+        (имена в нижнем регистре), либо None, если клиент закрыл соединение.
+    """
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, target, _ = request_line.decode('latin-1').split()
+    except ValueError:
+        raise HttpError(400, "Некорректная строка запроса")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return method, target, headers
+
+async def iter_body(reader, headers):
+    """
+    Асинхронно отдает тело запроса порциями по мере поступления из сокета.
+
+    Поддерживает Content-Length, Transfer-Encoding: chunked и чтение
+    до закрытия соединения. Следующая порция не читается, пока потребитель
+    не обработал предыдущую, - так перегрузка передается клиенту через TCP.
+    """
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size_line = await reader.readline()
+            try:
+                size = int(size_line.split(b';')[0].strip(), 16)
+            except ValueError:
+                raise HttpError(400, "Некорректный размер chunk")
+            if size == 0:
+                # Пропускаем трейлеры
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return
+            while size:
+                data = await reader.read(min(size, READ_SIZE))
+                if not data:
+                    raise HttpError(400, "Тело запроса оборвалось")
+                size -= len(data)
+                yield data
+            await reader.readline()
+    elif 'content-length' in headers:
+        try:
+            remaining = int(headers['content-length'])
+        except ValueError:
+            raise HttpError(400, "Некорректный Content-Length")
+        while remaining:
+            data = await reader.read(min(remaining, READ_SIZE))
+            if not data:
+                raise HttpError(400, "Тело запроса оборвалось")
+            remaining -= len(data)
+            yield data
+    else:
+        while True:
+            data = await reader.read(READ_SIZE)
+            if not data:
+                return
+            yield data
+
+async def iter_aligned(body, chunk_size):
+    """
+    Собирает поток порций тела в куски фиксированного размера, кратного 64.
+
+    Последний кусок может быть короче и не кратен 64 байтам.
+    """
+    pending = bytearray()
+    async for data in body:
+        pending += data
+        while len(pending) >= chunk_size:
+            yield bytes(pending[:chunk_size])
+            del pending[:chunk_size]
+    yield bytes(pending)
+
+class HashingService:
+    """
+    Локальный сервис хеширования MD5 поверх asyncio.
+
+    Тела запросов читаются потоком и хешируются инкрементально; сжатие
+    блоков выполняется в пуле процессов. Число заданий в пуле ограничено
+    семафором: когда очередь заполнена, обработчики перестают читать
+    сокеты, и клиенты замедляются через обратное давление TCP.
+
+    Args:
+        workers: Число процессов в пуле.
+        queue_size: Максимальное число заданий, одновременно отправленных в пул.
+    """
+    def __init__(self, workers=None, queue_size=None):
+        self.workers = workers or os.cpu_count() or 1
+        # spawn вместо fork: форк процесса с работающим циклом asyncio
+        # и потоком управления пула может зависнуть на унаследованных блокировках
+        self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        self.slots = asyncio.Semaphore(queue_size or 2 * self.workers)
+        self.stats = {'requests': 0, 'bytes': 0, 'blocks_traced': 0, 'errors': 0}
+
+    async def warm_up(self):
+        """
+        Заранее запускает все процессы пула, чтобы первые запросы
+        не платили за старт интерпретатора.
+        """
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, buffer_init)
+                               for _ in range(self.workers)))
+
+    async def submit(self, func, *args):
+        """
+        Отправляет задание в пул процессов, ожидая свободного места в очереди.
+        """
+        async with self.slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+
+    async def handle(self, reader, writer):
+        """
+        Обрабатывает одно HTTP-соединение.
+        """
+        try:
+            request = await read_headers(reader)
+            if request is None:
+                return
+            method, target, headers = request
+            url = urlsplit(target)
+            self.stats['requests'] += 1
+
+            if url.path == '/hash':
+                self.require_post(method)
+                await self.handle_hash(reader, writer, headers)
+            elif url.path == '/trace':
+                self.require_post(method)
+                params = parse_qs(url.query)
+                detail = params.get('detail', [DETAIL_FULL])[0]
+                if detail not in DETAIL_LEVELS:
+                    raise HttpError(400, f"Неизвестный уровень детализации: {detail}")
+                await self.handle_trace(reader, writer, headers, detail)
+            elif url.path == '/stats':
+                await send_json(writer, 200, dict(self.stats, workers=self.workers))
+            elif url.path == '/metrics':
+                await send_text(writer, 200, md5_metrics.render_metrics(), md5_metrics.CONTENT_TYPE)
+            else:
+                raise HttpError(404, "Неизвестный путь")
+        except HttpError as e:
+            self.stats['errors'] += 1
+            await send_json(writer, e.status, {'error': e.message})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self.stats['errors'] += 1
+        except Exception as e:
+            self.stats['errors'] += 1
+            await send_json(writer, 500, {'error': str(e)})
+        finally:
+            writer.close()
+
+    def require_post(self, method):
+        if method != 'POST':
+            raise HttpError(405, "Ожидается метод POST")
+
+    async def handle_hash(self, reader, writer, headers):
+        """
+        Хеширует тело запроса и возвращает MD5 в формате JSON.
+
+        Пока пул сжимает одну порцию, из сокета читается следующая:
+        задание отправляется в пул, и результат ожидается только перед
+        отправкой следующей порции.
+        """
+        buffers = buffer_init()
+        length = 0
+        tail = b''
+        pending = None
+        try:
+            async for chunk in iter_aligned(iter_body(reader, headers), HASH_CHUNK_SIZE):
+                if pending is not None:
+                    buffers = await pending
+                    pending = None
+                length += len(chunk)
+                full = len(chunk) - len(chunk) % 64
+                if full:
+                    pending = asyncio.ensure_future(self.submit(compress_chunk, buffers, chunk[:full]))
+                    count_pool_blocks(DETAIL_FULL, full // 64)
+                tail = chunk[full:]
+            if pending is not None:
+                buffers = await pending
+                pending = None
+        finally:
+            # Тело оборвалось, пока порция сжималась: результат уже не нужен
+            if pending is not None:
+                pending.cancel()
+
+        buffers = process_blocks(tail + padding_for_length(length), buffers)
+        self.stats['bytes'] += length
+        await send_json(writer, 200, {'md5': finalize_hash(buffers), 'bytes': length})
+
+    async def handle_trace(self, reader, writer, headers, detail):
+        """
+        Хеширует тело запроса и потоком возвращает трассу в формате JSON Lines.
+
+        Каждая строка ответа - запись об одном блоке; последняя строка
+        содержит итоговый хеш. Ответ передается с Transfer-Encoding: chunked,
+        и чтение тела приостанавливается, пока клиент не примет уже
+        отправленные записи.
+
+        Заголовок ответа отправляется вместе с первыми записями, после
+        чтения первой порции тела: ошибка до этого момента возвращается
+        обычным ответом с кодом ошибки. Если тело оборвалось позже,
+        поток завершается записью {"error": ...}.
+        """
+        buffers = buffer_init()
+        length = 0
+        block_index = 0
+        started = False
+        try:
+            async for chunk in iter_aligned(iter_body(reader, headers), TRACE_CHUNK_SIZE):
+                length += len(chunk)
+                if len(chunk) < TRACE_CHUNK_SIZE:
+                    # Последний кусок: добавляем padding, чтобы трасса включала блоки с длиной
+                    chunk += padding_for_length(length)
+                records, buffers = await self.submit(trace_chunk, buffers, chunk, block_index, detail)
+                count_pool_blocks(detail, len(records), len(records))
+                block_index += len(records)
+                if not started:
+                    writer.write(TRACE_RESPONSE_HEADER)
+                    started = True
+                await write_chunk(writer, "".join(json.dumps(record, ensure_ascii=False) + "\n"
+                                                  for record in records))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            raise
+        except Exception as e:
+            if not started:
+                raise
+            # Строка статуса уже отправлена - сообщаем об ошибке внутри потока
+            self.stats['errors'] += 1
+            message = e.message if isinstance(e, HttpError) else str(e)
+            await write_chunk(writer, json.dumps({'error': message}, ensure_ascii=False) + "\n")
+        else:
+            self.stats['bytes'] += length
+            self.stats['blocks_traced'] += block_index
+            await write_chunk(writer, json.dumps({'md5': finalize_hash(buffers), 'bytes': length,
+                                                  'blocks': block_index}) + "\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+async def write_chunk(writer, text):
+    data = text.encode('utf-8')
+    writer.write(f"{len(data):x}\r\n".encode('latin-1') + data + b"\r\n")
+    await writer.drain()
+
+async def send_json(writer, status, payload):
+    await send_text(writer, status, json.dumps(payload, ensure_ascii=False), 'application/json')
+
+async def send_text(writer, status, text, content_type):
+    body = text.encode('utf-8')
+    writer.write(f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                 f"Content-Type: {content_type}\r\n"
+                 f"Content-Length: {len(body)}\r\n"
+                 f"Connection: close\r\n\r\n".encode('latin-1') + body)
+    await writer.drain()
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, workers=None, queue_size=None):
+    """
+    Запускает сервис хеширования и обслуживает запросы до остановки.
+
+    Args:
+        host: Адрес для TCP-сокета (только локальный).
+        port: Порт для TCP-сокета.
+        unix_path: Путь Unix-сокета; если задан, TCP не используется.
+        workers: Число процессов в пуле.
+        queue_size: Ограничение очереди заданий пула.
+    """
+    # Метрики отдаются по пути /metrics, поэтому в сервисе их сбор включен всегда
+    md5_metrics.enable()
+    service = HashingService(workers, queue_size)
+    await service.warm_up()
+    if unix_path:
+        server = await asyncio.start_unix_server(service.handle, path=unix_path)
+        print(f"Сервис MD5 слушает unix:{unix_path}")
+    else:
+        server = await asyncio.start_server(service.handle, host, port)
+        print(f"Сервис MD5 слушает http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+def main():
+    """
+    Точка входа командной строки сервиса хеширования.
+    """
+    parser = argparse.ArgumentParser(description="Локальный сервис хеширования MD5")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="адрес для прослушивания")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="порт для прослушивания")
+    parser.add_argument('--unix', help="путь Unix-сокета вместо TCP")
+    parser.add_argument('--workers', type=int, help="число процессов в пуле")
+    parser.add_argument('--queue-size', type=int, help="максимум заданий в очереди пула")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix, args.workers, args.queue_size))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import codecs
+from md5_algorithm import (
+    buffer_init,
+    trace_selected_blocks,
+    padding_for_length,
+    DETAIL_FULL
+)
+
+# Сколько символов кодируется за один раз
+TEXT_CHUNK_CHARS = 64 * 1024
+
+def iter_file_text(path, chunk_chars=TEXT_CHUNK_CHARS):
+    """
+    Читает текстовый файл UTF-8 порциями символов.
+
+    Переводы строк не преобразуются, поэтому закодированный поток
+    совпадает с байтами файла.
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        while True:
+            chunk = f.read(chunk_chars)
+            if not chunk:
+                return
+            yield chunk
+
+def iter_string_chunks(text, chunk_chars=TEXT_CHUNK_CHARS):
+    """
+    Разбивает строку на порции символов (для источников из готовой строки).
+    """
+    for start in range(0, len(text), chunk_chars):
+        yield text[start:start + chunk_chars]
+
+def iter_encoded(text_chunks):
+    """
+    Кодирует поток строк в UTF-8 инкрементально, порция за порцией.
+
+    Порции - строки Python из целых кодовых точек, поэтому границы
+    порций не разрывают символы; в памяти одновременно находится только
+    одна порция текста и ее кодировка.
+    """
+    encoder = codecs.getincrementalencoder('utf-8')()
+    for chunk in text_chunks:
+        data = encoder.encode(chunk)
+        if data:
+            yield data
+    tail = encoder.encode('', final=True)
+    if tail:
+        yield tail
+
+class EncodedTextSource:
+    """
+    Источник текста, который можно закодировать в UTF-8 потоком несколько раз.
+
+    Хранит не сами данные, а функцию, возвращающую новый итератор
+    порций текста (из файла или документа редактора), поэтому ни строка
+    целиком, ни закодированные байты целиком в памяти не держатся.
+
+    Args:
+        open_chunks: Функция без аргументов, возвращающая итератор строк.
+        name: Описание источника для интерфейса.
+    """
+    def __init__(self, open_chunks, name=""):
+        self.open_chunks = open_chunks
+        self.name = name
+        self._length = None
+        # Позиция постраничного чтения: итератор потока, текущая порция и ее смещение
+        self._cursor = None
+        self._cursor_data = b''
+        self._cursor_offset = 0
+
+    def iter_bytes(self):
+        return iter_encoded(self.open_chunks())
+
+    def length(self):
+        """
+        Возвращает длину закодированного потока (считается один раз проходом по порциям).
+        """
+        if self._length is None:
+            self._length = sum(len(data) for data in self.iter_bytes())
+        return self._length
+
+    def read_page(self, offset, size):
+        """
+        Возвращает байты закодированного потока в диапазоне [offset, offset + size).
+
+        Чтение продолжается с места предыдущего вызова, поэтому при
+        листании вперед поток кодируется один раз; заново с начала он
+        кодируется, только если страница начинается до текущей порции.
+        """
+        if self._cursor is None or offset < self._cursor_offset:
+            self._cursor = self.iter_bytes()
+            self._cursor_data = b''
+            self._cursor_offset = 0
+        page = bytearray()
+        while True:
+            start = self._cursor_offset
+            end = start + len(self._cursor_data)
+            if end > offset:
+                page += self._cursor_data[max(0, offset - start):offset + size - start]
+                if len(page) >= size:
+                    break
+            data = next(self._cursor, None)
+            if data is None:
+                break
+            self._cursor_data = data
+            self._cursor_offset = end
+        return bytes(page)
+
+    def read_char_page(self, offset, size):
+        """
+        Возвращает страницу потока, выровненную по границам символов UTF-8.
+
+        Продолжение символа в начале страницы относится к предыдущей
+        странице, а символ, начатый в конце страницы, дочитывается целиком.
+        """
+        data = self.read_page(offset, size + 3)
+        start = 0
+        if offset:
+            while start < min(3, len(data)) and (data[start] & 0xC0) == 0x80:
+                start += 1
+        end = min(size, len(data))
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end += 1
+        return data[start:end]
+
+def hash_stream(chunks, detail=DETAIL_FULL, max_traced_blocks=None, callback=None, progress=None,
+                selection=None, buffers=None, prefix_length=0):
+    """
+    Хеширует поток байтов, строя трассу для выбранных блоков.
+
+    Полные блоки сжимаются по мере поступления; в памяти держится только
+    неполный хвост. Трассируются блоки из selection (по умолчанию все)
+    с номером меньше max_traced_blocks, остальные сжимаются быстрым путем.
+
+    Хеширование можно продолжить с промежуточного состояния: buffers -
+    буферы после уже сжатого префикса длиной prefix_length (кратна 64),
+    номера блоков и длина в padding считаются вместе с префиксом.
+
+    Args:
+        chunks: Итератор порций байтов.
+        detail: Уровень детализации трассы.
+        max_traced_blocks: Граница номеров трассируемых блоков (None - без ограничения).
+        callback: Функция callback(block_trace), получающая структурированную трассу блока.
+        progress: Функция progress(processed_bytes), вызываемая после каждой порции.
+        selection: Диапазоны выбранных блоков (parse_block_selection).
+        buffers: Буферы после префикса (по умолчанию - начальные).
+        prefix_length: Длина уже сжатого префикса в байтах.
+
+    Returns:
+        tuple: Итоговые буферы, длина сообщения и общее число блоков
+        (длина и число блоков - без префикса).
+    """
+    buffers = list(buffers) if buffers else buffer_init()
+    first_block = prefix_length // 64
+    block_index = first_block
+    length = 0
+    tail = b''
+
+    def process(data):
+        nonlocal buffers, block_index
+        blocks_data, buffers = trace_selected_blocks(data, buffers, block_index, detail,
+                                                     selection, max_traced_blocks)
+        if callback:
+            for block_trace in blocks_data:
+                callback(block_trace)
+        block_index += len(data) // 64
+
+    for data in chunks:
+        length += len(data)
+        data = tail + data
+        full = len(data) - len(data) % 64
+        process(data[:full])
+        tail = data[full:]
+        if progress:
+            progress(length)
+
+    process(tail + padding_for_length(prefix_length + length))
+    return buffers, length, block_index - first_block
@@ -0,0 +1,272 @@
+import os
+import json
+import mmap
+from md5_algorithm import MD5Hasher, padding_for_length, count_pool_blocks, DETAIL_FULL
+from md5_checkpoint import file_identity
+from md5_pipeline import submit_task
+import md5_metrics
+
+TREE_VERSION = 1
+TREE_SUFFIX = '.md5tree'
+
+# Размер части файла - листа дерева (кратен 64)
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# Префиксы листьев и внутренних узлов (как в RFC 6962): без них
+# хеш узла нельзя выдать за хеш листа из 32 байт
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+def default_sidecar_path(path):
+    return path + TREE_SUFFIX
+
+def chunk_count(size, chunk_size):
+    # У пустого файла один пустой лист, чтобы корень был определен
+    return max(1, -(-size // chunk_size))
+
+def leaf_digest(chunk) -> bytes:
+    return bytes.fromhex(MD5Hasher().update(LEAF_PREFIX + bytes(chunk)).hexdigest())
+
+def leaf_blocks(length) -> int:
+    # Число сжатых блоков листа длиной length с префиксом и padding
+    return (length + 1 + len(padding_for_length(length + 1))) // 64
+
+def node_digest(left: bytes, right: bytes) -> bytes:
+    return bytes.fromhex(MD5Hasher().update(NODE_PREFIX + left + right).hexdigest())
+
+def merkle_root(leaves) -> bytes:
+    """
+    Сворачивает хеши листьев в корень дерева.
+
+    Узлы уровня объединяются попарно; непарный последний узел переходит
+    на следующий уровень без изменений, поэтому дерево совпадает с деревом
+    RFC 6962 для любого числа листьев.
+
+    Args:
+        leaves: Хеши листьев (bytes) по порядку.
+
+    Returns:
+        bytes: Корневой хеш.
+    """
+    level = list(leaves)
+    while len(level) > 1:
+        paired = [node_digest(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            paired.append(level[-1])
+        level = paired
+    return level[0]
+
+def hash_chunks(path, chunks, chunk_size):
+    """
+    Хеширует части файла (в процессе пула).
+
+    Файл отображается в память, и каждый процесс читает только свои части,
+    поэтому данные не передаются между процессами.
+
+    Args:
+        path: Путь к файлу.
+        chunks: Номера частей.
+        chunk_size: Размер части.
+
+    Returns:
+        tuple: Хеши частей и число сжатых блоков.
+    """
+    digests = []
+    blocks = 0
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return [leaf_digest(b'') for _ in chunks], leaf_blocks(0) * len(chunks)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for index in chunks:
+                chunk = data[index * chunk_size:(index + 1) * chunk_size]
+                digests.append(leaf_digest(chunk))
+                blocks += leaf_blocks(len(chunk))
+    return digests, blocks
+
+def hash_chunks_parallel(path, chunks, chunk_size, workers=None, progress=None):
+    """
+    Хеширует части файла на пуле процессов.
+
+    Args:
+        path: Путь к файлу.
+        chunks: Номера частей по возрастанию.
+        chunk_size: Размер части.
+        workers: Число процессов (1 - без пула).
+        progress: Функция progress(done_chunks, total_chunks).
+
+    Returns:
+        dict: Хеши частей по номерам.
+    """
+    chunks = list(chunks)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(chunks) == 1:
+        # Запуск процессов не окупается - хешируем в текущем процессе
+        digests = {}
+        for index in chunks:
+            digests[index] = hash_chunks(path, [index], chunk_size)[0][0]
+            if progress:
+                progress(len(digests), len(chunks))
+        return digests
+
+    # Несколько заданий на процесс, чтобы выровнять нагрузку и чаще сообщать прогресс
+    per_task = max(1, -(-len(chunks) // (workers * 4)))
+    tasks = [chunks[i:i + per_task] for i in range(0, len(chunks), per_task)]
+    futures = [submit_task(workers, hash_chunks, path, task, chunk_size) for task in tasks]
+
+    digests = {}
+    for task, future in zip(tasks, futures):
+        task_digests, blocks = future.result()
+        count_pool_blocks(DETAIL_FULL, blocks)
+        digests.update(zip(task, task_digests))
+        if progress:
+            progress(len(digests), len(chunks))
+    return digests
+
+def tree_hash_file(path, chunk_size=DEFAULT_CHUNK_SIZE, workers=None, progress=None):
+    """
+    Вычисляет древовидный хеш файла: MD5 частей, объединенные деревом Меркла.
+
+    В отличие от обычного MD5, части не зависят друг от друга и хешируются
+    параллельно, поэтому скорость растет с числом ядер. Корень не совпадает
+    с MD5 файла.
+
+    Args:
+        path: Путь к файлу.
+        chunk_size: Размер части (кратен 64).
+        workers: Число процессов пула.
+        progress: Функция progress(done_chunks, total_chunks).
+
+    Returns:
+        dict: Размер файла, размер части, хеши частей (bytes) и корень (hex).
+    """
+    if chunk_size <= 0 or chunk_size % 64:
+        raise ValueError("Размер части должен быть положительным и кратным 64")
+    started = md5_metrics.start_timer()
+    size = os.path.getsize(path)
+    total = chunk_count(size, chunk_size)
+    digests = hash_chunks_parallel(path, range(total), chunk_size, workers, progress)
+    chunks = [digests[index] for index in range(total)]
+    md5_metrics.observe_call('tree_hash_file', started)
+    return {
+        'size': size,
+        'chunk_size': chunk_size,
+        'chunks': chunks,
+        'root': merkle_root(chunks).hex()
+    }
+
+def changed_chunks(tree, ranges, size):
+    """
+    Возвращает номера частей, которые нужно пересчитать после изменений.
+
+    Args:
+        tree: Дерево предыдущего вычисления.
+        ranges: Измененные диапазоны байтов (start, end), end не включается.
+        size: Текущий размер файла.
+
+    Returns:
+        list: Номера частей по возрастанию.
+    """
+    chunk_size = tree['chunk_size']
+    total = chunk_count(size, chunk_size)
+    indexes = set()
+    for start, end in ranges:
+        indexes.update(range(start // chunk_size, min(total, -(-end // chunk_size))))
+    if size != tree['size']:
+        # Сдвинулся конец файла: пересчитываются последняя общая часть и все новые
+        indexes.update(range(min(size, tree['size']) // chunk_size, total))
+    return sorted(index for index in indexes if index < total)
+
+def rehash_ranges(path, tree, ranges, workers=None, progress=None):
+    """
+    Обновляет дерево, пересчитывая только части, затронутые изменениями.
+
+    Args:
+        path: Путь к файлу.
+        tree: Дерево предыдущего вычисления (tree_hash_file или load_sidecar).
+        ranges: Измененные диапазоны байтов (start, end).
+        workers: Число процессов пула.
+        progress: Функция progress(done_chunks, total_chunks).
+
+    Returns:
+        tuple: Новое дерево и номера пересчитанных частей.
+    """
+    chunk_size = tree['chunk_size']
+    size = os.path.getsize(path)
+    total = chunk_count(size, chunk_size)
+    indexes = changed_chunks(tree, ranges, size)
+    digests = hash_chunks_parallel(path, indexes, chunk_size, workers, progress) if indexes else {}
+
+    chunks = tree['chunks'][:total]
+    chunks += [None] * (total - len(chunks))
+    for index, digest in digests.items():
+        chunks[index] = digest
+    updated = dict(tree, size=size, chunks=chunks, root=merkle_root(chunks).hex())
+    return updated, indexes
+
+def verify_tree(path, tree, workers=None, progress=None):
+    """
+    Проверяет файл по сохраненному дереву.
+
+    Все части пересчитываются параллельно; несовпадение указывает,
+    какие диапазоны файла изменились.
+
+    Returns:
+        tuple: Совпадает ли корень и номера несовпавших частей
+        (части за концом короткого файла тоже считаются несовпавшими).
+    """
+    current = tree_hash_file(path, tree['chunk_size'], workers, progress)
+    old_chunks, new_chunks = tree['chunks'], current['chunks']
+    mismatched = [index for index in range(max(len(old_chunks), len(new_chunks)))
+                  if index >= len(old_chunks) or index >= len(new_chunks)
+                  or old_chunks[index] != new_chunks[index]]
+    return current['root'] == tree['root'], mismatched
+
+def chunk_ranges(indexes, chunk_size, size):
+    """
+    Объединяет номера частей в диапазоны байтов (start, end).
+    """
+    ranges = []
+    for index in indexes:
+        start, end = index * chunk_size, min(size, (index + 1) * chunk_size)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+def save_sidecar(sidecar_path, path, tree):
+    """
+    Атомарно сохраняет хеши частей и корень рядом с файлом.
+    """
+    sidecar = dict(file_identity(path), version=TREE_VERSION, chunk_size=tree['chunk_size'],
+                   root=tree['root'], chunks=[digest.hex() for digest in tree['chunks']])
+    sidecar['size'] = tree['size']
+    temp_path = f"{sidecar_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(sidecar, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, sidecar_path)
+
+def load_sidecar(sidecar_path):
+    """
+    Загружает сохраненное дерево.
+
+    Returns:
+        dict: Дерево (как у tree_hash_file) с путем и временем изменения
+        файла на момент сохранения или None, если файла нет или он поврежден.
+    """
+    try:
+        with open(sidecar_path, 'r', encoding='utf-8') as f:
+            sidecar = json.load(f)
+        if sidecar.get('version') != TREE_VERSION:
+            return None
+        chunks = [bytes.fromhex(digest) for digest in sidecar['chunks']]
+        chunk_size = sidecar['chunk_size']
+        if (not isinstance(chunk_size, int) or chunk_size <= 0 or chunk_size % 64
+                or len(chunks) != chunk_count(sidecar['size'], chunk_size)):
+            return None
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return dict(sidecar, chunks=chunks)
@@ -0,0 +1,319 @@
+import os
+import sys
+import json
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+from md5_dupes import iter_files, hash_files_parallel
+import md5_metrics
+
+INDEX_VERSION = 1
+DEFAULT_INDEX_PATH = 'md5index.json'
+DEFAULT_MANIFEST_PATH = 'MD5SUMS'
+
+# Интервал опроса в режиме без inotify (с)
+DEFAULT_POLL_INTERVAL = 2.0
+
+# Пауза после последнего события inotify перед пересканированием (с):
+# пока файл дописывается, события идут одно за другим
+DEBOUNCE_SECONDS = 0.5
+
+# Файл, измененный незадолго до сканирования, мог измениться еще раз
+# в пределах точности времени изменения файловой системы, не поменяв
+# mtime. Такие записи помечаются и перехешируются при следующем сканировании
+RACY_WINDOW_NS = 2 * 10 ** 9
+
+# События inotify, после которых нужно пересканирование
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_IGNORED = 0x8000
+INOTIFY_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+                IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+INOTIFY_EVENT = struct.Struct('iIII')
+
+def load_index(index_path):
+    """
+    Загружает индекс хешей: путь -> размер, время изменения, inode и хеш.
+
+    Returns:
+        dict: Записи по абсолютным путям (пустой, если индекса нет или он поврежден).
+    """
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(index, dict) or index.get('version') != INDEX_VERSION:
+        return {}
+    files = index.get('files')
+    return files if isinstance(files, dict) else {}
+
+def save_json_atomic(path, data):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+def save_index(index_path, entries):
+    """
+    Атомарно сохраняет индекс хешей.
+    """
+    save_json_atomic(index_path, {'version': INDEX_VERSION, 'files': entries})
+
+def manifest_line(digest, path):
+    # Экранирование имен с обратной косой чертой и переводом строки - как у md5sum
+    if '\\' in path or '\n' in path:
+        return f"\\{digest}  {path.replace(chr(92), chr(92) * 2).replace(chr(10), chr(92) + 'n')}\n"
+    return f"{digest}  {path}\n"
+
+def write_manifest(manifest_path, entries):
+    """
+    Атомарно записывает манифест в формате md5sum.
+
+    Пути записываются относительно каталога манифеста, поэтому его можно
+    проверить командой md5sum -c из этого каталога.
+    """
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    temp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8', newline='\n') as f:
+        for path in sorted(entries):
+            f.write(manifest_line(entries[path]['digest'], os.path.relpath(path, base)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, manifest_path)
+
+def entry_matches(entry, info):
+    return (entry is not None and not entry.get('racy')
+            and entry['size'] == info.st_size and entry['mtime_ns'] == info.st_mtime_ns
+            and entry['inode'] == info.st_ino)
+
+def scan(paths, entries, workers=None, exclude=(), progress=None):
+    """
+    Сканирует файлы и обновляет записи индекса.
+
+    Для файла с теми же размером, временем изменения и inode, что в индексе,
+    берется сохраненный хеш без чтения содержимого; остальные файлы
+    хешируются на пуле процессов.
+
+    Args:
+        paths: Файлы и каталоги.
+        entries: Записи индекса предыдущего сканирования.
+        workers: Число процессов пула.
+        exclude: Абсолютные пути, которые не хешируются (индекс и манифест).
+        progress: Функция progress(done_files, total_files) для хеширования.
+
+    Returns:
+        tuple: Новые записи и статистика сканирования.
+    """
+    started = time.time_ns()
+    errors = []
+    stats = {'files': 0, 'hits': 0, 'rehashed': 0, 'added': 0, 'removed': 0, 'changed': 0, 'racy': 0,
+             'bytes_hashed': 0, 'errors': errors}
+
+    new_entries = {}
+    stale = {}
+    for path, info in iter_files(paths, errors):
+        path = os.path.abspath(path)
+        if path in exclude or path in new_entries or path in stale:
+            continue
+        stats['files'] += 1
+        entry = entries.get(path)
+        if entry_matches(entry, info):
+            new_entries[path] = entry
+            stats['hits'] += 1
+        else:
+            stale[path] = info
+
+    digests = hash_files_parallel(list(stale), workers, progress)
+    for path, info in stale.items():
+        digest, error, _ = digests[path]
+        if digest is None:
+            errors.append((path, error))
+            continue
+        entry = {'size': info.st_size, 'mtime_ns': info.st_mtime_ns, 'inode': info.st_ino, 'digest': digest}
+        if info.st_mtime_ns >= started - RACY_WINDOW_NS:
+            entry['racy'] = True
+            stats['racy'] += 1
+        new_entries[path] = entry
+        stats['rehashed'] += 1
+        stats['bytes_hashed'] += info.st_size
+        old = entries.get(path)
+        if old is None:
+            stats['added'] += 1
+        if old is None or old['digest'] != digest:
+            stats['changed'] += 1
+
+    removed = [path for path in entries if path not in new_entries]
+    stats['removed'] = len(removed)
+    stats['changed'] += len(removed)
+    if md5_metrics.ENABLED:
+        md5_metrics.count_cache('watch_index', stats['hits'], stats['rehashed'])
+    return new_entries, stats
+
+def rescan(paths, index_path=DEFAULT_INDEX_PATH, manifest_path=DEFAULT_MANIFEST_PATH, workers=None,
+           progress=None):
+    """
+    Пересканирует файлы по индексу и обновляет индекс и манифест.
+
+    Индекс перезаписывается, только если изменились записи, а манифест -
+    только если изменились хеши или набор файлов, поэтому повторное
+    сканирование неизмененного дерева ничего не читает и не пишет.
+
+    Returns:
+        dict: Статистика сканирования.
+    """
+    exclude = {os.path.abspath(index_path), os.path.abspath(manifest_path)}
+    entries = load_index(index_path)
+    new_entries, stats = scan(paths, entries, workers, exclude, progress)
+    if new_entries != entries:
+        save_index(index_path, new_entries)
+    if stats['changed'] or not os.path.exists(manifest_path):
+        write_manifest(manifest_path, new_entries)
+    return stats
+
+class InotifyWatcher:
+    """
+    Наблюдение за деревьями каталогов через inotify (Linux, без сторонних пакетов).
+
+    Следит за всеми подкаталогами; wait() возвращает True, когда в них
+    что-то изменилось, не считая событий для путей из ignore.
+
+    Args:
+        paths: Каталоги.
+        ignore: Абсолютные пути, события которых пропускаются.
+
+    Raises:
+        OSError: Если inotify недоступен.
+    """
+    def __init__(self, paths, ignore=()):
+        library = ctypes.util.find_library('c')
+        if not sys.platform.startswith('linux') or not library:
+            raise OSError("inotify доступен только в Linux")
+        self.libc = ctypes.CDLL(library, use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self.ignore = set(ignore)
+        self.paths = list(paths)
+        self.watches = {}
+        self.add_watches()
+
+    def add_watches(self):
+        """
+        Ставит наблюдение на каталоги, которых еще нет среди наблюдаемых (например, новые).
+        """
+        watched = set(self.watches.values())
+        for path in self.paths:
+            # За отдельным файлом следим через его каталог
+            directories = ([directory for directory, _, _ in os.walk(path)] if os.path.isdir(path)
+                           else [os.path.dirname(path) or '.'])
+            for directory in directories:
+                directory = os.path.abspath(directory)
+                if directory in watched:
+                    continue
+                wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), INOTIFY_MASK)
+                if wd >= 0:
+                    self.watches[wd] = directory
+                    watched.add(directory)
+
+    def read_events(self):
+        """
+        Читает накопившиеся события; возвращает True, если среди них есть значимые.
+        """
+        relevant = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return relevant
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, name_length = INOTIFY_EVENT.unpack_from(data, offset)
+                offset += INOTIFY_EVENT.size
+                name = os.fsdecode(data[offset:offset + name_length].rstrip(b'\x00'))
+                offset += name_length
+                if mask & IN_IGNORED:
+                    # Каталог удален - ядро уже сняло наблюдение
+                    self.watches.pop(wd, None)
+                    relevant = True
+                elif not self.ignored(os.path.join(self.watches.get(wd, ''), name)):
+                    relevant = True
+
+    def ignored(self, path):
+        # Временные файлы атомарной записи индекса и манифеста - ИМЯ.pid.tmp
+        if path.endswith('.tmp'):
+            path = path.rsplit('.', 2)[0]
+        return path in self.ignore
+
+    def wait(self, timeout=None):
+        """
+        Ждет изменений и паузы DEBOUNCE_SECONDS после последнего события.
+
+        Returns:
+            bool: Были ли значимые события за время ожидания.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        relevant = self.read_events()
+        while select.select([self.fd], [], [], DEBOUNCE_SECONDS)[0]:
+            relevant = self.read_events() or relevant
+        return relevant
+
+    def close(self):
+        os.close(self.fd)
+
+def watch(paths, index_path=DEFAULT_INDEX_PATH, manifest_path=DEFAULT_MANIFEST_PATH, workers=None,
+          interval=DEFAULT_POLL_INTERVAL, use_inotify=True, on_scan=None):
+    """
+    Пересканирует файлы при изменениях до прерывания (KeyboardInterrupt).
+
+    С inotify пересканирование запускается событиями файловой системы,
+    без него или если inotify недоступен - опросом раз в interval секунд.
+    Каждое пересканирование читает только файлы с измененными метаданными.
+
+    Args:
+        paths: Файлы и каталоги.
+        index_path: Путь к индексу хешей.
+        manifest_path: Путь к манифесту md5sum.
+        workers: Число процессов пула.
+        interval: Интервал опроса (с).
+        use_inotify: Использовать ли inotify.
+        on_scan: Функция on_scan(stats, mode) после каждого сканирования,
+            mode - 'inotify' или 'poll'.
+    """
+    ignore = {os.path.abspath(index_path), os.path.abspath(manifest_path)}
+    watcher = None
+    if use_inotify:
+        try:
+            watcher = InotifyWatcher(paths, ignore)
+        except OSError:
+            watcher = None
+    mode = 'inotify' if watcher else 'poll'
+
+    try:
+        while True:
+            stats = rescan(paths, index_path, manifest_path, workers)
+            if on_scan:
+                on_scan(stats, mode)
+            if watcher is None:
+                time.sleep(interval)
+                continue
+            watcher.add_watches()
+            # Недавно измененные файлы перепроверяются через interval и без событий
+            while not watcher.wait(interval if stats['racy'] else None) and not stats['racy']:
+                pass
+    finally:
+        if watcher:
+            watcher.close()